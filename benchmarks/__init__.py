@@ -0,0 +1,3 @@
+"""
+Performance benchmarks for the pyb and financial_analysis packages.
+"""
@@ -0,0 +1,118 @@
+"""
+Precision and memory check of the compact (float32) loading path against the float64 path.
+
+Runs the loaders, the IPO / first-close filters, the value composite and a backtest on a
+synthetic dataset both ways, checks that the compact results agree within float32
+tolerance, and prints how much memory the compact panels save. Exits non-zero on any
+mismatch.
+
+Usage:
+    python -m benchmarks.check_compact_precision
+    python -m benchmarks.check_compact_precision --scale medium
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.run_benchmarks import SCALES, ensure_dataset, Context  # noqa: E402
+
+# float32 carries ~7 significant digits
+RTOL = 1e-6
+# Backtest statistics compound rounding over every rebalance, so they get a looser bound
+STATS_RTOL = 1e-4
+# The composite is min-max normalized to [0, 1], so it is compared with an absolute bound
+COMBINED_ATOL = 1e-5
+
+
+def _compare_frames(name, reference, compact, failures, rtol=RTOL):
+    """Check that a compact frame has the reference's shape, labels, dtype and values."""
+    problems = []
+    if reference.shape != compact.shape:
+        problems.append(f"shape {compact.shape} != {reference.shape}")
+    elif not reference.index.equals(compact.index) or list(reference.columns) != list(compact.columns):
+        problems.append("labels differ")
+    else:
+        ref_values = reference.to_numpy(dtype=np.float64)
+        values = compact.to_numpy(dtype=np.float64)
+        if not np.array_equal(np.isnan(ref_values), np.isnan(values)):
+            problems.append("NaN masks differ")
+        elif not np.allclose(values, ref_values, rtol=rtol, atol=0, equal_nan=True):
+            problems.append(f"max relative error {np.nanmax(np.abs(values - ref_values) / np.abs(ref_values)):.2e}")
+    if not all(dtype == np.float32 for dtype in compact.dtypes):
+        problems.append(f"dtypes {set(compact.dtypes)} are not float32")
+    status = 'ok' if not problems else 'FAIL: ' + '; '.join(problems)
+    ratio = compact.memory_usage(deep=True).sum() / max(1, reference.memory_usage(deep=True).sum())
+    print(f"{name:<40} {status:<40} memory {ratio:6.1%} of float64")
+    if problems:
+        failures.append(name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the compact float32 path against float64")
+    parser.add_argument('--scale', default='small', choices=list(SCALES))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    from pyb.libs.candlestick_interface import get_candlestick_data
+    from pyb.libs.fundamental_interface import get_fundamental_data
+    from financial_analysis.data.preprocessing import filter_by_ipo_date, filter_factors_by_first_close
+    from financial_analysis.ratios.financial_ratios import create_combined_ratio
+    from financial_analysis.strategies.backtest import create_pb_strategy, run_backtest
+
+    ctx = Context(*ensure_dataset(args.scale, args.seed))
+    failures = []
+
+    for output_format in ('bt', 'double'):
+        _compare_frames(f"close[{output_format}]", get_candlestick_data(ctx.symbols, output_format, ctx.candlestick_dir),
+                        get_candlestick_data(ctx.symbols, output_format, ctx.candlestick_dir, compact=True), failures)
+        _compare_frames(f"pb[{output_format}]", get_fundamental_data(ctx.symbols, 'pb', output_format, ctx.fundamental_dir),
+                        get_fundamental_data(ctx.symbols, 'pb', output_format, ctx.fundamental_dir, compact=True),
+                        failures)
+
+    close_df = get_candlestick_data(ctx.symbols, 'bt', ctx.candlestick_dir, compact=True)
+    close_filtered = filter_by_ipo_date(close_df, ctx.stock_info_df, compact=True)
+    _compare_frames("filter_by_ipo_date", ctx.close_df_filtered, close_filtered, failures)
+
+    ratios, compact_ratios = {}, {}
+    for name in ('pb', 'pe_ttm', 'dyr'):
+        ratios[name] = filter_factors_by_first_close(ctx.close_df_filtered, ctx.ratio(name))
+        compact_ratios[name] = filter_factors_by_first_close(
+            close_filtered, get_fundamental_data(ctx.symbols, name, 'bt', ctx.fundamental_dir, compact=True),
+            compact=True)
+        _compare_frames(f"filter_factors_by_first_close[{name}]", ratios[name], compact_ratios[name], failures)
+
+    combined = create_combined_ratio([ratios['pb'], ratios['pe_ttm'], -ratios['dyr']], [0.4, 0.4, 0.2])
+    compact_combined = create_combined_ratio([compact_ratios['pb'], compact_ratios['pe_ttm'], -compact_ratios['dyr']],
+                                             [0.4, 0.4, 0.2])
+    combined_values, compact_values = combined.to_numpy(float), compact_combined.to_numpy(float)
+    error = np.nanmax(np.abs(combined_values - compact_values))
+    ok = np.array_equal(np.isnan(combined_values), np.isnan(compact_values)) and error <= COMBINED_ATOL
+    print(f"{'create_combined_ratio':<40} {'ok' if ok else 'FAIL'}  max abs difference {error:.2e}")
+    if not ok:
+        failures.append('create_combined_ratio')
+
+    reference = run_backtest(create_pb_strategy(ratios['pb'], k=ctx.k), ctx.close_df_filtered)
+    compact = run_backtest(create_pb_strategy(compact_ratios['pb'], k=ctx.k), close_filtered)
+    for stat in ('total_return', 'cagr', 'max_drawdown', 'daily_sharpe'):
+        expected, actual = reference.stats.iloc[:, 0][stat], compact.stats.iloc[:, 0][stat]
+        ok = np.isclose(actual, expected, rtol=STATS_RTOL, atol=1e-8)
+        print(f"{'backtest ' + stat:<40} {'ok' if ok else 'FAIL'}  {actual:.6g} vs {expected:.6g}")
+        if not ok:
+            failures.append(f"backtest {stat}")
+
+    if failures:
+        print(f"\n{len(failures)} check(s) failed: {', '.join(failures)}")
+        return 1
+    print("\nAll compact results match the float64 path.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Downloader throughput and resilience benchmark against the local mock API.
+
+Starts a MockLixingerServer in-process, points pyb at it and downloads candlestick data
+for the synthetic universe with the requested concurrency and client-side rate limit.
+Reports throughput, how many requests were rate limited or failed on the server, and
+how many symbols the downloader ultimately saved.
+
+Usage:
+    python -m benchmarks.download_load_test --symbols 200 --workers 8 \\
+        --server-rate-limit 40 --failure-rate 0.02 --latency 0.01
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.mock_lixinger import MockLixingerServer  # noqa: E402
+
+
+def run_load_test(n_symbols=100, n_days=500, workers=4, client_rate_limit=None, request_interval=0.0,
+                  latency=0.0, jitter=0.0, server_rate_limit=None, failure_rate=0.0, error_rate=0.0, seed=0,
+                  quiet=True, stream=False):
+    """
+    Download the whole synthetic universe from a fresh mock server and measure it.
+
+    Returns:
+        dict: Elapsed time, symbols per second, peak traced client memory, saved/failed symbol counts and
+        the server's request stats.
+    """
+    from pyb.libs import api_client, endpoints
+    from pyb.libs.candlestick_download_interface import download_candlestick_data
+
+    server = MockLixingerServer(n_symbols=n_symbols, n_days=n_days, seed=seed, latency=latency, jitter=jitter,
+                                rate_limit=server_rate_limit, failure_rate=failure_rate, error_rate=error_rate)
+    symbols = [info['stockCode'] for info in server.stock_info]
+    start_date, end_date = str(server.days[0]), str(server.days[-1])
+    previous_url = endpoints._base_url
+    with server, tempfile.TemporaryDirectory() as out_dir:
+        endpoints.set_base_url(server.base_url)
+        api_client.rate_limiter.set_rate(client_rate_limit)
+        try:
+            log = io.StringIO() if quiet else sys.stdout
+            tracemalloc.start()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(log):
+                results = download_candlestick_data(symbols, start_date, end_date, candlestick_dir=out_dir,
+                                                    request_interval=request_interval, workers=workers, stream=stream)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        finally:
+            endpoints.set_base_url(previous_url)
+            api_client.rate_limiter.set_rate(None)
+    if stream:
+        saved = sum(1 for summary in results.values() if summary['status'] == 'ok')
+    else:
+        saved = sum(1 for data in results.values() if data)
+    return {
+        'elapsed_s': elapsed,
+        'symbols_per_s': len(symbols) / elapsed if elapsed else float('inf'),
+        'peak_mib': peak / 2 ** 20,
+        'symbols': len(symbols),
+        'saved': saved,
+        'missing': len(symbols) - saved,
+        'server': dict(server.stats),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Downloader load test against the mock Lixinger API")
+    parser.add_argument('--symbols', type=int, default=100)
+    parser.add_argument('--days', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--client-rate-limit', type=float, default=None, help="Client requests per second")
+    parser.add_argument('--request-interval', type=float, default=0.0, help="Per-worker pause between requests")
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--server-rate-limit', type=float, default=None, help="Server requests per second")
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stream', action='store_true', help="Use the streaming download mode")
+    parser.add_argument('--verbose', action='store_true', help="Show the downloader's log output")
+    args = parser.parse_args(argv)
+
+    report = run_load_test(args.symbols, args.days, args.workers, args.client_rate_limit, args.request_interval,
+                           args.latency, args.jitter, args.server_rate_limit, args.failure_rate, args.error_rate,
+                           args.seed, quiet=not args.verbose, stream=args.stream)
+    print(f"Downloaded {report['saved']}/{report['symbols']} symbols in {report['elapsed_s']:.2f} s "
+          f"({report['symbols_per_s']:.1f} symbols/s, peak client memory {report['peak_mib']:.1f} MiB)")
+    print(f"Server: {report['server']}")
+    return 0 if report['missing'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
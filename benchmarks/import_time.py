@@ -0,0 +1,132 @@
+"""
+Import-time benchmark.
+
+Measures how long importing the packages (and ``main.py --help``) takes in a
+fresh interpreter, and checks that heavy dependencies are not imported eagerly.
+Exits with a non-zero status when a budget is exceeded, so it can guard startup
+time in CI.
+
+Usage:
+    python -m benchmarks.import_time [--repeat 5] [--budget-ms 150]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Modules whose import must stay light, with the heavy modules they must not pull in
+IMPORT_TARGETS = {
+    'pyb': ['pandas', 'requests'],
+    'financial_analysis': ['pandas', 'bt', 'matplotlib'],
+    'financial_analysis.data': ['pandas'],
+    'financial_analysis.ratios': ['pandas'],
+    'financial_analysis.strategies': ['bt'],
+    'financial_analysis.visualization': ['matplotlib'],
+}
+
+HEAVY_CHECK = "import sys, {module}; print(','.join(m for m in {heavy!r} if m in sys.modules))"
+
+
+def _run(args):
+    """Run a Python command in a fresh interpreter rooted at the project directory."""
+    env = dict(os.environ, PYTHONPATH=ROOT_DIR + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    return subprocess.run([sys.executable] + args, cwd=ROOT_DIR, env=env, capture_output=True, text=True)
+
+
+def parse_importtime(stderr, module):
+    """
+    Extract the cumulative import time of a module from ``-X importtime`` output.
+
+    Args:
+        stderr (str): The stderr produced by ``python -X importtime``.
+        module (str): Fully qualified module name.
+
+    Returns:
+        float: Cumulative import time in milliseconds, or None if not found.
+    """
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = [p.strip() for p in line[len('import time:'):].split('|')]
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1000.0
+    return None
+
+
+def measure_import(module, repeat=5):
+    """Return the median cumulative import time (ms) of a module over several fresh interpreters."""
+    timings = []
+    for _ in range(repeat):
+        proc = _run(['-X', 'importtime', '-c', f'import {module}'])
+        if proc.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{proc.stderr}")
+        value = parse_importtime(proc.stderr, module)
+        if value is not None:
+            timings.append(value)
+    return statistics.median(timings) if timings else float('nan')
+
+
+def eager_heavy_imports(module, heavy):
+    """Return the heavy modules that end up in sys.modules after importing ``module``."""
+    proc = _run(['-c', HEAVY_CHECK.format(module=module, heavy=heavy)])
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr}")
+    return [m for m in proc.stdout.strip().split(',') if m]
+
+
+def measure_cli_help(repeat=5):
+    """Return the median wall time (ms) of ``python main.py --help``."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = _run([os.path.join(ROOT_DIR, 'main.py'), '--help'])
+        timings.append((time.perf_counter() - start) * 1000.0)
+        if proc.returncode != 0:
+            raise RuntimeError(f"main.py --help failed:\n{proc.stderr}")
+    return statistics.median(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time benchmark")
+    parser.add_argument('--repeat', type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument('--budget-ms', type=float, default=150.0,
+                        help="Maximum cumulative import time allowed per package (ms)")
+    parser.add_argument('--cli-budget-ms', type=float, default=1000.0,
+                        help="Maximum wall time allowed for main.py --help (ms)")
+    args = parser.parse_args(argv)
+
+    failures = []
+    for module, heavy in IMPORT_TARGETS.items():
+        elapsed = measure_import(module, args.repeat)
+        eager = eager_heavy_imports(module, heavy)
+        status = 'ok'
+        if elapsed > args.budget_ms:
+            status = 'SLOW'
+            failures.append(f"{module}: {elapsed:.1f} ms > {args.budget_ms:.1f} ms")
+        if eager:
+            status = 'EAGER'
+            failures.append(f"{module}: eagerly imports {', '.join(eager)}")
+        print(f"{module:<36} {elapsed:8.1f} ms  {status}")
+
+    cli_elapsed = measure_cli_help(args.repeat)
+    cli_status = 'ok'
+    if cli_elapsed > args.cli_budget_ms:
+        cli_status = 'SLOW'
+        failures.append(f"main.py --help: {cli_elapsed:.1f} ms > {args.cli_budget_ms:.1f} ms")
+    print(f"{'main.py --help':<36} {cli_elapsed:8.1f} ms  {cli_status}")
+
+    if failures:
+        print("\nImport-time budget exceeded:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
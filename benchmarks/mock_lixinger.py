@@ -0,0 +1,269 @@
+"""
+Local stand-in for the Lixinger open API.
+
+Serves the HK candlestick, fundamental (one endpoint per fsTableType) and stock-info
+endpoints from the deterministic synthetic data generator, with configurable latency,
+token-bucket rate limiting (429 + Retry-After) and injected failures. Point the
+downloaders at it with ``pyb.libs.endpoints.set_base_url(server.base_url)``, the
+LIXINGER_BASE_URL environment variable or ``pyb --base-url``.
+
+Usage:
+    python -m benchmarks.mock_lixinger --port 8765 --symbols 500 --days 2500 \\
+        --latency 0.02 --rate-limit 50 --failure-rate 0.01
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from pyb.libs import synthetic_data  # noqa: E402
+from pyb.libs.endpoints import CANDLESTICK_PATH, STOCK_INFO_PATH, FUNDAMENTAL_PATHS  # noqa: E402
+
+API_PREFIX = '/api'
+
+
+class TokenBucket:
+    """Thread-safe token bucket; `rate` tokens per second with a burst capacity."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        """Take one token. Return 0 on success, otherwise the seconds until a token is available."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class MockLixingerServer:
+    """
+    In-process mock API server.
+
+    Args:
+        host (str): Interface to bind.
+        port (int): Port to bind; 0 picks a free port.
+        n_symbols (int): Size of the synthetic universe.
+        n_days (int): Length of the synthetic trading calendar.
+        seed (int): Synthetic data seed.
+        start_date (str): First trading day of the calendar.
+        latency (float): Fixed seconds added to every response.
+        jitter (float): Extra uniformly random latency in [0, jitter] seconds.
+        rate_limit (float): Requests per second allowed; None disables rate limiting.
+        burst (float): Token-bucket capacity (defaults to one second's worth of requests).
+        failure_rate (float): Probability of answering HTTP 500.
+        error_rate (float): Probability of answering HTTP 200 with an API error code.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, n_symbols=100, n_days=500, seed=0, start_date='2015-01-02',
+                 latency=0.0, jitter=0.0, rate_limit=None, burst=None, failure_rate=0.0, error_rate=0.0):
+        self.seed = seed
+        self.days = synthetic_data.trading_days(start_date, n_days)
+        self.stock_info = synthetic_data.generate_stock_info(synthetic_data.make_symbols(n_symbols), self.days, seed)
+        self.index = {info['stockCode']: i for i, info in enumerate(self.stock_info)}
+        self.latency = latency
+        self.jitter = jitter
+        self.bucket = TokenBucket(rate_limit, burst) if rate_limit else None
+        self.failure_rate = failure_rate
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.stats = {'requests': 0, 'ok': 0, 'rate_limited': 0, 'failures': 0, 'errors': 0, 'bytes': 0}
+        self._stats_lock = threading.Lock()
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        self._routes = {API_PREFIX + CANDLESTICK_PATH: self._candlestick,
+                        API_PREFIX + STOCK_INFO_PATH: self._stock_info}
+        for fs_table_type, path in FUNDAMENTAL_PATHS.items():
+            self._routes[API_PREFIX + path] = self._make_fundamental_route(fs_table_type)
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        """Base URL to hand to pyb.libs.endpoints.set_base_url."""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def start(self):
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, key, nbytes=0):
+        with self._stats_lock:
+            self.stats[key] += 1
+            self.stats['bytes'] += nbytes
+
+    def _symbol_data(self, stock_code):
+        """Generate (and cache) the newest-first candlestick and fundamental records of a stock."""
+        with self._cache_lock:
+            if stock_code not in self._cache:
+                i = self.index[stock_code]
+                candles, fundamentals = synthetic_data.generate_symbol_data(self.stock_info[i], i, self.days, self.seed)
+                self._cache[stock_code] = (candles, fundamentals)
+            return self._cache[stock_code]
+
+    @staticmethod
+    def _in_range(records, payload):
+        start = payload.get('startDate') or '0000-00-00'
+        end = payload.get('endDate') or '9999-99-99'
+        return [rec for rec in records if start <= rec['date'][:10] <= end]
+
+    def _stock_info(self, payload):
+        if payload.get('includeDelisted', True):
+            return self.stock_info
+        return [info for info in self.stock_info if info['listingStatus'] != 'delisted']
+
+    def _adjusted_candles(self, stock_code, candlestick_type):
+        """Candles of a stock in an adjustment type; the synthetic walk is the 'bc_rights' series."""
+        candles = self._symbol_data(stock_code)[0]
+        if candlestick_type not in ('ex_rights', 'fc_rights'):
+            return candles
+        key = (stock_code, candlestick_type)
+        with self._cache_lock:
+            if key not in self._cache:
+                i = self.index[stock_code]
+                event_days, ratios = synthetic_data.generate_corporate_actions(self.stock_info[i], i, self.days,
+                                                                               self.seed)
+                self._cache[key] = synthetic_data.adjust_candles(candles, event_days, ratios, candlestick_type)
+            return self._cache[key]
+
+    def _candlestick(self, payload):
+        stock_code = payload.get('stockCode')
+        if stock_code not in self.index:
+            return []
+        return self._in_range(self._adjusted_candles(stock_code, payload.get('type')), payload)
+
+    def _make_fundamental_route(self, fs_table_type):
+        def route(payload):
+            metrics = payload.get('metricsList') or synthetic_data.FUNDAMENTAL_METRICS
+            data = []
+            for stock_code in payload.get('stockCodes') or []:
+                if stock_code not in self.index or self.stock_info[self.index[stock_code]]['fsTableType'] != fs_table_type:
+                    continue
+                for rec in self._in_range(self._symbol_data(stock_code)[1], payload):
+                    row = {'date': rec['date'], 'stockCode': stock_code}
+                    row.update({metric: rec[metric] for metric in metrics if metric in rec})
+                    data.append(row)
+            return data
+        return route
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):  # silence per-request logging
+                pass
+
+            def _send(self, status, body, headers=None):
+                raw = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(raw)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(raw)
+                return len(raw)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    payload = {}
+                server._count('requests')
+
+                route = server._routes.get(self.path.rstrip('/'))
+                if route is None:
+                    self._send(404, {'code': 0, 'message': f'Unknown endpoint {self.path}'})
+                    return
+                if server.bucket is not None:
+                    wait = server.bucket.take()
+                    if wait > 0:
+                        server._count('rate_limited')
+                        self._send(429, {'code': 0, 'message': 'Too Many Requests'},
+                                   {'Retry-After': f"{max(wait, 0.001):.3f}"})
+                        return
+
+                delay = server.latency + (server.random.uniform(0, server.jitter) if server.jitter else 0.0)
+                if delay:
+                    time.sleep(delay)
+                draw = server.random.random()
+                if draw < server.failure_rate:
+                    server._count('failures')
+                    self._send(500, {'code': 0, 'message': 'Injected failure'})
+                    return
+                if draw < server.failure_rate + server.error_rate:
+                    server._count('errors')
+                    self._send(200, {'code': 0, 'message': 'Injected API error'})
+                    return
+                nbytes = self._send(200, {'code': 1, 'message': 'success', 'data': route(payload)})
+                server._count('ok', nbytes)
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local Lixinger API stand-in server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--symbols', type=int, default=100, help="Number of synthetic stocks")
+    parser.add_argument('--days', type=int, default=500, help="Number of synthetic trading days")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Extra random latency up to this many seconds")
+    parser.add_argument('--rate-limit', type=float, default=None, help="Allowed requests per second")
+    parser.add_argument('--burst', type=float, default=None, help="Token-bucket capacity")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Probability of an HTTP 500")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Probability of an API error code")
+    args = parser.parse_args(argv)
+
+    server = MockLixingerServer(args.host, args.port, args.symbols, args.days, args.seed, latency=args.latency,
+                                jitter=args.jitter, rate_limit=args.rate_limit, burst=args.burst,
+                                failure_rate=args.failure_rate, error_rate=args.error_rate)
+    print(f"Serving mock Lixinger API at {server.base_url} (Ctrl+C to stop)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"Stats: {server.stats}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
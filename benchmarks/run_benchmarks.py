@@ -0,0 +1,402 @@
+"""
+Benchmark suite for the data loaders, preprocessing, ratio, backtest and plotting code.
+
+Each benchmark runs against a deterministic synthetic data tree (see
+pyb.libs.synthetic_data) at several symbols x days scales. Wall time (best of N runs)
+and peak traced memory are reported, and can be compared against a stored baseline.
+
+Usage:
+    python -m benchmarks.run_benchmarks                       # small and medium scales
+    python -m benchmarks.run_benchmarks --scales large --repeat 1
+    python -m benchmarks.run_benchmarks --save-baseline        # refresh benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --only get_candlestick_data filter_by_ipo_date
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_CACHE_DIR = os.path.join(BENCH_DIR, '.data')
+BASELINE_FILE = os.path.join(BENCH_DIR, 'baseline.json')
+
+# Scale name -> (symbols, trading days)
+SCALES = {
+    'small': (50, 250),
+    'medium': (300, 1000),
+    'large': (1500, 2500),
+}
+
+BENCHMARKS = {}
+
+
+def benchmark(func):
+    """Register a benchmark. It receives the prepared context and returns nothing."""
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def ensure_dataset(scale, seed=0):
+    """Generate (once) and return the data directory and summary for a scale."""
+    from pyb.libs.synthetic_data import write_synthetic_dataset
+    n_symbols, n_days = SCALES[scale]
+    data_dir = os.path.join(DATA_CACHE_DIR, f"{scale}_{n_symbols}x{n_days}_seed{seed}")
+    summary_file = os.path.join(data_dir, 'summary.json')
+    if os.path.exists(summary_file):
+        with open(summary_file, 'r', encoding='utf-8') as f:
+            return data_dir, json.load(f)
+    print(f"Generating synthetic {scale} dataset ({n_symbols} symbols x {n_days} days)...")
+    summary = write_synthetic_dataset(data_dir, n_symbols=n_symbols, n_days=n_days, seed=seed)
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        json.dump(summary, f)
+    return data_dir, summary
+
+
+class Context:
+    """Lazily computed inputs shared by the benchmarks of one scale."""
+
+    def __init__(self, data_dir, summary):
+        self.data_dir = data_dir
+        self.summary = summary
+        self.symbols = summary['symbols']
+        self.candlestick_dir = os.path.join(data_dir, 'candlestick_data')
+        self.fundamental_dir = os.path.join(data_dir, 'fundamental_data')
+        self._cache = {}
+
+    def _get(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    @property
+    def stock_info_df(self):
+        import pandas as pd
+
+        def build():
+            with open(os.path.join(self.data_dir, 'stock_info.json'), 'r', encoding='utf-8') as f:
+                return pd.DataFrame(json.load(f))
+        return self._get('stock_info_df', build)
+
+    @property
+    def close_df(self):
+        from pyb.libs.candlestick_interface import get_candlestick_data
+        return self._get('close_df', lambda: get_candlestick_data(self.symbols, 'bt', self.candlestick_dir))
+
+    @property
+    def close_df_filtered(self):
+        from financial_analysis.data.preprocessing import filter_by_ipo_date
+        return self._get('close_df_filtered', lambda: filter_by_ipo_date(self.close_df, self.stock_info_df))
+
+    @property
+    def calendar(self):
+        from financial_analysis.data.panel import build_trading_calendar
+        return self._get('calendar', lambda: build_trading_calendar(self.symbols, self.candlestick_dir))
+
+    def ratio(self, name):
+        from pyb.libs.fundamental_interface import get_fundamental_data
+        return self._get(f'ratio_{name}', lambda: get_fundamental_data(self.symbols, name, 'bt', self.fundamental_dir))
+
+    @property
+    def k(self):
+        return max(5, min(50, len(self.symbols) // 5))
+
+    @property
+    def results(self):
+        from financial_analysis.strategies.backtest import create_pb_strategy, create_dividend_strategy, run_backtest
+
+        def build():
+            return {
+                'PB Strategy': run_backtest(create_pb_strategy(self.ratio('pb'), k=self.k), self.close_df_filtered),
+                'Dividend Strategy': run_backtest(create_dividend_strategy(self.ratio('dyr'), k=self.k),
+                                                  self.close_df_filtered),
+            }
+        return self._get('results', build)
+
+    @property
+    def result_store_dir(self):
+        from financial_analysis.strategies.result_store import ResultStore
+
+        def build():
+            store = ResultStore(os.path.join(self.data_dir, 'results'))
+            for name, result in self.results.items():
+                store.put(name.replace(' ', '_'), result, {'name': name})
+            return store.path
+        return self._get('result_store_dir', build)
+
+    @property
+    def query_store(self):
+        from pyb.libs.query import QueryStore
+
+        def build():
+            store = QueryStore(self.data_dir)
+            store.sync()
+            return store
+        return self._get('query_store', build)
+
+    @property
+    def data_service(self):
+        from pyb.libs.data_service import DataService
+
+        def build():
+            # Served from a thread of this process; panels are loaded on the first request
+            return DataService(self.data_dir).start(preload=[('candlestick_data', 'close')])
+        return self._get('data_service', build)
+
+
+@benchmark
+def get_candlestick_data(ctx):
+    from pyb.libs.candlestick_interface import get_candlestick_data as load
+    load(ctx.symbols, 'bt', ctx.candlestick_dir)
+
+
+@benchmark
+def get_candlestick_data_range(ctx):
+    from pyb.libs.candlestick_interface import get_candlestick_data as load
+    # The last fifth of the calendar, like a one-year query over five years of history
+    start = ctx.close_df.index[-len(ctx.close_df.index) // 5].strftime('%Y-%m-%d')
+    load(ctx.symbols, 'bt', ctx.candlestick_dir, start_date=start)
+
+
+@benchmark
+def get_candlestick_data_compact(ctx):
+    from pyb.libs.candlestick_interface import get_candlestick_data as load
+    load(ctx.symbols, 'bt', ctx.candlestick_dir, compact=True)
+
+
+@benchmark
+def get_candlestick_data_service(ctx):
+    from pyb.libs.data_service import DataClient
+    # A new client maps the shared panel instead of reading the files
+    with DataClient(ctx.data_service.socket_path) as client:
+        client.get_candlestick_data()
+
+
+@benchmark
+def get_ohlcv_panel(ctx):
+    from pyb.libs.ohlcv_interface import get_ohlcv_panel as load
+    load(ctx.symbols, candlestick_dir=ctx.candlestick_dir)
+
+
+@benchmark
+def get_fundamental_data(ctx):
+    from pyb.libs.fundamental_interface import get_fundamental_data as load
+    load(ctx.symbols, 'pb', 'bt', ctx.fundamental_dir)
+
+
+@benchmark
+def build_price_panel(ctx):
+    from financial_analysis.data.panel import build_price_panel as build
+    build(ctx.symbols, candlestick_dir=ctx.candlestick_dir)
+
+
+@benchmark
+def build_fundamental_panel(ctx):
+    from financial_analysis.data.panel import build_fundamental_panel as build
+    build(ctx.symbols, ctx.calendar, 'pb', ctx.fundamental_dir)
+
+
+@benchmark
+def filter_by_ipo_date(ctx):
+    from financial_analysis.data.preprocessing import filter_by_ipo_date as apply_filter
+    apply_filter(ctx.close_df, ctx.stock_info_df)
+
+
+@benchmark
+def filter_by_ipo_date_compact(ctx):
+    from financial_analysis.data.preprocessing import filter_by_ipo_date as apply_filter
+    apply_filter(ctx.close_df, ctx.stock_info_df, compact=True)
+
+
+@benchmark
+def create_combined_ratio(ctx):
+    from financial_analysis.ratios.financial_ratios import create_combined_ratio as combine
+    combine([ctx.ratio('pb'), ctx.ratio('pe_ttm'), -ctx.ratio('dyr')], [0.4, 0.4, 0.2])
+
+
+@benchmark
+def neutralize_factors(ctx):
+    from financial_analysis.ratios.neutralization import neutralize, sector_labels
+    market_cap = ctx.ratio('mc')
+    for name in ('pb', 'pe_ttm', 'dyr'):
+        factor_df = ctx.ratio(name)
+        neutralize(factor_df, sector_labels(ctx.stock_info_df, factor_df.columns), market_cap)
+
+
+@benchmark
+def query_cross_section(ctx):
+    store = ctx.query_store
+    day = ctx.summary['end_date']
+    store.query("SELECT f.symbol, f.pb FROM fundamental f JOIN stock_info s USING (symbol) "
+                "WHERE s.is_ah AND f.date = ? AND f.pb < 1", [day], refresh=False)
+    store.query("SELECT date, close FROM candlestick WHERE symbol = ? AND date >= ?",
+                [ctx.symbols[0], ctx.summary['start_date']], refresh=False)
+
+
+@benchmark
+def evaluate_factors(ctx):
+    from financial_analysis.ratios.factor_evaluation import evaluate_factors as evaluate
+    factors = {name: ctx.ratio(name) for name in ('pb', 'pe_ttm', 'dyr', 'mc')}
+    evaluate(factors, ctx.close_df_filtered)
+
+
+@benchmark
+def run_backtest(ctx):
+    from financial_analysis.strategies.backtest import create_pb_strategy, run_backtest as run
+    run(create_pb_strategy(ctx.ratio('pb'), k=ctx.k), ctx.close_df_filtered)
+
+
+@benchmark
+def rolling_covariance(ctx):
+    # Weekly risk-parity sizing of the top-K PB names, as WeighRiskParity does inside a backtest
+    import numpy as np
+    from financial_analysis.strategies.weighting import RollingCovariance, risk_parity_weights
+    pb = ctx.ratio('pb').reindex(ctx.close_df_filtered.index)
+    estimator = RollingCovariance(ctx.close_df_filtered)
+    for date in ctx.close_df_filtered.index[60::5]:
+        selected = pb.loc[date].dropna().nsmallest(ctx.k).index.tolist()
+        volatility = estimator.volatility(date, selected)
+        usable = volatility[volatility > 0].index.tolist()
+        if len(usable) > 1:
+            covariance = estimator.covariance(date, usable).fillna(0.0).to_numpy()
+            risk_parity_weights(0.9 * covariance + 0.1 * np.diag(np.diag(covariance)))
+
+
+@benchmark
+def robustness(ctx):
+    from financial_analysis.strategies.robustness import bootstrap_metrics, rebalance_offset_metrics, strategy_returns
+    bootstrap_metrics(strategy_returns(ctx.results), n_samples=2000)
+    rebalance_offset_metrics(ctx.ratio('pb'), ctx.close_df_filtered, k=ctx.k, n_samples=200)
+
+
+@benchmark
+def plotting(ctx):
+    import matplotlib.pyplot as plt
+    from financial_analysis.visualization.analysis import (compare_strategies_performance, plot_rolling_returns,
+                                                           plot_drawdowns)
+    results = ctx.results
+    figures = [
+        compare_strategies_performance(results),
+        plot_rolling_returns(results),
+        plot_drawdowns(results),
+    ]
+    for fig in figures:
+        plt.close(fig)
+
+
+@benchmark
+def plotting_stored(ctx):
+    import matplotlib.pyplot as plt
+    from financial_analysis.strategies.result_store import ResultStore
+    from financial_analysis.visualization.analysis import (compare_strategies_performance, plot_rolling_returns,
+                                                           plot_drawdowns, analyze_sector_performance)
+    # A fresh store per run, so the results are memory-mapped back from disk each time
+    store = ResultStore(ctx.result_store_dir)
+    results = {name: store.get(name.replace(' ', '_')) for name in ctx.results}
+    figures = [
+        compare_strategies_performance(results),
+        plot_rolling_returns(results),
+        plot_drawdowns(results),
+    ]
+    for fig in figures:
+        plt.close(fig)
+    for result in results.values():
+        analyze_sector_performance(result, ctx.stock_info_df)
+
+
+def measure(func, ctx, repeat):
+    """
+    Run a benchmark and measure it.
+
+    Returns:
+        dict: Best wall time in seconds over `repeat` runs and peak traced memory in MiB
+        (measured on a separate run, since tracing slows execution down).
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func(ctx)
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    func(ctx)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'time_s': min(times), 'peak_mib': peak / 2 ** 20}
+
+
+def compare(results, baseline, tolerance):
+    """Return human-readable regressions of `results` relative to `baseline`."""
+    regressions = []
+    for key, current in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        for metric in ('time_s', 'peak_mib'):
+            if reference[metric] > 0 and current[metric] > reference[metric] * (1 + tolerance):
+                regressions.append(f"{key} {metric}: {current[metric]:.3f} vs baseline {reference[metric]:.3f} "
+                                   f"(+{(current[metric] / reference[metric] - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmark suite")
+    parser.add_argument('--scales', nargs='+', default=['small', 'medium'], choices=list(SCALES))
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help="Benchmarks to run")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per benchmark")
+    parser.add_argument('--seed', type=int, default=0, help="Synthetic data seed")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="Baseline JSON file")
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed relative slowdown/memory growth before reporting a regression")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    import matplotlib
+    matplotlib.use('Agg')
+
+    names = args.only or list(BENCHMARKS)
+    results = {}
+    for scale in args.scales:
+        data_dir, summary = ensure_dataset(scale, args.seed)
+        ctx = Context(data_dir, summary)
+        for name in names:
+            key = f"{name}[{scale}]"
+            results[key] = measure(BENCHMARKS[name], ctx, args.repeat)
+            print(f"{key:<36} {results[key]['time_s']:9.3f} s {results[key]['peak_mib']:9.1f} MiB")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nRegressions against baseline:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
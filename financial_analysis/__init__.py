@@ -2,6 +2,21 @@
 Financial Analysis Package
 
 A modular package for analyzing financial ratios and backtesting investment strategies.
+
+Subpackages are imported lazily, so ``import financial_analysis`` does not pull in
+pandas, bt or matplotlib until one of them is used.
 """
 
-__version__ = "0.1.0" 
\ No newline at end of file
+from ._lazy import lazy_attributes
+
+__version__ = "0.1.0"
+
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    'data': None,
+    'ratios': None,
+    'strategies': None,
+    'visualization': None,
+    'run_analysis': None,
+    'pipeline': None,
+    'live': None,
+})
@@ -0,0 +1,43 @@
+"""
+Helpers for PEP 562 lazy attribute loading in package ``__init__`` modules.
+"""
+
+import importlib
+
+
+def lazy_attributes(package_name, attributes):
+    """
+    Build ``__getattr__`` and ``__dir__`` functions for a package that resolve
+    public names from submodules on first access.
+
+    Parameters:
+    -----------
+    package_name : str
+        ``__name__`` of the package installing the hooks
+    attributes : dict
+        Mapping of attribute name to the relative module that defines it.
+        A value of ``None`` means the attribute is itself a submodule.
+
+    Returns:
+    --------
+    tuple
+        Tuple containing (__getattr__, __dir__) to assign in the package namespace
+    """
+    package = importlib.import_module(package_name)
+
+    def __getattr__(name):
+        if name not in attributes:
+            raise AttributeError(f"module {package_name!r} has no attribute {name!r}")
+        module_name = attributes[name]
+        if module_name is None:
+            value = importlib.import_module(f".{name}", package_name)
+        else:
+            value = getattr(importlib.import_module(module_name, package_name), name)
+        # Cache on the package so later lookups bypass __getattr__ entirely
+        setattr(package, name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(package)) | set(attributes))
+
+    return __getattr__, __dir__
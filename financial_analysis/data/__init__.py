@@ -1,3 +1,31 @@
 """
 Data processing module for financial analysis.
-""" 
\ No newline at end of file
+"""
+
+from .._lazy import lazy_attributes
+
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    'loading': None,
+    'preprocessing': None,
+    'panel': None,
+    'chunked': None,
+    'universe': None,
+    'load_price_data': '.loading',
+    'load_stock_info': '.loading',
+    'get_ah_stocks': '.loading',
+    'load_and_filter_price_data': '.loading',
+    'filter_by_ipo_date': '.preprocessing',
+    'filter_factors_by_first_close': '.preprocessing',
+    'build_trading_calendar': '.panel',
+    'build_price_panel': '.panel',
+    'build_fundamental_panel': '.panel',
+    'build_aligned_panels': '.panel',
+    'asof_fill': '.panel',
+    'prepare_chunked': '.chunked',
+    'chunked_combined_ratio': '.chunked',
+    'chunked_value_composite': '.chunked',
+    'UniverseBitmap': '.universe',
+    'Universe': '.universe',
+    'build_universe': '.universe',
+    'load_universe': '.universe',
+})
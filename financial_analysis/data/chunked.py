@@ -0,0 +1,222 @@
+"""
+Out-of-core, symbol-chunked preparation of prices and ratios.
+
+Symbols are streamed from storage in batches sized to a memory budget. Each batch goes
+through IPO masking, first-close factor masking and any per-stock transforms, and the
+results are written to the columnar store as ChunkedPanel blocks (see
+pyb.libs.chunked_store). Cross-sectional steps, such as the value composite, then read
+the stored panels one date slice at a time, so only a slice of dates across the whole
+universe is ever held in memory.
+"""
+
+import os
+import numpy as np
+
+from pyb.libs.chunked_store import ChunkedPanel
+from pyb.libs.columnar_store import get_store_dir, from_datetime_index
+from .panel import build_trading_calendar, build_price_panel, build_fundamental_panel
+from .preprocessing import filter_by_ipo_date, filter_factors_by_first_close, COMPACT_DTYPE
+
+DEFAULT_MEMORY_BUDGET_MB = 512
+DEFAULT_RATIOS = ('pb', 'pe_ttm', 'dyr', 'mc')
+# Arrays of one chunk's shape alive at once: the filtered close panel, the panel being
+# built, its mask/fill temporaries and the filtered result
+_WORKING_ARRAYS = 5
+
+
+def symbols_per_chunk(n_days, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Return how many symbols can be processed at once within the memory budget.
+
+    Parameters:
+    -----------
+    n_days : int
+        Length of the trading calendar
+    memory_budget_mb : float, optional
+        Memory budget in MiB for the arrays of one chunk
+
+    Returns:
+    --------
+    int
+        Symbols per chunk, at least 1
+    """
+    per_symbol = max(1, n_days) * np.dtype(COMPACT_DTYPE).itemsize * _WORKING_ARRAYS
+    return max(1, int(memory_budget_mb * 2 ** 20 // per_symbol))
+
+
+def dates_per_slice(n_symbols, n_inputs, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Return how many dates of a cross-sectional step fit in the memory budget.
+
+    Parameters:
+    -----------
+    n_symbols : int
+        Number of symbols in each date slice
+    n_inputs : int
+        Number of panels read per slice
+    memory_budget_mb : float, optional
+        Memory budget in MiB for the arrays of one slice
+
+    Returns:
+    --------
+    int
+        Dates per slice, at least 1
+    """
+    per_date = max(1, n_symbols) * np.dtype(COMPACT_DTYPE).itemsize * (2 * n_inputs + 2)
+    return max(1, int(memory_budget_mb * 2 ** 20 // per_date))
+
+
+def prepare_chunked(symbols, stock_info_df, ratios=DEFAULT_RATIOS, transforms=None, output_dir=None,
+                    memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, candlestick_dir=None, fundamental_dir=None,
+                    data_dir=None):
+    """
+    Stream symbol chunks through IPO masking, first-close factor masking and per-stock transforms.
+
+    Parameters:
+    -----------
+    symbols : list
+        Stock codes to prepare
+    stock_info_df : pandas.DataFrame
+        Stock information with 'stockCode' and 'ipoDate' columns
+    ratios : sequence of str, optional
+        Fundamental metrics to load and mask
+    transforms : dict, optional
+        Per-stock transforms, name -> callable(close_df, ratio_dfs) returning a DataFrame shaped like
+        close_df. They only see one chunk of symbols at a time, so they must not mix columns.
+    output_dir : str, optional
+        Directory for the stored panels. Defaults to <data_dir>/columnar/prepared
+    memory_budget_mb : float, optional
+        Memory budget in MiB for the arrays of one chunk
+    candlestick_dir, fundamental_dir : str, optional
+        JSON data directories. Default to the data directory, in which case the columnar store is
+        read instead whenever it is up to date.
+    data_dir : str, optional
+        Root data directory. Defaults to <project_root>/data
+
+    Returns:
+    --------
+    dict
+        'close', each ratio and each transform name mapped to its ChunkedPanel
+    """
+    transforms = transforms or {}
+    if output_dir is None:
+        output_dir = get_store_dir('prepared', data_dir)
+    candlestick_store = get_store_dir('candlestick_data', data_dir) if candlestick_dir is None else None
+    fundamental_store = get_store_dir('fundamental_data', data_dir) if fundamental_dir is None else None
+    if data_dir is not None:
+        candlestick_dir = candlestick_dir or os.path.join(data_dir, 'candlestick_data')
+        fundamental_dir = fundamental_dir or os.path.join(data_dir, 'fundamental_data')
+
+    calendar = build_trading_calendar(symbols, candlestick_dir, candlestick_store)
+    days, tz = from_datetime_index(calendar)
+
+    names = ['close'] + list(ratios) + list(transforms)
+    panels = {name: ChunkedPanel.create(os.path.join(output_dir, name), days, symbols, 'symbol', COMPACT_DTYPE, tz)
+              for name in names}
+
+    chunk_size = symbols_per_chunk(len(days), memory_budget_mb)
+    for start in range(0, len(symbols), chunk_size):
+        chunk = list(symbols[start:start + chunk_size])
+        print(f"Preparing symbols {start + 1}-{start + len(chunk)} of {len(symbols)}...")
+        close_df = build_price_panel(chunk, calendar, candlestick_dir=candlestick_dir, store_dir=candlestick_store,
+                                     dtype=COMPACT_DTYPE)
+        close_df = filter_by_ipo_date(close_df, stock_info_df, compact=True)
+        panels['close'].write_block(start, close_df.to_numpy())
+
+        ratio_dfs = {}
+        for ratio in ratios:
+            ratio_df = build_fundamental_panel(chunk, calendar, ratio, fundamental_dir, fundamental_store,
+                                               dtype=COMPACT_DTYPE)
+            ratio_df = filter_factors_by_first_close(close_df, ratio_df, compact=True)
+            panels[ratio].write_block(start, ratio_df.to_numpy())
+            if transforms:
+                ratio_dfs[ratio] = ratio_df
+            del ratio_df
+
+        for name, transform in transforms.items():
+            panels[name].write_block(start, transform(close_df, ratio_dfs).to_numpy())
+        del close_df, ratio_dfs
+    return panels
+
+
+def _min_max_rows(values):
+    """Min-max normalize each row like create_combined_ratio; rows without spread are left as they are."""
+    with np.errstate(invalid='ignore'):
+        low = np.min(np.where(np.isnan(values), np.inf, values), axis=1, keepdims=True)
+        high = np.max(np.where(np.isnan(values), -np.inf, values), axis=1, keepdims=True)
+        spread = high > low
+        return np.where(spread, (values - low) / np.where(spread, high - low, 1), values)
+
+
+def chunked_combined_ratio(ratio_panels, weights, output_path, signs=None, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Combine stored ratio panels cross-sectionally, one date slice at a time.
+
+    Produces the same values as create_combined_ratio: each ratio is min-max normalized
+    across all stocks per date, and missing values contribute zero.
+
+    Parameters:
+    -----------
+    ratio_panels : list of ChunkedPanel
+        Ratio panels sharing one calendar and symbol list
+    weights : list of float
+        Weights to apply to each ratio, must sum to 1.0
+    output_path : str
+        Directory for the combined panel
+    signs : list of float, optional
+        Multipliers applied before normalizing, e.g. -1 to invert a ratio where higher is better
+    memory_budget_mb : float, optional
+        Memory budget in MiB for the arrays of one date slice
+
+    Returns:
+    --------
+    ChunkedPanel
+        Combined ratio panel stored in date blocks
+    """
+    if len(ratio_panels) != len(weights):
+        raise ValueError("Number of ratio panels must match number of weights")
+    if abs(sum(weights) - 1.0) > 0.0001:
+        raise ValueError("Weights must sum to 1.0")
+    signs = signs or [1.0] * len(ratio_panels)
+
+    first = ratio_panels[0]
+    combined = ChunkedPanel.create(output_path, first.days, first.symbols, 'date', COMPACT_DTYPE, first.tz)
+    slice_size = dates_per_slice(len(first.symbols), len(ratio_panels), memory_budget_mb)
+    for start in range(0, len(first.days), slice_size):
+        rows = slice(start, min(start + slice_size, len(first.days)))
+        total = np.zeros((rows.stop - rows.start, len(first.symbols)), dtype=COMPACT_DTYPE)
+        for panel, weight, sign in zip(ratio_panels, weights, signs):
+            normalized = _min_max_rows(panel.read(rows) * COMPACT_DTYPE(sign))
+            total += np.nan_to_num(normalized, nan=0.0) * COMPACT_DTYPE(weight)
+        combined.write_block(start, total)
+    return combined
+
+
+def chunked_value_composite(panels, output_path=None, weights=None, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Create the value composite from panels written by prepare_chunked.
+
+    Parameters:
+    -----------
+    panels : dict
+        Panels returned by prepare_chunked; must include 'pb', 'pe_ttm' and 'dyr'
+    output_path : str, optional
+        Directory for the composite. Defaults to a 'combined' directory next to the pb panel.
+    weights : dict, optional
+        Weights keyed by 'pb', 'pe' and 'dividend_yield', as in create_value_composite
+    memory_budget_mb : float, optional
+        Memory budget in MiB for the arrays of one date slice
+
+    Returns:
+    --------
+    ChunkedPanel
+        Combined value ratio panel
+    """
+    if weights is None:
+        weights = {'pb': 0.4, 'pe': 0.4, 'dividend_yield': 0.2}
+    if output_path is None:
+        output_path = os.path.join(os.path.dirname(panels['pb'].path), 'combined')
+    # For PB and PE lower is better, for dividend higher is better, so the dividend yield is inverted
+    return chunked_combined_ratio([panels['pb'], panels['pe_ttm'], panels['dyr']],
+                                  [weights['pb'], weights['pe'], weights['dividend_yield']],
+                                  output_path, signs=[1.0, 1.0, -1.0], memory_budget_mb=memory_budget_mb)
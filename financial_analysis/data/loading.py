@@ -2,12 +2,14 @@
 Data loading functions for financial analysis.
 """
 
+import os
+
 import pyb
 import pandas as pd
 from .preprocessing import filter_by_ipo_date, filter_factors_by_first_close
 
 
-def load_price_data(stock_codes, data_dir="./data/candlestick_data"):
+def load_price_data(stock_codes, data_dir="./data/candlestick_data", aligned=False, compact=False):
     """
     Load price data for the given stock codes.
     
@@ -17,40 +19,63 @@ def load_price_data(stock_codes, data_dir="./data/candlestick_data"):
         List of stock codes to load
     data_dir : str, optional
         Directory containing candlestick data files
+    aligned : bool, optional
+        If True, build the prices on the master trading calendar (see financial_analysis.data.panel)
+        with one column per requested stock code, in order
+    compact : bool, optional
+        If True, return float32 prices (see pyb.libs.compact_frames)
         
     Returns:
     --------
     pandas.DataFrame
         DataFrame containing price data with dates as index and stock codes as columns
     """
-    return pyb.get_candlestick_data(symbols=stock_codes, output_format='bt', candlestick_dir=data_dir)
+    if aligned:
+        from .panel import build_price_panel
+        return build_price_panel(stock_codes, candlestick_dir=data_dir, dtype='float32' if compact else 'float64')
+    return pyb.get_candlestick_data(symbols=stock_codes, output_format='bt', candlestick_dir=data_dir, compact=compact)
+
+
+def _stock_info_path(data_dir):
+    return os.path.join(data_dir, 'stock_info.json') if data_dir is not None else None
 
 
-def load_stock_info():
+def load_stock_info(data_dir=None):
     """
     Load stock information from the data source.
     
+    Parameters:
+    -----------
+    data_dir : str, optional
+        Root data directory holding stock_info.json. Defaults to <project_root>/data
+
     Returns:
     --------
     pandas.DataFrame
         DataFrame containing stock information
     """
-    return pyb.get_stock_info_dataframe()
+    return pyb.get_stock_info_dataframe(_stock_info_path(data_dir))
 
 
-def get_ah_stocks():
+def get_ah_stocks(data_dir=None):
     """
     Get a list of A/H stock codes.
     
+    Parameters:
+    -----------
+    data_dir : str, optional
+        Root data directory holding stock_info.json. Defaults to <project_root>/data
+
     Returns:
     --------
     list
         List of A/H stock codes
     """
-    return pyb.get_ah_stock_codes()
+    return pyb.get_ah_stock_codes(_stock_info_path(data_dir))
 
 
-def load_and_filter_price_data(stock_codes=None, stock_info_df=None, data_dir="./data/candlestick_data"):
+def load_and_filter_price_data(stock_codes=None, stock_info_df=None, data_dir="./data/candlestick_data", aligned=False,
+                               compact=False):
     """
     Load and filter price data for the given stock codes.
     
@@ -62,6 +87,10 @@ def load_and_filter_price_data(stock_codes=None, stock_info_df=None, data_dir=".
         DataFrame containing stock information. If None, loads it.
     data_dir : str, optional
         Directory containing candlestick data files
+    aligned : bool, optional
+        If True, build the prices on the master trading calendar
+    compact : bool, optional
+        If True, load and filter float32 prices without intermediate copies
         
     Returns:
     --------
@@ -74,7 +103,7 @@ def load_and_filter_price_data(stock_codes=None, stock_info_df=None, data_dir=".
     if stock_info_df is None:
         stock_info_df = load_stock_info()
         
-    close_df = load_price_data(stock_codes, data_dir)
-    close_df_filtered = filter_by_ipo_date(close_df, stock_info_df)
+    close_df = load_price_data(stock_codes, data_dir, aligned, compact)
+    close_df_filtered = filter_by_ipo_date(close_df, stock_info_df, compact=compact)
     
     return close_df, close_df_filtered 
\ No newline at end of file
@@ -0,0 +1,227 @@
+"""
+Trading-calendar-aligned panels for prices and fundamentals.
+
+A master trading calendar is derived from the candlestick store and every panel is
+built on it: each symbol's values are scattered into a preallocated (dates x symbols)
+array with ``searchsorted`` instead of being pivoted, so all frames share one index
+and one column order and need no reindexing downstream.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+
+from pyb.paths import get_data_dir
+from pyb.libs.catalog import list_dataset_symbols
+from pyb.libs.columnar_store import load_symbol, list_symbols, to_datetime_index
+
+
+def _default_dir(dataset, data_dir):
+    return data_dir if data_dir is not None else os.path.join(get_data_dir(), dataset)
+
+
+def _all_symbols(json_dir, store_dir):
+    """Return every symbol present in the JSON directory or the columnar store."""
+    symbols = set()
+    symbols.update(list_dataset_symbols(json_dir, '.json'))
+    if store_dir is not None and os.path.isdir(store_dir):
+        symbols.update(list_symbols(store_dir))
+    return sorted(symbols)
+
+
+def _calendar_days(calendar):
+    """Return the calendar as a sorted datetime64[D] array."""
+    if isinstance(calendar, pd.DatetimeIndex):
+        if calendar.tz is not None:
+            calendar = calendar.tz_localize(None)
+        return calendar.values.astype('datetime64[D]')
+    return np.asarray(calendar, dtype='datetime64[D]')
+
+
+def build_trading_calendar(symbols=None, candlestick_dir=None, store_dir=None):
+    """
+    Derive the master trading calendar from the candlestick store.
+
+    The calendar is the sorted union of every date on which at least one of the symbols traded.
+
+    Parameters:
+    -----------
+    symbols : list, optional
+        Stock codes to consider. If None, every symbol in the store is used.
+    candlestick_dir : str, optional
+        Directory containing candlestick JSON files. Defaults to <project_root>/data/candlestick_data
+    store_dir : str, optional
+        Columnar store for the candlestick data, used instead of the JSON file when up to date
+
+    Returns:
+    --------
+    pandas.DatetimeIndex
+        Trading days, localized to the offset recorded with the data
+    """
+    candlestick_dir = _default_dir('candlestick_data', candlestick_dir)
+    if symbols is None:
+        symbols = _all_symbols(candlestick_dir, store_dir)
+    elif isinstance(symbols, str):
+        symbols = [symbols]
+
+    chunks, tz = [], ''
+    for symbol in symbols:
+        columns = load_symbol(symbol, candlestick_dir, store_dir, fields=[])
+        if columns is None:
+            continue
+        chunks.append(columns['date'])
+        tz = tz or columns['tz']
+    days = np.unique(np.concatenate(chunks)) if chunks else np.array([], dtype='datetime64[D]')
+    return to_datetime_index(days, tz)
+
+
+def asof_fill(values, limit=None):
+    """
+    Forward fill a (dates x symbols) array along the date axis.
+
+    Each cell takes the most recent non-NaN value at or before its own row, so no value is
+    ever moved to an earlier date.
+
+    Parameters:
+    -----------
+    values : numpy.ndarray
+        2-D array with dates on the first axis
+    limit : int, optional
+        Maximum number of rows a value may be carried forward. None carries it indefinitely.
+
+    Returns:
+    --------
+    numpy.ndarray
+        Filled array of the same shape
+    """
+    n_rows, n_cols = values.shape
+    rows = np.arange(n_rows)[:, None]
+    # Row of the latest observation at or before each cell; 0 before the first observation
+    last = np.where(np.isnan(values), 0, rows)
+    np.maximum.accumulate(last, axis=0, out=last)
+    filled = values[last, np.arange(n_cols)]
+    if limit is not None:
+        filled[rows - last > limit] = np.nan
+    return filled
+
+
+def _scatter(symbols, calendar, json_dir, store_dir, field, dtype=np.float64):
+    """
+    Place each symbol's values on the calendar row at or after its date.
+
+    Dates that fall between trading days (or before the first one) land on the next trading day,
+    so a value is never visible before it was published. Dates after the last trading day are dropped.
+    """
+    days = _calendar_days(calendar)
+    panel = np.full((len(days), len(symbols)), np.nan, dtype=dtype)
+    for j, symbol in enumerate(symbols):
+        columns = load_symbol(symbol, json_dir, store_dir, fields=[field])
+        if columns is None:
+            print(f"Warning: No data found for symbol {symbol} in {json_dir}")
+            continue
+        rows = np.searchsorted(days, columns['date'], side='left')
+        keep = (rows < len(days)) & ~np.isnan(columns[field])
+        # Dates are sorted, so when several map to one row the latest assignment wins
+        panel[rows[keep], j] = columns[field][keep]
+    return panel
+
+
+def build_price_panel(symbols, calendar=None, field='close', candlestick_dir=None, store_dir=None, dtype=np.float64):
+    """
+    Build a (dates x symbols) price panel on the trading calendar.
+
+    Parameters:
+    -----------
+    symbols : list
+        Stock codes, in the column order of the result
+    calendar : pandas.DatetimeIndex, optional
+        Trading calendar. If None, it is derived from the same symbols with build_trading_calendar.
+    field : str, optional
+        Candlestick field to place on the panel, e.g. 'close' or 'volume'
+    candlestick_dir : str, optional
+        Directory containing candlestick JSON files. Defaults to <project_root>/data/candlestick_data
+    store_dir : str, optional
+        Columnar store for the candlestick data, used instead of the JSON file when up to date
+    dtype : numpy.dtype, optional
+        Value dtype of the panel; numpy.float32 halves its memory
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Prices with the calendar as index and symbols as columns; NaN where a symbol did not trade
+    """
+    if isinstance(symbols, str):
+        symbols = [symbols]
+    candlestick_dir = _default_dir('candlestick_data', candlestick_dir)
+    if calendar is None:
+        calendar = build_trading_calendar(symbols, candlestick_dir, store_dir)
+    panel = _scatter(symbols, calendar, candlestick_dir, store_dir, field, dtype)
+    return pd.DataFrame(panel, index=calendar, columns=pd.Index(symbols, name='symbol'))
+
+
+def build_fundamental_panel(symbols, calendar, ratio='mc', fundamental_dir=None, store_dir=None, limit=None,
+                            dtype=np.float64):
+    """
+    Build an as-of (dates x symbols) fundamental panel on the trading calendar.
+
+    Every trading day carries the latest value published on or before it. Values dated on
+    non-trading days become visible on the next trading day.
+
+    Parameters:
+    -----------
+    symbols : list
+        Stock codes, in the column order of the result
+    calendar : pandas.DatetimeIndex
+        Trading calendar, usually the index of the price panel
+    ratio : str, optional
+        Fundamental metric to load, e.g. 'pb', 'pe_ttm', 'dyr' or 'mc'
+    fundamental_dir : str, optional
+        Directory containing fundamental JSON files. Defaults to <project_root>/data/fundamental_data
+    store_dir : str, optional
+        Columnar store for the fundamental data, used instead of the JSON file when up to date
+    limit : int, optional
+        Maximum number of trading days a value is carried forward. None carries it indefinitely.
+    dtype : numpy.dtype, optional
+        Value dtype of the panel; numpy.float32 halves its memory
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Ratio values with the calendar as index and symbols as columns
+    """
+    if isinstance(symbols, str):
+        symbols = [symbols]
+    fundamental_dir = _default_dir('fundamental_data', fundamental_dir)
+    panel = asof_fill(_scatter(symbols, calendar, fundamental_dir, store_dir, ratio, dtype), limit)
+    return pd.DataFrame(panel, index=calendar, columns=pd.Index(symbols, name='symbol'))
+
+
+def build_aligned_panels(symbols, ratios=('pb', 'pe_ttm', 'dyr', 'mc'), candlestick_dir=None, fundamental_dir=None,
+                         candlestick_store_dir=None, fundamental_store_dir=None, limit=None):
+    """
+    Build the close price panel and fundamental panels on one shared calendar.
+
+    Parameters:
+    -----------
+    symbols : list
+        Stock codes, in the column order of every panel
+    ratios : sequence of str, optional
+        Fundamental metrics to load
+    candlestick_dir, fundamental_dir : str, optional
+        JSON data directories. Default to the project data directory.
+    candlestick_store_dir, fundamental_store_dir : str, optional
+        Columnar stores used instead of the JSON files when up to date
+    limit : int, optional
+        Maximum number of trading days a fundamental value is carried forward
+
+    Returns:
+    --------
+    dict
+        'close' plus one entry per ratio, all sharing the same index and columns
+    """
+    close_df = build_price_panel(symbols, candlestick_dir=candlestick_dir, store_dir=candlestick_store_dir)
+    panels = {'close': close_df}
+    for ratio in ratios:
+        panels[ratio] = build_fundamental_panel(symbols, close_df.index, ratio, fundamental_dir,
+                                                fundamental_store_dir, limit)
+    return panels
@@ -4,9 +4,21 @@ Data preprocessing functions for financial analysis.
 
 import pandas as pd
 import numpy as np
+from .panel import asof_fill
 
 
-def filter_by_ipo_date(candlestick_df: pd.DataFrame, stock_info_df: pd.DataFrame) -> pd.DataFrame:
+COMPACT_DTYPE = np.float32
+
+
+def _utc_ns(dates):
+    """Return datetimes as a datetime64[ns] array in UTC (naive datetimes are taken as they are)."""
+    dates = pd.DatetimeIndex(dates)
+    if dates.tz is not None:
+        dates = dates.tz_convert('UTC').tz_localize(None)
+    return dates.values.astype('datetime64[ns]')
+
+
+def filter_by_ipo_date(candlestick_df: pd.DataFrame, stock_info_df: pd.DataFrame, compact: bool = False) -> pd.DataFrame:
     """
     Filters out (sets to NaN) all close prices in candlestick_df that occur before the IPO date of each stock.
     Afterwards, forward fills missing prices using the previous valid value along the date index.
@@ -14,11 +26,21 @@ def filter_by_ipo_date(candlestick_df: pd.DataFrame, stock_info_df: pd.DataFrame
     Parameters:
         candlestick_df (pd.DataFrame): A pivot table with dates as the index and stock codes as columns.
         stock_info_df (pd.DataFrame): A DataFrame containing stock information, including 'stockCode' and 'ipoDate'.
+        compact (bool): If True, mask and fill in one vectorized pass over a float32 array instead of
+                        copying the frames, and return float32 prices.
         
     Returns:
         pd.DataFrame: A new DataFrame where prices dated before the IPO date for each stock have been removed,
                       and missing prices are forward filled with the last valid price.
     """
+    if compact:
+        ipo_dates = pd.to_datetime(stock_info_df.drop_duplicates('stockCode').set_index('stockCode')['ipoDate'])
+        ipo_ns = _utc_ns(ipo_dates.reindex(candlestick_df.columns))
+        values = candlestick_df.to_numpy(dtype=COMPACT_DTYPE, copy=True)
+        # NaT IPO dates (stocks missing from stock_info) compare False and are left untouched
+        values[_utc_ns(candlestick_df.index)[:, None] < ipo_ns[None, :]] = np.nan
+        return pd.DataFrame(asof_fill(values), index=candlestick_df.index, columns=candlestick_df.columns)
+
     # Create a copy to avoid modifying the original DataFrame
     filtered_df = candlestick_df.copy()
     
@@ -36,12 +58,12 @@ def filter_by_ipo_date(candlestick_df: pd.DataFrame, stock_info_df: pd.DataFrame
             filtered_df.loc[filtered_df.index < ipo_date, stock] = np.nan
 
     # Forward fill the prices along the date index (assumes the index is sorted chronologically)
-    filtered_df = filtered_df.fillna(method='ffill')
+    filtered_df = filtered_df.ffill()
     
     return filtered_df
 
 
-def filter_factors_by_first_close(close_df, factor_df):
+def filter_factors_by_first_close(close_df, factor_df, compact=False):
     """
     Filter factor DataFrame by setting values to NaN for dates before first close price exists.
     
@@ -51,12 +73,30 @@ def filter_factors_by_first_close(close_df, factor_df):
         DataFrame containing close prices with stock codes as columns and dates as index
     factor_df : pandas.DataFrame
         DataFrame containing factor values with same structure as close_df
+    compact : bool, optional
+        If True, mask in one vectorized pass over a float32 array and return float32 values
     
     Returns:
     --------
     pandas.DataFrame
         Filtered factor DataFrame with values set to NaN before first close date for each stock
     """
+    if compact:
+        values = factor_df.to_numpy(dtype=COMPACT_DTYPE, copy=True)
+        common = close_df.columns.intersection(factor_df.columns)
+        close_values = close_df[common].to_numpy()
+        has_close = ~np.isnan(close_values).all(axis=0)
+        first_rows = np.argmax(~np.isnan(close_values), axis=0)
+        first_ns = _utc_ns(close_df.index)[first_rows[has_close]]
+        positions = factor_df.columns.get_indexer(common[has_close])
+        values[:, positions] = np.where(_utc_ns(factor_df.index)[:, None] < first_ns[None, :],
+                                        np.nan, values[:, positions])
+        return pd.DataFrame(values, index=factor_df.index, columns=factor_df.columns)
+
+    # Frames built on the same calendar can be masked in one vectorized step
+    if factor_df.index.equals(close_df.index) and factor_df.columns.equals(close_df.columns):
+        return factor_df.where(close_df.notna().cummax())
+
     # Create a copy of factor_df to avoid modifying the original
     filtered_factor_df = factor_df.copy()
     
@@ -0,0 +1,214 @@
+"""
+Point-in-time universe bitmaps.
+
+Eligibility (listed, post-IPO, not delisted, AH member, sector, has a price) is
+precomputed once as date x symbol boolean masks, stored as packed bits (one bit per
+cell) and combined with bitwise operations. Strategies read the members of a date
+directly from the bitmap instead of recomputing masks.
+"""
+
+import numpy as np
+import pandas as pd
+
+from pyb.libs.columnar_store import from_datetime_index, to_datetime_index
+from pyb.libs.stock_info_interface import is_ah_stock
+
+
+class UniverseBitmap:
+    """
+    A date x symbol boolean mask stored as packed bits.
+
+    Parameters:
+    -----------
+    bits : numpy.ndarray
+        uint8 array of shape (dates, ceil(symbols / 8)) as returned by numpy.packbits(mask, axis=1)
+    dates : pandas.DatetimeIndex
+        Dates of the rows
+    symbols : sequence
+        Stock codes of the columns
+    """
+
+    def __init__(self, bits, dates, symbols):
+        self.bits = bits
+        self.dates = dates
+        self.symbols = pd.Index(symbols, name='symbol')
+
+    @classmethod
+    def from_mask(cls, mask, dates, symbols):
+        """Pack a boolean (dates x symbols) array or DataFrame into a bitmap."""
+        return cls(np.packbits(np.asarray(mask, dtype=bool), axis=1), dates, symbols)
+
+    def _check(self, other):
+        if not (self.dates.equals(other.dates) and self.symbols.equals(other.symbols)):
+            raise ValueError("Universe bitmaps must share the same dates and symbols")
+
+    def __and__(self, other):
+        self._check(other)
+        return UniverseBitmap(self.bits & other.bits, self.dates, self.symbols)
+
+    def __or__(self, other):
+        self._check(other)
+        return UniverseBitmap(self.bits | other.bits, self.dates, self.symbols)
+
+    def __invert__(self):
+        # Clear the padding bits of the last byte so they never count as members
+        padding = np.packbits(np.ones(len(self.symbols), dtype=bool))
+        return UniverseBitmap(~self.bits & padding, self.dates, self.symbols)
+
+    def __sub__(self, other):
+        self._check(other)
+        return UniverseBitmap(self.bits & ~other.bits, self.dates, self.symbols)
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def row_position(self, date):
+        """Return the row of the latest date at or before `date`, or -1 if it precedes the bitmap."""
+        return int(self.dates.searchsorted(date, side='right')) - 1
+
+    def row(self, date):
+        """Return the boolean membership of every symbol on `date` (as of the latest earlier date)."""
+        position = self.row_position(date)
+        if position < 0:
+            return np.zeros(len(self.symbols), dtype=bool)
+        return np.unpackbits(self.bits[position], count=len(self.symbols)).astype(bool)
+
+    def members(self, date):
+        """Return the stock codes in the universe on `date`."""
+        return list(self.symbols[self.row(date)])
+
+    def counts(self):
+        """Return the number of members on each date."""
+        lookup = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+        return pd.Series(lookup[self.bits].sum(axis=1), index=self.dates, name='members')
+
+    def to_mask(self):
+        """Unpack into a boolean (dates x symbols) array."""
+        return np.unpackbits(self.bits, axis=1, count=len(self.symbols)).astype(bool)
+
+    def to_frame(self):
+        """Unpack into a boolean DataFrame indexed by date with symbols as columns."""
+        return pd.DataFrame(self.to_mask(), index=self.dates, columns=self.symbols)
+
+    def apply(self, df):
+        """Set the cells of `df` outside the universe to NaN; `df` must share the bitmap's dates and symbols."""
+        return df.where(self.to_mask())
+
+
+class Universe:
+    """
+    Named universe bitmaps sharing one calendar and symbol list.
+
+    Names include 'post_ipo', 'not_delisted', 'listed', 'ah', 'has_price', 'tradable'
+    ('listed' and 'has_price') and one 'sector:<name>' entry per sector.
+
+    Parameters:
+    -----------
+    bitmaps : dict
+        Name -> UniverseBitmap
+    """
+
+    def __init__(self, bitmaps):
+        self.bitmaps = dict(bitmaps)
+
+    def __getitem__(self, name):
+        try:
+            return self.bitmaps[name]
+        except KeyError:
+            raise KeyError(f"Unknown universe '{name}'. Available: {sorted(self.bitmaps)}") from None
+
+    def __contains__(self, name):
+        return name in self.bitmaps
+
+    def names(self):
+        return sorted(self.bitmaps)
+
+    def combine(self, *names):
+        """Return the intersection of the named bitmaps."""
+        result = self[names[0]]
+        for name in names[1:]:
+            result = result & self[name]
+        return result
+
+    def sector(self, sector):
+        return self[f"sector:{sector}"]
+
+    def save(self, path):
+        """Save every bitmap to one .npz file."""
+        first = next(iter(self.bitmaps.values()))
+        arrays = {f"bits:{name}": bitmap.bits for name, bitmap in self.bitmaps.items()}
+        days, tz = from_datetime_index(first.dates)
+        np.savez_compressed(path, date=days, tz=np.array(tz), symbols=np.array(list(first.symbols)), **arrays)
+        return path
+
+
+def load_universe(path):
+    """Load a Universe saved with Universe.save."""
+    with np.load(path) as npz:
+        dates = to_datetime_index(npz['date'], str(npz['tz']))
+        symbols = [str(symbol) for symbol in npz['symbols']]
+        bits = {name[len('bits:'):]: npz[name] for name in npz.files if name.startswith('bits:')}
+    return Universe({name: UniverseBitmap(b, dates, symbols) for name, b in bits.items()})
+
+
+def _utc_ns(values):
+    dates = pd.DatetimeIndex(pd.to_datetime(values))
+    if dates.tz is not None:
+        dates = dates.tz_convert('UTC').tz_localize(None)
+    return dates.values.astype('datetime64[ns]')
+
+
+def build_universe(stock_info_df, dates, symbols=None, close_df=None):
+    """
+    Precompute the point-in-time universe bitmaps.
+
+    Parameters:
+    -----------
+    stock_info_df : pandas.DataFrame
+        Stock information with 'stockCode', 'ipoDate' and optionally 'delistedDate',
+        'mutualMarkets' and 'sector' columns
+    dates : pandas.DatetimeIndex
+        Trading calendar, usually the index of the price panel
+    symbols : list, optional
+        Stock codes of the columns. Defaults to close_df's columns or every stock in stock_info_df.
+    close_df : pandas.DataFrame, optional
+        Prices on `dates`; adds the 'has_price' and 'tradable' bitmaps
+
+    Returns:
+    --------
+    Universe
+        The precomputed bitmaps
+    """
+    if symbols is None:
+        symbols = list(close_df.columns) if close_df is not None else list(stock_info_df['stockCode'])
+    info = stock_info_df.drop_duplicates('stockCode').set_index('stockCode').reindex(symbols)
+    dates_ns = _utc_ns(dates)[:, None]
+
+    def pack(mask):
+        return UniverseBitmap.from_mask(mask, dates, symbols)
+
+    # NaT compares False, so stocks without an IPO date are never post-IPO
+    post_ipo = dates_ns >= _utc_ns(info['ipoDate'])[None, :]
+    if 'delistedDate' in info:
+        delisted_ns = _utc_ns(info['delistedDate'])[None, :]
+        not_delisted = np.isnat(delisted_ns) | (dates_ns < delisted_ns)
+    else:
+        not_delisted = np.ones((len(dates), len(symbols)), dtype=bool)
+    bitmaps = {'post_ipo': pack(post_ipo), 'not_delisted': pack(not_delisted), 'listed': pack(post_ipo & not_delisted)}
+    del post_ipo, not_delisted
+
+    # Membership flags are not point-in-time in stock info, so they apply to every date
+    if 'mutualMarkets' in info:
+        ah = info['mutualMarkets'].map(is_ah_stock).to_numpy(bool)
+        bitmaps['ah'] = pack(np.broadcast_to(ah, (len(dates), len(symbols))))
+    if 'sector' in info:
+        for sector in info['sector'].dropna().unique():
+            in_sector = (info['sector'] == sector).to_numpy(bool)
+            bitmaps[f"sector:{sector}"] = pack(np.broadcast_to(in_sector, (len(dates), len(symbols))))
+
+    if close_df is not None:
+        has_price = close_df.reindex(columns=symbols).notna().to_numpy()
+        bitmaps['has_price'] = pack(has_price)
+        bitmaps['tradable'] = bitmaps['listed'] & bitmaps['has_price']
+    return Universe(bitmaps)
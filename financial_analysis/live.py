@@ -0,0 +1,276 @@
+"""
+Incremental daily update of the signals and the live portfolio state.
+
+The state directory holds the filtered close prices, the filtered ratios, their normalized
+panels, the value composite and each strategy's equity as ChunkedPanels stored in date
+blocks (see pyb.libs.chunked_store), plus a portfolio.json with the holdings, cash and
+rebalance history of every strategy. An update loads only the trading days after the last
+stored date, runs them through the same IPO masking, first-close masking, normalization and
+top-K selection as ``run_analysis`` with ``aligned=True`` and appends the results. The work
+grows with the number of new days rather than with the history, and the stored state is the
+same as a rebuild from scratch.
+"""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+
+from pyb.libs.chunked_store import ChunkedPanel
+from pyb.libs.columnar_store import get_store_dir, from_datetime_index, to_datetime_index
+from financial_analysis.data.loading import load_stock_info, get_ah_stocks
+from financial_analysis.data.panel import build_trading_calendar, build_price_panel, build_fundamental_panel
+from financial_analysis.data.preprocessing import filter_by_ipo_date, filter_factors_by_first_close
+from financial_analysis.data.universe import build_universe
+from financial_analysis.ratios.financial_ratios import normalize_ratio, combine_normalized_ratios
+
+PORTFOLIO_FILE = 'portfolio.json'
+INITIAL_CAPITAL = 1000000.0
+
+# Ratio name -> fundamental metric, as in load_and_prepare_ratios
+LIVE_RATIOS = {'pb': 'pb', 'pe': 'pe_ttm', 'dividend_yield': 'dyr', 'market_cap': 'mc'}
+
+# Ratio name -> (weight, sign) of the value composite, as in create_value_composite
+COMPOSITE_WEIGHTS = {'pb': (0.4, 1.0), 'pe': (0.4, 1.0), 'dividend_yield': (0.2, -1.0)}
+
+# The strategies of run_analysis
+LIVE_STRATEGIES = {
+    'PB Strategy': {'signal': 'pb', 'k': 50, 'rebalance_period': 'quarterly', 'sort_descending': False},
+    'PE Strategy': {'signal': 'pe', 'k': 50, 'rebalance_period': 'quarterly', 'sort_descending': False},
+    'Dividend Strategy': {'signal': 'dividend_yield', 'k': 50, 'rebalance_period': 'quarterly',
+                          'sort_descending': True},
+    'Combined Strategy': {'signal': 'combined', 'k': 50, 'rebalance_period': 'quarterly', 'sort_descending': False},
+}
+
+_SIGNAL_PANELS = ['close'] + list(LIVE_RATIOS) + [f"normalized_{name}" for name in COMPOSITE_WEIGHTS] + ['combined']
+
+
+def _is_rebalance_day(now, previous, rebalance_period):
+    """Return True if bt's RunPeriod(run_on_first_date=True), as used by create_strategy, fires on `now`."""
+    if previous is None:
+        return True
+    if rebalance_period == 'monthly':
+        return (now.year, now.month) != (previous.year, previous.month)
+    if rebalance_period == 'weekly':
+        return now.isocalendar()[:2] != previous.isocalendar()[:2]
+    # create_strategy defaults to quarterly
+    return (now.year, now.quarter) != (previous.year, previous.quarter)
+
+
+def _select(signal_row, symbols, members, k, sort_descending):
+    """Select the top k stocks among the universe members the way SelectTopK does."""
+    stat = pd.Series(signal_row, index=symbols).dropna()
+    stat = stat.loc[stat.index.intersection(members)]
+    stat.sort_values(ascending=not sort_descending, inplace=True)
+    return list(stat[:k].index)
+
+
+def _prepare_days(symbols, stock_info_df, calendar, seed_close, candlestick_dir, fundamental_dir, candlestick_store,
+                  fundamental_store):
+    """
+    Build the filtered prices, ratios, normalized ratios and composite on `calendar`.
+
+    When a state already exists, the calendar starts with the last stored date and its close
+    row is replaced by the stored one, so the forward fill and the first-close mask continue
+    from the stored state; fundamentals published up to that date collapse onto the same row,
+    which gives the as-of value. The seed row is dropped from the results.
+    """
+    close_df = build_price_panel(symbols, calendar, candlestick_dir=candlestick_dir, store_dir=candlestick_store)
+    if seed_close is not None:
+        close_df.iloc[0] = seed_close
+    close_df = filter_by_ipo_date(close_df, stock_info_df)
+
+    panels = {'close': close_df}
+    for name, ratio in LIVE_RATIOS.items():
+        ratio_df = build_fundamental_panel(symbols, calendar, ratio, fundamental_dir, fundamental_store)
+        panels[name] = filter_factors_by_first_close(close_df, ratio_df)
+    if seed_close is not None:
+        panels = {name: df.iloc[1:] for name, df in panels.items()}
+
+    # Normalization is per date, so the new dates are normalized on their own
+    for name, (_, sign) in COMPOSITE_WEIGHTS.items():
+        panels[f"normalized_{name}"] = normalize_ratio(panels[name] * -1 if sign < 0 else panels[name])
+    panels['combined'] = combine_normalized_ratios([panels[f"normalized_{name}"] for name in COMPOSITE_WEIGHTS],
+                                                   [weight for weight, _ in COMPOSITE_WEIGHTS.values()])
+    return panels
+
+
+def _open_state(state_dir):
+    """Return (panels, portfolio) for an existing state, or None if there is none."""
+    portfolio_file = os.path.join(state_dir, PORTFOLIO_FILE)
+    if not os.path.exists(portfolio_file):
+        return None
+    with open(portfolio_file, 'r', encoding='utf-8') as f:
+        portfolio = json.load(f)
+    panels = {name: ChunkedPanel(os.path.join(state_dir, name)) for name in _SIGNAL_PANELS + ['equity']}
+    for name, panel in panels.items():
+        if len(panel.days) == 0 or str(panel.days[-1]) != portfolio['last_date']:
+            raise ValueError(f"Live state in {state_dir} is inconsistent: panel '{name}' does not end on "
+                             f"{portfolio['last_date']}. Rebuild it with rebuild=True.")
+    return panels, portfolio
+
+
+def _write_portfolio(state_dir, portfolio):
+    portfolio_file = os.path.join(state_dir, PORTFOLIO_FILE)
+    with open(portfolio_file + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(portfolio, f)
+    os.replace(portfolio_file + '.tmp', portfolio_file)
+
+
+def update_live_state(state_dir=None, symbols=None, stock_info_df=None, strategies=None, rebuild=False,
+                      candlestick_dir=None, fundamental_dir=None, initial_capital=INITIAL_CAPITAL, data_dir=None):
+    """
+    Append the trading days after the last stored date to the live signals and portfolios.
+
+    On the first call (or with rebuild=True) the state is built from the whole history through
+    the same code path, so an incremental update always equals a full rerun.
+
+    Holdings follow the strategies of create_strategy: on each rebalance date the top k stocks
+    of the tradable universe are bought in equal weights at the close, in fractional shares
+    and without costs. Unlike bt, which never rebalances on the last date of its data, the
+    latest date is rebalanced when its period starts, so the target portfolio is always current.
+
+    Parameters:
+    -----------
+    state_dir : str, optional
+        Directory of the live state. Defaults to <data_dir>/columnar/live
+    symbols : list, optional
+        Stock codes for a new state. Defaults to the A/H stocks; an existing state keeps its own.
+    stock_info_df : pandas.DataFrame, optional
+        Stock information. If None, it is loaded.
+    strategies : dict, optional
+        Strategy name -> {'signal', 'k', 'rebalance_period', 'sort_descending'} for a new state,
+        where signal is 'pb', 'pe', 'dividend_yield', 'market_cap' or 'combined'. Defaults to
+        the strategies of run_analysis.
+    rebuild : bool, optional
+        If True, discard the stored state and rebuild it from the whole history
+    candlestick_dir, fundamental_dir : str, optional
+        JSON data directories. Default to the data directory, in which case the columnar store is
+        read instead whenever it is up to date.
+    initial_capital : float, optional
+        Starting equity of each strategy in a new state
+    data_dir : str, optional
+        Root data directory holding the stock information, price and fundamental data. Defaults
+        to <project_root>/data
+
+    Returns:
+    --------
+    dict
+        'new_dates' (the appended dates), 'last_date' and 'weights' (strategy name -> target weights)
+    """
+    if state_dir is None:
+        state_dir = get_store_dir('live', data_dir)
+    if stock_info_df is None:
+        stock_info_df = load_stock_info(data_dir)
+    candlestick_store = get_store_dir('candlestick_data', data_dir) if candlestick_dir is None else None
+    fundamental_store = get_store_dir('fundamental_data', data_dir) if fundamental_dir is None else None
+    if data_dir is not None:
+        candlestick_dir = candlestick_dir or os.path.join(data_dir, 'candlestick_data')
+        fundamental_dir = fundamental_dir or os.path.join(data_dir, 'fundamental_data')
+
+    state = None if rebuild else _open_state(state_dir)
+    if state is None:
+        symbols = list(symbols) if symbols is not None else get_ah_stocks(data_dir)
+        strategies = dict(strategies or LIVE_STRATEGIES)
+        for name, spec in strategies.items():
+            if spec['signal'] not in _SIGNAL_PANELS or spec['signal'] == 'close':
+                raise ValueError(f"Unknown signal '{spec['signal']}' for strategy '{name}'")
+        calendar = build_trading_calendar(symbols, candlestick_dir, candlestick_store)
+        _, tz = from_datetime_index(calendar)
+        panels = {name: ChunkedPanel.create(os.path.join(state_dir, name), [], symbols, 'date', 'float64', tz)
+                  for name in _SIGNAL_PANELS}
+        panels['equity'] = ChunkedPanel.create(os.path.join(state_dir, 'equity'), [], list(strategies), 'date',
+                                               'float64', tz)
+        portfolio = {
+            'last_date': None,
+            'strategies': strategies,
+            'portfolios': {name: {'cash': float(initial_capital), 'shares': {}, 'weights': {}, 'rebalances': []}
+                           for name in strategies}
+        }
+        seed_close, previous = None, None
+    else:
+        panels, portfolio = state
+        stored = panels['close'].symbols
+        if symbols is not None and list(symbols) != stored:
+            raise ValueError("The live state was built for other symbols. Rebuild it with rebuild=True.")
+        if strategies is not None and dict(strategies) != portfolio['strategies']:
+            raise ValueError("The live state was built for other strategies. Rebuild it with rebuild=True.")
+        symbols, strategies = stored, portfolio['strategies']
+        calendar = build_trading_calendar(symbols, candlestick_dir, candlestick_store)
+        last_day = np.datetime64(portfolio['last_date'], 'D')
+        days, tz = from_datetime_index(calendar)
+        calendar = to_datetime_index(np.concatenate([[last_day], days[days > last_day]]), tz)
+        seed_close = panels['close'].read(slice(len(panels['close'].days) - 1, None))[0]
+        previous = calendar[0]
+
+    new_dates = calendar[1:] if seed_close is not None else calendar
+    if len(new_dates) == 0:
+        print(f"Live state is up to date as of {portfolio['last_date']}.")
+        return {'new_dates': new_dates, 'last_date': portfolio['last_date'],
+                'weights': {name: p['weights'] for name, p in portfolio['portfolios'].items()}}
+
+    print(f"Updating live state with {len(new_dates)} new trading days...")
+    new_panels = _prepare_days(symbols, stock_info_df, calendar, seed_close, candlestick_dir, fundamental_dir,
+                               candlestick_store, fundamental_store)
+    tradable = build_universe(stock_info_df, new_dates, symbols=symbols, close_df=new_panels['close'])['tradable']
+    closes = new_panels['close'].to_numpy(dtype=np.float64)
+    signals = {spec['signal']: new_panels[spec['signal']].to_numpy(dtype=np.float64) for spec in strategies.values()}
+    positions = {symbol: j for j, symbol in enumerate(symbols)}
+
+    equity = np.empty((len(new_dates), len(strategies)))
+    for i, now in enumerate(new_dates):
+        members = None
+        for s, (name, spec) in enumerate(strategies.items()):
+            held = portfolio['portfolios'][name]
+            value = held['cash'] + sum(shares * closes[i, positions[symbol]]
+                                       for symbol, shares in held['shares'].items())
+            if _is_rebalance_day(now, previous, spec['rebalance_period']):
+                if members is None:
+                    members = tradable.members(now)
+                selected = _select(signals[spec['signal']][i], symbols, members, spec['k'], spec['sort_descending'])
+                held['weights'] = {symbol: 1.0 / len(selected) for symbol in selected}
+                held['shares'] = {symbol: value * weight / closes[i, positions[symbol]]
+                                  for symbol, weight in held['weights'].items()}
+                held['cash'] = 0.0 if selected else value
+                held['rebalances'].append({'date': str(now.date()), 'selected': selected})
+            equity[i, s] = value
+        previous = now
+
+    days, _ = from_datetime_index(new_dates)
+    for name in _SIGNAL_PANELS:
+        panels[name].append(days, new_panels[name].to_numpy(dtype=np.float64))
+    panels['equity'].append(days, equity)
+    # portfolio.json is written last, so an interrupted update is detected on the next run
+    portfolio['last_date'] = str(days[-1])
+    _write_portfolio(state_dir, portfolio)
+    return {'new_dates': new_dates, 'last_date': portfolio['last_date'],
+            'weights': {name: p['weights'] for name, p in portfolio['portfolios'].items()}}
+
+
+def load_live_state(state_dir=None, data_dir=None):
+    """
+    Read the live state back into memory.
+
+    Parameters:
+    -----------
+    state_dir : str, optional
+        Directory of the live state. Defaults to <data_dir>/columnar/live
+    data_dir : str, optional
+        Root data directory, as given to update_live_state. Defaults to <project_root>/data
+
+    Returns:
+    --------
+    dict
+        One DataFrame per stored panel ('close', 'pb', 'pe', 'dividend_yield', 'market_cap',
+        'normalized_pb', 'normalized_pe', 'normalized_dividend_yield', 'combined', 'equity')
+        plus 'portfolios' with each strategy's cash, shares, weights and rebalance history
+    """
+    if state_dir is None:
+        state_dir = get_store_dir('live', data_dir)
+    state = _open_state(state_dir)
+    if state is None:
+        raise ValueError(f"No live state found in {state_dir}. Create it with update_live_state().")
+    panels, portfolio = state
+    frames = {name: panel.to_frame() for name, panel in panels.items()}
+    frames['portfolios'] = portfolio['portfolios']
+    return frames
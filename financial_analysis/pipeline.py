@@ -0,0 +1,343 @@
+"""
+Dependency-tracked execution of analysis stages.
+
+A Pipeline is a DAG of Stages. Each stage declares the stages whose outputs it takes, the
+parameters it depends on and, for stages that read data files, its source paths. A stage's
+fingerprint hashes its name, version, parameters, the size and mtime of its sources and the
+fingerprints of its inputs, so it changes exactly when something the stage depends on
+changed.
+
+When the pipeline runs:
+
+- a persisted stage whose fingerprint matches its stored artifact is skipped, make-style;
+  the artifact is only read back if a stage that does run needs it;
+- the other stages run on a thread pool as soon as their inputs are available, so
+  independent stages (the price load, the ratio loads, stock info) overlap;
+- outputs of persisted stages are pickled to <artifact_dir>/<stage>.pkl, next to a small
+  JSON file holding the fingerprint.
+"""
+
+import os
+import json
+import time
+import pickle
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from pyb.libs.instrumentation import get_recorder, span
+
+PIPELINE_VERSION = 1
+
+
+class Stage:
+    """
+    One step of a Pipeline.
+
+    Parameters:
+    -----------
+    name : str
+        Unique stage name; other stages refer to its output by it
+    func : callable
+        Called with one keyword argument per input and returns the stage's output
+    inputs : sequence or dict, optional
+        Input stage names, or a mapping of func argument name -> stage name
+    params : dict, optional
+        Parameters the output depends on besides the inputs; they are part of the fingerprint
+        (pass them to func with functools.partial or a closure)
+    sources : sequence of str, optional
+        Files or directories the stage reads; a change of any file's size or mtime re-runs it
+    outputs : sequence of str, optional
+        Files the stage writes; the stage is only up to date while they all exist
+    persist : bool, optional
+        If True, the output is stored and the stage is skipped while its fingerprint is unchanged.
+        If False, the stage runs whenever its output is needed.
+    threaded : bool, optional
+        If False, the stage runs on the calling thread (e.g. for plotting)
+    version : int, optional
+        Bump to invalidate stored artifacts after changing func
+    """
+
+    def __init__(self, name, func, inputs=(), params=None, sources=(), outputs=(), persist=True, threaded=True,
+                 version=1):
+        self.name = name
+        self.func = func
+        self.inputs = dict(inputs) if isinstance(inputs, dict) else {stage: stage for stage in inputs}
+        self.params = params or {}
+        self.sources = list(sources)
+        self.outputs = list(outputs)
+        self.persist = persist
+        self.threaded = threaded
+        self.version = version
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, inputs={sorted(self.inputs.values())})"
+
+
+def source_state(path):
+    """
+    Describe the state of a source file or directory by sizes and modification times.
+
+    A directory is described by the name, size and mtime of each file in it, so adding,
+    removing or rewriting any file changes the state.
+
+    Returns:
+    --------
+    list
+        JSON-serializable description; [] for a missing path
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return []
+    if not os.path.isdir(path):
+        return [os.path.basename(path), stat.st_size, stat.st_mtime_ns]
+    state = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_file():
+                entry_stat = entry.stat()
+                state.append([entry.name, entry_stat.st_size, entry_stat.st_mtime_ns])
+    return sorted(state)
+
+
+def value_fingerprint(value):
+    """Hash a value that is given to the pipeline instead of computed by it."""
+    return hashlib.sha256(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+
+
+class Pipeline:
+    """
+    A DAG of stages with persisted, fingerprinted artifacts.
+
+    Parameters:
+    -----------
+    stages : sequence of Stage
+        The stages; inputs must name stages of the pipeline
+    artifact_dir : str, optional
+        Directory for stored artifacts. Defaults to <project_root>/data/columnar/pipeline
+    workers : int, optional
+        Number of threads running independent stages
+    """
+
+    def __init__(self, stages, artifact_dir=None, workers=4):
+        from pyb.libs.columnar_store import get_store_dir
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage name '{stage.name}'")
+            self.stages[stage.name] = stage
+        self.artifact_dir = artifact_dir if artifact_dir is not None else get_store_dir('pipeline')
+        self.workers = workers
+        self.order = self._topological_order()
+        self.status = {}
+
+    def _topological_order(self):
+        order, state = [], {}
+
+        def visit(name, path):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Stages form a cycle: {' -> '.join(path + [name])}")
+            if name not in self.stages:
+                raise ValueError(f"Stage '{path[-1]}' takes the output of unknown stage '{name}'")
+            state[name] = 'visiting'
+            for dependency in self.stages[name].inputs.values():
+                visit(dependency, path + [name])
+            state[name] = 'done'
+            order.append(name)
+
+        for name in self.stages:
+            visit(name, [])
+        return order
+
+    def _upstream(self, targets, provided=()):
+        """The targets and every stage they depend on, up to provided stages, in topological order."""
+        needed, pending = set(), list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage '{name}'. Available stages: {list(self.stages)}")
+            if name not in needed:
+                needed.add(name)
+                if name not in provided:
+                    pending.extend(self.stages[name].inputs.values())
+        return [name for name in self.order if name in needed]
+
+    def fingerprints(self, targets=None, provided=None):
+        """
+        Compute the fingerprint of the targets and their upstream stages.
+
+        Parameters:
+        -----------
+        targets : sequence of str, optional
+            Stages of interest. Defaults to every stage.
+        provided : dict, optional
+            Stage name -> value given instead of computed; fingerprinted by content
+
+        Returns:
+        --------
+        dict
+            Stage name -> hex digest
+        """
+        provided = provided or {}
+        fingerprints = {}
+        for name in self._upstream(targets or list(self.stages), provided):
+            if name in provided:
+                fingerprints[name] = value_fingerprint(provided[name])
+                continue
+            stage = self.stages[name]
+            description = {
+                'pipeline': PIPELINE_VERSION,
+                'name': name,
+                'version': stage.version,
+                'params': stage.params,
+                'sources': {path: source_state(path) for path in stage.sources},
+                'inputs': {argument: fingerprints[dependency] for argument, dependency in stage.inputs.items()},
+            }
+            fingerprints[name] = hashlib.sha256(json.dumps(description, sort_keys=True, default=str).encode()).hexdigest()
+        return fingerprints
+
+    def _paths(self, name):
+        base = os.path.join(self.artifact_dir, name.replace(os.sep, '_').replace(':', '_'))
+        return base + '.pkl', base + '.json'
+
+    def _is_fresh(self, name, fingerprint):
+        stage = self.stages[name]
+        if not stage.persist:
+            return False
+        artifact, meta = self._paths(name)
+        try:
+            with open(meta, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return (stored.get('fingerprint') == fingerprint and os.path.exists(artifact)
+                and all(os.path.exists(path) for path in stage.outputs))
+
+    def _load(self, name):
+        with span(name, cached=True):
+            with open(self._paths(name)[0], 'rb') as f:
+                return pickle.load(f)
+
+    def _save(self, name, value, fingerprint, wall_s):
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        artifact, meta = self._paths(name)
+        # Written to temporary files and renamed, so a half-written artifact is never taken as current
+        with open(artifact + '.tmp', 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(artifact + '.tmp', artifact)
+        with open(meta + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': fingerprint, 'wall_s': wall_s, 'saved_at': time.time()}, f)
+        os.replace(meta + '.tmp', meta)
+
+    def _execute(self, name, values, fingerprint):
+        stage = self.stages[name]
+        kwargs = {argument: values[dependency] for argument, dependency in stage.inputs.items()}
+        start = time.perf_counter()
+        with span(name):
+            value = stage.func(**kwargs)
+        if stage.persist:
+            self._save(name, value, fingerprint, time.perf_counter() - start)
+        return value
+
+    def plan(self, targets=None, force=False, provided=None):
+        """
+        Decide what running the targets would do.
+
+        Returns:
+        --------
+        dict
+            Stage name -> 'provided', 'load' (stored artifact is current and needed), 'skip'
+            (current and not needed), 'unneeded' (out of date but not needed) or 'run', for the
+            targets and their upstream stages
+        """
+        provided = provided or {}
+        targets = list(targets or self.stages)
+        fingerprints = self.fingerprints(targets, provided)
+        actions = {}
+        required = set(targets)
+        upstream = self._upstream(targets, provided)
+        for name in reversed(upstream):
+            if name in provided:
+                actions[name] = 'provided'
+            elif not force and self._is_fresh(name, fingerprints[name]):
+                actions[name] = 'load' if name in required else 'skip'
+            elif name in required:
+                actions[name] = 'run'
+                required.update(self.stages[name].inputs.values())
+            else:
+                actions[name] = 'unneeded'
+        return {name: actions[name] for name in upstream}
+
+    def run(self, targets=None, force=False, provided=None):
+        """
+        Run the stages needed for the targets.
+
+        Parameters:
+        -----------
+        targets : sequence of str, optional
+            Stages whose outputs are wanted. Defaults to every stage.
+        force : bool, optional
+            If True, run every needed stage even if its artifact is current
+        provided : dict, optional
+            Stage name -> value to use instead of running the stage
+
+        Returns:
+        --------
+        dict
+            Target name -> output
+        """
+        provided = provided or {}
+        targets = list(targets or self.stages)
+        fingerprints = self.fingerprints(targets, provided)
+        actions = self.plan(targets, force, provided)
+        self.status = dict(actions)
+        for name, action in actions.items():
+            if action in ('load', 'skip'):
+                print(f"Skipping stage {name} (up to date)")
+            elif action == 'unneeded':
+                print(f"Skipping stage {name} (not needed)")
+
+        values = {name: provided[name] for name, action in actions.items() if action == 'provided'}
+        waiting = [name for name, action in actions.items() if action in ('load', 'run')]
+        running = {}
+        # cProfile and tracemalloc peaks are process-wide, so profiled or memory-traced stages run one at a
+        # time on the calling thread; concurrent profilers fail and concurrent peak resets mix stages
+        recorder = get_recorder()
+        serial = recorder is not None and bool(recorder.profile_dir or recorder.trace_memory)
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            try:
+                while waiting or running:
+                    ready = [name for name in waiting
+                             if actions[name] == 'load'
+                             or all(dependency in values for dependency in self.stages[name].inputs.values())]
+                    inline = []
+                    for name in ready:
+                        waiting.remove(name)
+                        if actions[name] == 'run':
+                            # Printed here rather than in the workers so lines of concurrent stages do not interleave
+                            print(f"Running stage {name}...")
+                        if serial or (actions[name] == 'run' and not self.stages[name].threaded):
+                            inline.append(name)
+                        elif actions[name] == 'load':
+                            running[executor.submit(self._load, name)] = name
+                        else:
+                            running[executor.submit(self._execute, name, values, fingerprints[name])] = name
+                    for name in inline:
+                        if actions[name] == 'load':
+                            values[name] = self._load(name)
+                        else:
+                            values[name] = self._execute(name, values, fingerprints[name])
+                    if inline:
+                        continue
+                    if not running:
+                        raise RuntimeError(f"Stages {waiting} can never run")
+                    done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        values[running.pop(future)] = future.result()
+            except BaseException:
+                for future in running:
+                    future.cancel()
+                raise
+        return {name: values[name] for name in targets}
@@ -1,3 +1,31 @@
 """
 Financial ratios module for different types of financial ratios.
-""" 
\ No newline at end of file
+"""
+
+from .._lazy import lazy_attributes
+
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    'financial_ratios': None,
+    'RatioLoader': '.financial_ratios',
+    'PriceToBookRatio': '.financial_ratios',
+    'PriceToEarningsRatio': '.financial_ratios',
+    'DividendYieldRatio': '.financial_ratios',
+    'MarketCapitalization': '.financial_ratios',
+    'normalize_ratio': '.financial_ratios',
+    'combine_normalized_ratios': '.financial_ratios',
+    'create_combined_ratio': '.financial_ratios',
+    'load_and_prepare_ratios': '.financial_ratios',
+    'create_value_composite': '.financial_ratios',
+    'factor_evaluation': None,
+    'forward_returns': '.factor_evaluation',
+    'rank_ic': '.factor_evaluation',
+    'summarize_ic': '.factor_evaluation',
+    'ic_decay': '.factor_evaluation',
+    'quantile_returns': '.factor_evaluation',
+    'factor_turnover': '.factor_evaluation',
+    'evaluate_factors': '.factor_evaluation',
+    'neutralization': None,
+    'neutralize': '.neutralization',
+    'neutralize_ratios': '.neutralization',
+    'sector_labels': '.neutralization',
+})
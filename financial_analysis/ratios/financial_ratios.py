@@ -22,7 +22,7 @@ class RatioLoader:
         """
         self.ratio_name = ratio_name
     
-    def load_ratio(self, stock_codes):
+    def load_ratio(self, stock_codes, calendar=None, compact=False, fundamental_dir=None):
         """
         Load ratio data for the given stock codes.
         
@@ -30,16 +30,28 @@ class RatioLoader:
         -----------
         stock_codes : list
             List of stock codes to load
+        calendar : pandas.DatetimeIndex, optional
+            Trading calendar to align on. If given, the ratio is placed on it as of each
+            trading day (see financial_analysis.data.panel.build_fundamental_panel).
+        compact : bool, optional
+            If True, load float32 values
+        fundamental_dir : str, optional
+            Directory containing fundamental JSON files. Defaults to <project_root>/data/fundamental_data
             
         Returns:
         --------
         pandas.DataFrame
             DataFrame containing ratio data
         """
-        ratio_df = pyb.get_fundamental_data(symbols=stock_codes, ratio=self.ratio_name, output_format='bt')
+        if calendar is not None:
+            from financial_analysis.data.panel import build_fundamental_panel
+            return build_fundamental_panel(stock_codes, calendar, self.ratio_name, fundamental_dir,
+                                           dtype='float32' if compact else 'float64')
+        ratio_df = pyb.get_fundamental_data(symbols=stock_codes, ratio=self.ratio_name, output_format='bt',
+                                            fundamental_dir=fundamental_dir, compact=compact)
         return ratio_df
     
-    def prepare_ratio_for_analysis(self, ratio_df, close_df_filtered):
+    def prepare_ratio_for_analysis(self, ratio_df, close_df_filtered, compact=False):
         """
         Prepare ratio data for analysis.
         
@@ -49,13 +61,15 @@ class RatioLoader:
             DataFrame containing ratio data
         close_df_filtered : pandas.DataFrame
             Filtered DataFrame containing close price data
+        compact : bool, optional
+            If True, filter without intermediate copies and return float32 values
             
         Returns:
         --------
         pandas.DataFrame
             Filtered ratio DataFrame
         """
-        return filter_factors_by_first_close(close_df_filtered, ratio_df)
+        return filter_factors_by_first_close(close_df_filtered, ratio_df, compact=compact)
 
 
 class PriceToBookRatio(RatioLoader):
@@ -90,6 +104,53 @@ class MarketCapitalization(RatioLoader):
         super().__init__('mc')
 
 
+def normalize_ratio(ratio_df):
+    """
+    Min-max normalize a ratio across all stocks for each date.
+    
+    Parameters:
+    -----------
+    ratio_df : pandas.DataFrame
+        DataFrame containing a financial ratio
+        
+    Returns:
+    --------
+    pandas.DataFrame
+        Normalized ratio DataFrame; dates without spread are left as they are
+    """
+    df_normalized = ratio_df.copy()
+    for date in ratio_df.index:
+        row = ratio_df.loc[date]
+        if not row.isna().all():
+            min_val = row.min(skipna=True)
+            max_val = row.max(skipna=True)
+            if max_val > min_val:  # Avoid division by zero
+                df_normalized.loc[date] = (row - min_val) / (max_val - min_val)
+    return df_normalized
+
+
+def combine_normalized_ratios(normalized_dfs, weights):
+    """
+    Combine normalized ratios with the given weights; missing values contribute zero.
+    
+    Parameters:
+    -----------
+    normalized_dfs : list of pandas.DataFrame
+        Normalized ratio DataFrames, as returned by normalize_ratio
+    weights : list of float
+        Weights to apply to each ratio
+        
+    Returns:
+    --------
+    pandas.DataFrame
+        Combined ratio DataFrame
+    """
+    combined_df = pd.DataFrame(index=normalized_dfs[0].index, columns=normalized_dfs[0].columns)
+    for i, df in enumerate(normalized_dfs):
+        combined_df = combined_df.fillna(0) + df.fillna(0) * weights[i]
+    return combined_df
+
+
 def create_combined_ratio(ratio_dfs, weights):
     """
     Create a combined ratio from multiple financial ratios with given weights.
@@ -113,29 +174,14 @@ def create_combined_ratio(ratio_dfs, weights):
         raise ValueError("Weights must sum to 1.0")
     
     # Normalize each ratio DataFrame
-    normalized_dfs = []
-    for df in ratio_dfs:
-        # Simple min-max normalization across all stocks for each date
-        df_normalized = df.copy()
-        for date in df.index:
-            row = df.loc[date]
-            if not row.isna().all():
-                min_val = row.min(skipna=True)
-                max_val = row.max(skipna=True)
-                if max_val > min_val:  # Avoid division by zero
-                    df_normalized.loc[date] = (row - min_val) / (max_val - min_val)
-        normalized_dfs.append(df_normalized)
+    normalized_dfs = [normalize_ratio(df) for df in ratio_dfs]
     
     # Combine normalized ratios with weights
-    combined_df = pd.DataFrame(index=ratio_dfs[0].index, columns=ratio_dfs[0].columns)
-    for i, df in enumerate(normalized_dfs):
-        combined_df = combined_df.fillna(0) + df.fillna(0) * weights[i]
-    
-    return combined_df
+    return combine_normalized_ratios(normalized_dfs, weights)
 
 
 # Helper functions for common ratio operations
-def load_and_prepare_ratios(stock_codes, close_df_filtered):
+def load_and_prepare_ratios(stock_codes, close_df_filtered, aligned=False, compact=False):
     """
     Load and prepare all common financial ratios.
     
@@ -145,6 +191,11 @@ def load_and_prepare_ratios(stock_codes, close_df_filtered):
         List of stock codes to load
     close_df_filtered : pandas.DataFrame
         Filtered DataFrame containing close price data
+    aligned : bool, optional
+        If True, load the ratios as of each date of close_df_filtered's index, so every
+        ratio DataFrame shares the price index
+    compact : bool, optional
+        If True, load and filter the ratios as float32 values
         
     Returns:
     --------
@@ -158,16 +209,17 @@ def load_and_prepare_ratios(stock_codes, close_df_filtered):
     mc_loader = MarketCapitalization()
     
     # Load ratio data
-    pb_df = pb_loader.load_ratio(stock_codes)
-    pe_df = pe_loader.load_ratio(stock_codes)
-    dyr_df = dyr_loader.load_ratio(stock_codes)
-    mc_df = mc_loader.load_ratio(stock_codes)
+    calendar = close_df_filtered.index if aligned else None
+    pb_df = pb_loader.load_ratio(stock_codes, calendar, compact)
+    pe_df = pe_loader.load_ratio(stock_codes, calendar, compact)
+    dyr_df = dyr_loader.load_ratio(stock_codes, calendar, compact)
+    mc_df = mc_loader.load_ratio(stock_codes, calendar, compact)
     
     # Prepare ratio data for analysis
-    pb_df_filtered = pb_loader.prepare_ratio_for_analysis(pb_df, close_df_filtered)
-    pe_df_filtered = pe_loader.prepare_ratio_for_analysis(pe_df, close_df_filtered)
-    dyr_df_filtered = dyr_loader.prepare_ratio_for_analysis(dyr_df, close_df_filtered)
-    mc_df_filtered = mc_loader.prepare_ratio_for_analysis(mc_df, close_df_filtered)
+    pb_df_filtered = pb_loader.prepare_ratio_for_analysis(pb_df, close_df_filtered, compact)
+    pe_df_filtered = pe_loader.prepare_ratio_for_analysis(pe_df, close_df_filtered, compact)
+    dyr_df_filtered = dyr_loader.prepare_ratio_for_analysis(dyr_df, close_df_filtered, compact)
+    mc_df_filtered = mc_loader.prepare_ratio_for_analysis(mc_df, close_df_filtered, compact)
     
     return {
         'pb': pb_df_filtered,
@@ -0,0 +1,150 @@
+"""
+Cross-sectional sector and size neutralization of factors.
+
+Value ratios such as PB and PE differ systematically between sectors and with company
+size, so ranking stocks on the raw ratio mostly picks sectors and sizes. Neutralization
+regresses the factor across stocks on sector dummies and log market cap at every date and
+keeps the residual. The regressions of all dates are solved together: the normal equations
+of every date are assembled from a few (dates x stocks) @ (stocks x sectors) products and
+solved as one stack of small systems, without a loop over dates.
+"""
+
+import numpy as np
+import pandas as pd
+
+UNKNOWN_SECTOR = 'unknown'
+
+
+def sector_labels(stock_info_df, symbols):
+    """
+    Look up the sector of each symbol in stock info.
+
+    Parameters:
+    -----------
+    stock_info_df : pandas.DataFrame
+        Stock information with 'stockCode' and 'sector' columns
+    symbols : sequence
+        Stock codes
+
+    Returns:
+    --------
+    pandas.Series
+        Sector per symbol, 'unknown' where stock info has none
+    """
+    info = stock_info_df.drop_duplicates('stockCode').set_index('stockCode')
+    if 'sector' not in info:
+        return pd.Series(UNKNOWN_SECTOR, index=pd.Index(symbols))
+    return info['sector'].reindex(pd.Index(symbols)).fillna(UNKNOWN_SECTOR).astype(str)
+
+
+def neutralize(factor_df, sectors=None, market_cap_df=None, min_stocks=None):
+    """
+    Remove the sector and size components from a factor at every date.
+
+    At each date the factor is regressed across stocks on sector dummies (or an intercept
+    when no sectors are given) and the cross-sectionally centered log market cap, and the
+    residual is returned. Stocks without a factor value or a positive market cap get NaN.
+
+    Parameters:
+    -----------
+    factor_df : pandas.DataFrame
+        Factor with dates as index and stock codes as columns
+    sectors : pandas.Series, optional
+        Sector per stock code (see sector_labels). If None, only size is removed.
+    market_cap_df : pandas.DataFrame, optional
+        Market cap on factor_df's dates and stocks. If None, only sectors are removed.
+    min_stocks : int, optional
+        Dates with fewer usable stocks get NaN; defaults to the number of regressors plus one
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Residual factor with factor_df's index, columns and dtype
+    """
+    if sectors is None and market_cap_df is None:
+        raise ValueError("Nothing to neutralize against: give sectors and/or market_cap_df")
+    y = factor_df.to_numpy(dtype=np.float64)
+    valid = np.isfinite(y)
+    n_stocks = y.shape[1]
+
+    if sectors is not None:
+        labels = pd.Series(sectors).reindex(factor_df.columns).fillna(UNKNOWN_SECTOR).astype(str)
+        codes, _ = pd.factorize(labels)
+        dummies = np.zeros((n_stocks, codes.max() + 1 if n_stocks else 0))
+        dummies[np.arange(n_stocks), codes] = 1.0
+    else:
+        dummies = np.ones((n_stocks, 1))
+    n_groups = dummies.shape[1]
+
+    size = None
+    if market_cap_df is not None:
+        market_cap = market_cap_df.reindex(index=factor_df.index, columns=factor_df.columns).to_numpy(dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            size = np.log(np.where(market_cap > 0, market_cap, np.nan))
+        valid &= np.isfinite(size)
+    weight = valid.astype(np.float64)
+    y = np.where(valid, y, 0.0)
+    count = weight.sum(axis=1)
+
+    n_params = n_groups + (size is not None)
+    normal = np.zeros((len(y), n_params, n_params))
+    moments = np.zeros((len(y), n_params))
+    groups = np.arange(n_groups)
+    # Sector dummies are exclusive, so their block of the normal equations is diagonal
+    normal[:, groups, groups] = weight @ dummies
+    moments[:, :n_groups] = y @ dummies
+    if size is not None:
+        # Centering size per date leaves the residuals unchanged (the dummies span the intercept)
+        # and keeps the systems well conditioned
+        size = np.where(valid, size, 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            size = np.where(valid, size - (size.sum(axis=1) / count)[:, None], 0.0)
+        cross = size @ dummies
+        normal[:, :n_groups, n_groups] = cross
+        normal[:, n_groups, :n_groups] = cross
+        normal[:, n_groups, n_groups] = (size * size).sum(axis=1)
+        moments[:, n_groups] = (size * y).sum(axis=1)
+
+    # Sectors without stocks on a date make their system singular; the pseudo-inverse gives them zero weight
+    beta = (np.linalg.pinv(normal) @ moments[..., None])[..., 0]
+    fitted = beta[:, :n_groups] @ dummies.T
+    if size is not None:
+        fitted += beta[:, n_groups:] * size
+    residual = np.where(valid, y - fitted, np.nan)
+    if min_stocks is None:
+        min_stocks = n_params + 1
+    residual[count < min_stocks] = np.nan
+    dtype = factor_df.dtypes.iloc[0] if len(factor_df.columns) else np.float64
+    return pd.DataFrame(residual.astype(dtype, copy=False), index=factor_df.index, columns=factor_df.columns)
+
+
+def neutralize_ratios(ratios, stock_info_df, names=('pb', 'pe', 'dividend_yield'), sector=True, size=True):
+    """
+    Neutralize the ratios from load_and_prepare_ratios against sector and size.
+
+    Parameters:
+    -----------
+    ratios : dict
+        Dictionary of filtered ratio DataFrames, including 'market_cap' when size is True
+    stock_info_df : pandas.DataFrame
+        Stock information with a 'sector' column
+    names : sequence of str, optional
+        Ratios to neutralize; the others are returned unchanged
+    sector : bool, optional
+        If True, remove sector means
+    size : bool, optional
+        If True, remove the log market cap component
+
+    Returns:
+    --------
+    dict
+        Copy of ratios with the named entries replaced by their residuals, ready for
+        create_value_composite and create_combined_ratio
+    """
+    neutralized = dict(ratios)
+    market_cap_df = ratios['market_cap'] if size else None
+    for name in names:
+        factor_df = ratios[name]
+        sectors = sector_labels(stock_info_df, factor_df.columns) if sector else None
+        neutralized[name] = neutralize(factor_df, sectors, market_cap_df)
+    return neutralized
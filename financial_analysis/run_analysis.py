@@ -2,23 +2,22 @@
 Main script to run financial ratio analysis.
 """
 
+import os
+from functools import partial
+
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+
+from pyb.libs import instrumentation
+from pyb.libs.instrumentation import span
 
 # Import modules
-from financial_analysis.data.loading import load_and_filter_price_data, load_stock_info, get_ah_stocks
-from financial_analysis.ratios.financial_ratios import (
-    load_and_prepare_ratios,
-    create_value_composite
-)
-from financial_analysis.strategies.backtest import (
-    create_pb_strategy,
-    create_pe_strategy,
-    create_dividend_strategy,
-    create_combined_strategy,
-    run_backtest
-)
+from financial_analysis.data.loading import load_stock_info, get_ah_stocks
+from financial_analysis.data.universe import build_universe
+from financial_analysis.ratios.financial_ratios import create_value_composite
+from financial_analysis.ratios.neutralization import neutralize_ratios
+from financial_analysis.strategies.result_store import cached_backtest, get_result_store
+from pyb.libs.columnar_store import get_store_dir
 from financial_analysis.visualization.analysis import (
     compare_strategies_performance,
     display_strategy_stats,
@@ -29,65 +28,521 @@ from financial_analysis.visualization.analysis import (
 )
 
 
-def main():
-    """Run the main analysis."""
-    # 1. Load data
-    print("Loading data...")
-    stocks_info = load_stock_info()
-    ah_stocks = get_ah_stocks()
-    close_df, close_df_filtered = load_and_filter_price_data(ah_stocks, stocks_info)
-    
-    # 2. Load and prepare ratios
-    print("Preparing financial ratios...")
-    ratios = load_and_prepare_ratios(ah_stocks, close_df_filtered)
-    
-    # 3. Create combined value ratio
+# Signal name -> sort_descending (higher is better)
+SWEEP_SIGNALS = {
+    'pb': False,
+    'pe': False,
+    'dividend_yield': True,
+    'combined': False,
+}
+
+# Strategy name -> signal name of the main analysis
+STRATEGY_SIGNALS = {
+    'PB Strategy': 'pb',
+    'PE Strategy': 'pe',
+    'Dividend Strategy': 'dividend_yield',
+    'Combined Strategy': 'combined',
+}
+
+
+def build_analysis_pipeline(output_dir='.', aligned=False, compact=False, neutralize=False, cache=True,
+                            workers=4, artifact_dir=None, weighting='equal', data_dir=None):
+    """
+    Express the analysis as a DAG of stages (see financial_analysis.pipeline).
+
+    Stock info, the price load and the four ratio loads are independent and run concurrently;
+    the filtered prices, prepared ratios, composite and universe are stored as artifacts and
+    skipped while the data files and options they derive from are unchanged. The backtests
+    are not stored here because the result store already keeps them.
+
+    Parameters:
+    -----------
+    output_dir : str, optional
+        Directory where the 'plots' stage saves the figures
+    aligned, compact, neutralize : bool, optional
+        As for load_analysis_inputs
+    cache : bool, optional
+        If True, the backtest stages read identical backtests back from the result store
+    workers : int, optional
+        Number of stages run at the same time
+    artifact_dir : str, optional
+        Directory for the stage artifacts. Defaults to <data_dir>/columnar/pipeline
+    weighting : str, optional
+        Weighting of the selected stocks in the backtests: 'equal', 'inv_vol', 'min_variance' or 'risk_parity'
+    data_dir : str, optional
+        Root data directory holding the stock information, price and fundamental data and the
+        result store. Defaults to <project_root>/data
+
+    Returns:
+    --------
+    financial_analysis.pipeline.Pipeline
+        Pipeline whose 'inputs' stage yields the dict of load_analysis_inputs, whose 'plots'
+        stage saves the figures and whose 'stats' stage prints the performance statistics
+    """
+    from financial_analysis.pipeline import Pipeline, Stage
+    from financial_analysis.data.loading import load_price_data
+    from financial_analysis.ratios.financial_ratios import (
+        PriceToBookRatio, PriceToEarningsRatio, DividendYieldRatio, MarketCapitalization
+    )
+    from pyb.paths import get_data_dir
+
+    if data_dir is None:
+        data_dir = get_data_dir()
+    stock_info_path = os.path.join(data_dir, 'stock_info.json')
+    candlestick_dir = os.path.join(data_dir, 'candlestick_data')
+    fundamental_dir = os.path.join(data_dir, 'fundamental_data')
+    options = {'aligned': aligned, 'compact': compact}
+    stages = [
+        Stage('stocks_info', partial(load_stock_info, data_dir), sources=[stock_info_path]),
+        # Only the A/H stocks' files are read; the backtests are restricted by the universe bitmaps
+        Stage('ah_stocks', partial(get_ah_stocks, data_dir), sources=[stock_info_path]),
+        Stage('close_df', partial(load_price_data, data_dir=candlestick_dir, aligned=aligned, compact=compact),
+              inputs={'stock_codes': 'ah_stocks'}, params=options, sources=[candlestick_dir]),
+        Stage('close_df_filtered', partial(_listed_prices, compact=compact),
+              inputs={'close_df': 'close_df', 'stock_info_df': 'stocks_info'}, params=options),
+    ]
+
+    loaders = {'pb': PriceToBookRatio(), 'pe': PriceToEarningsRatio(), 'dividend_yield': DividendYieldRatio(),
+               'market_cap': MarketCapitalization()}
+    for name, loader in loaders.items():
+        inputs = {'stock_codes': 'ah_stocks'}
+        if aligned:
+            # Aligned ratios are built as of the price calendar, so they wait for the prices
+            inputs['close_df_filtered'] = 'close_df_filtered'
+        stages.append(Stage(f'raw_{name}', partial(_load_ratio, loader, compact=compact,
+                                                   fundamental_dir=fundamental_dir), inputs=inputs,
+                            params=options, sources=[fundamental_dir]))
+        stages.append(Stage(name, partial(loader.prepare_ratio_for_analysis, compact=compact),
+                            inputs={'ratio_df': f'raw_{name}', 'close_df_filtered': 'close_df_filtered'},
+                            params=options))
+
+    def collect_ratios(stocks_info, **ratios):
+        if neutralize:
+            print("Neutralizing ratios against sector and size...")
+            with span('neutralize'):
+                return neutralize_ratios(ratios, stocks_info)
+        return ratios
+
+    def collect_inputs(**inputs):
+        return inputs
+
+    stages += [
+        # Without neutralization the dict only regroups stored frames, so it is not stored again
+        Stage('ratios', collect_ratios, inputs=['stocks_info'] + list(loaders), params={'neutralize': neutralize},
+              persist=neutralize),
+        Stage('combined', create_value_composite, inputs={'ratios': 'ratios'}),
+        Stage('universe', lambda stocks_info, close_df_filtered: build_universe(
+            stocks_info, close_df_filtered.index, close_df=close_df_filtered),
+              inputs=['stocks_info', 'close_df_filtered']),
+        Stage('inputs', collect_inputs, inputs=['stocks_info', 'close_df_filtered', 'ratios', 'combined', 'universe'],
+              persist=False),
+    ]
+
+    store = _result_store(data_dir) if cache else None
+    for name, signal in STRATEGY_SIGNALS.items():
+        def backtest(inputs, name=name, signal=signal):
+            signal_df = inputs['combined'] if signal == 'combined' else inputs['ratios'][signal]
+            return cached_backtest(name, signal_df, inputs['close_df_filtered'], sort_descending=SWEEP_SIGNALS[signal],
+                                   universe=_tradable(inputs), store=store, weighting=weighting)
+        stages.append(Stage(f'backtest:{name}', backtest, inputs=['inputs'], params={'weighting': weighting},
+                            persist=False))
+
+    figures = ['strategy_performance.png', 'sector_allocation.png', 'rolling_returns.png', 'drawdowns.png']
+    backtests = {name: f'backtest:{name}' for name in STRATEGY_SIGNALS}
+
+    def plots(inputs, **results):
+        os.makedirs(output_dir, exist_ok=True)
+        _plot_results({name: results[name] for name in STRATEGY_SIGNALS}, inputs['stocks_info'], output_dir)
+        return figures
+
+    def stats(**results):
+        display_strategy_stats({name: results[name] for name in STRATEGY_SIGNALS})
+
+    # matplotlib is not thread-safe, so the plots are drawn on the calling thread
+    stages.append(Stage('plots', plots, inputs={'inputs': 'inputs', **backtests},
+                        params={'output_dir': os.path.abspath(output_dir)},
+                        outputs=[os.path.join(output_dir, figure) for figure in figures], threaded=False))
+    # The statistics are printed on every run, also when the stored figures are current
+    stages.append(Stage('stats', stats, inputs=backtests, persist=False, threaded=False))
+    if artifact_dir is None:
+        artifact_dir = get_store_dir('pipeline', data_dir)
+    return Pipeline(stages, artifact_dir=artifact_dir, workers=workers)
+
+
+def _listed_prices(close_df, stock_info_df, compact=False):
+    """Mask the prices before each stock's IPO with the universe's post_ipo bitmap and forward fill them."""
+    from financial_analysis.data.panel import asof_fill
+    from financial_analysis.data.preprocessing import COMPACT_DTYPE
+    post_ipo = build_universe(stock_info_df, close_df.index, symbols=list(close_df.columns))['post_ipo']
+    if compact:
+        values = close_df.to_numpy(dtype=COMPACT_DTYPE, copy=True)
+        values[~post_ipo.to_mask()] = np.nan
+        return pd.DataFrame(asof_fill(values), index=close_df.index, columns=close_df.columns)
+    return post_ipo.apply(close_df).ffill()
+
+
+def _load_ratio(loader, stock_codes, close_df_filtered=None, compact=False, fundamental_dir=None):
+    """Load a ratio, as of the price calendar when the filtered prices are given."""
+    calendar = close_df_filtered.index if close_df_filtered is not None else None
+    return loader.load_ratio(stock_codes, calendar, compact, fundamental_dir)
+
+
+def load_analysis_inputs(aligned=False, compact=False, chunked=False, memory_budget_mb=None, neutralize=False,
+                         workers=4, rebuild=False, data_dir=None):
+    """
+    Load every input the analysis needs: stock info, prices, ratios and the value composite.
+
+    The inputs are built by the stages of build_analysis_pipeline: independent loads run
+    concurrently and stages whose data files and options are unchanged are read back from
+    their stored artifacts.
+
+    Parameters:
+    -----------
+    aligned : bool, optional
+        If True, prices and ratios are built on the master trading calendar and share one index
+    compact : bool, optional
+        If True, prices and ratios are loaded and filtered as float32 values
+    chunked : bool, optional
+        If True, prices and ratios are prepared out of core in symbol chunks and the composite in
+        date slices (see financial_analysis.data.chunked); implies aligned and compact
+    memory_budget_mb : float, optional
+        Memory budget per chunk for chunked preparation
+    neutralize : bool, optional
+        If True, PB, PE and dividend yield are replaced by their residuals after removing sector
+        and log market cap at every date (see financial_analysis.ratios.neutralization), and the
+        composite is built from them
+    workers : int, optional
+        Number of pipeline stages run at the same time
+    rebuild : bool, optional
+        If True, every stage runs even if its stored artifact is current
+    data_dir : str, optional
+        Root data directory. Defaults to <project_root>/data
+
+    Returns:
+    --------
+    dict
+        Dictionary with 'stocks_info', 'close_df_filtered', 'ratios', 'combined' and 'universe' entries
+    """
+    if chunked:
+        if neutralize:
+            raise ValueError("Neutralization needs whole ratio panels and is not available with chunked preparation")
+        return _load_chunked_inputs(memory_budget_mb, data_dir)
+
+    print("Loading data and preparing financial ratios...")
+    pipeline = build_analysis_pipeline(aligned=aligned, compact=compact, neutralize=neutralize, workers=workers,
+                                       data_dir=data_dir)
+    return pipeline.run(['inputs'], force=rebuild)['inputs']
+
+
+def _load_chunked_inputs(memory_budget_mb=None, data_dir=None):
+    """Prepare the analysis inputs with the out-of-core chunked pipeline and read them back."""
+    from financial_analysis.data.chunked import prepare_chunked, chunked_value_composite, DEFAULT_MEMORY_BUDGET_MB
+    if memory_budget_mb is None:
+        memory_budget_mb = DEFAULT_MEMORY_BUDGET_MB
+
+    print("Preparing data in symbol chunks...")
+    with span('load'):
+        stocks_info = load_stock_info(data_dir)
+        ah_stocks = get_ah_stocks(data_dir)
+        panels = prepare_chunked(ah_stocks, stocks_info, memory_budget_mb=memory_budget_mb, data_dir=data_dir)
+
     print("Creating combined value ratio...")
-    combined_ratio = create_value_composite(ratios)
-    
-    # 4. Create strategies
-    print("Creating strategies...")
-    strategies = {
-        'PB Strategy': create_pb_strategy(ratios['pb']),
-        'PE Strategy': create_pe_strategy(ratios['pe']),
-        'Dividend Strategy': create_dividend_strategy(ratios['dividend_yield']),
-        'Combined Strategy': create_combined_strategy(combined_ratio)
+    with span('composite'):
+        combined = chunked_value_composite(panels, memory_budget_mb=memory_budget_mb)
+
+    # The backtests need whole panels, so only the prepared results are read back into memory
+    with span('ratios'):
+        ratios = {name: panels[key].to_frame()
+                  for name, key in (('pb', 'pb'), ('pe', 'pe_ttm'), ('dividend_yield', 'dyr'), ('market_cap', 'mc'))}
+        close_df_filtered = panels['close'].to_frame()
+
+    with span('universe'):
+        universe = build_universe(stocks_info, close_df_filtered.index, close_df=close_df_filtered)
+
+    return {
+        'stocks_info': stocks_info,
+        'close_df_filtered': close_df_filtered,
+        'ratios': ratios,
+        'combined': combined.to_frame(),
+        'universe': universe
     }
-    
-    # 5. Run backtests
-    print("Running backtests...")
-    results = {}
-    for name, strategy in strategies.items():
-        results[name] = run_backtest(strategy, close_df_filtered, name)
-    
-    # 6. Analyze and visualize results
+
+
+def _result_store(data_dir=None):
+    """Return the result store of a data directory (defaults to <project_root>/data)."""
+    return get_result_store(get_store_dir('results', data_dir))
+
+
+def _tradable(inputs):
+    """Return the bitmap of listed A/H stocks with a price, or None if the inputs carry no universe."""
+    universe = inputs.get('universe')
+    return universe.combine('tradable', 'ah') if universe is not None else None
+
+
+def main(output_dir='.', inputs=None, report_file=None, profile_dir=None, trace_memory=False, cache=True,
+         weighting='equal', **load_options):
+    """
+    Run the main analysis.
+
+    Parameters:
+    -----------
+    output_dir : str, optional
+        Directory where the figures are saved
+    inputs : dict, optional
+        Pre-loaded inputs from load_analysis_inputs. If None, they are loaded.
+    report_file : str, optional
+        If given, time and memory per stage plus API request metrics are written to this JSON file
+    profile_dir : str, optional
+        If given, each stage is profiled with cProfile and dumped to <profile_dir>/<stage>.prof
+    trace_memory : bool, optional
+        If True, record tracemalloc peaks and top allocation sites per stage in the report
+    cache : bool, optional
+        If True, backtest results are kept in the result store and identical backtests are
+        read back from it instead of being run again, and pipeline stages that are up to date
+        are skipped. If False, every stage runs.
+    weighting : str, optional
+        Weighting of the selected stocks: 'equal', 'inv_vol', 'min_variance' or 'risk_parity'
+    **load_options
+        Keyword arguments for load_analysis_inputs (aligned, compact, chunked, memory_budget_mb, neutralize,
+        workers, rebuild, data_dir), used when inputs are loaded here; data_dir also locates the
+        result store and the pipeline artifacts
+    """
+    instrumented = report_file is not None or profile_dir is not None
+    if instrumented:
+        recorder = instrumentation.enable(trace_memory=trace_memory, profile_dir=profile_dir)
+    try:
+        _run(output_dir, inputs, load_options, cache, weighting)
+    finally:
+        if instrumented:
+            instrumentation.disable()
+            if report_file is not None:
+                recorder.write_report(report_file)
+                print(f"Run report saved to {report_file}")
+
+
+def _run(output_dir, inputs, load_options, cache=True, weighting='equal'):
+    """Run the analysis pipeline, recording a span per stage."""
+    load_options = dict(load_options)
+    workers = load_options.pop('workers', 4)
+    rebuild = load_options.pop('rebuild', False)
+    if inputs is None and load_options.get('chunked'):
+        inputs = load_analysis_inputs(**load_options)
+    pipeline = build_analysis_pipeline(output_dir, aligned=load_options.get('aligned', False),
+                                       compact=load_options.get('compact', False),
+                                       neutralize=load_options.get('neutralize', False), cache=cache,
+                                       workers=workers, weighting=weighting, data_dir=load_options.get('data_dir'))
+    # Inputs loaded elsewhere replace the loading stages
+    provided = {'inputs': inputs} if inputs is not None else None
+    pipeline.run(['plots', 'stats'], force=rebuild or not cache, provided=provided)
+    print("Analysis complete!")
+
+
+def _plot_results(results, stocks_info, output_dir):
+    """Save the comparison figures of the backtests."""
     print("Analyzing results...")
-    
     # Performance comparison
     fig1 = compare_strategies_performance(results)
-    fig1.savefig('strategy_performance.png')
-    
-    # Display performance statistics
-    display_strategy_stats(results)
-    
+    fig1.savefig(os.path.join(output_dir, 'strategy_performance.png'))
+
     # Sector analysis
     sector_weights = {}
     for name, result in results.items():
         sector_weights[name] = analyze_sector_performance(result, stocks_info)
-    
+
     # Plot sector comparisons
     fig2 = plot_sector_comparisons(sector_weights)
-    fig2.savefig('sector_allocation.png')
-    
+    fig2.savefig(os.path.join(output_dir, 'sector_allocation.png'))
+
     # Rolling returns
     fig3 = plot_rolling_returns(results)
-    fig3.savefig('rolling_returns.png')
-    
+    fig3.savefig(os.path.join(output_dir, 'rolling_returns.png'))
+
     # Drawdowns
     fig4 = plot_drawdowns(results)
-    fig4.savefig('drawdowns.png')
-    
-    print("Analysis complete!")
+    fig4.savefig(os.path.join(output_dir, 'drawdowns.png'))
+
+
+def run_sweep(signals=('pb', 'pe', 'dividend_yield', 'combined'), k_values=(20, 50, 100),
+              rebalance_periods=('monthly', 'quarterly'), inputs=None, output_file=None, cache=True,
+              weightings=('equal',), **load_options):
+    """
+    Backtest every combination of signal, portfolio size, rebalance period and weighting.
+
+    Data is loaded once and shared by all backtests.
+
+    Parameters:
+    -----------
+    signals : sequence of str, optional
+        Signal names, any of 'pb', 'pe', 'dividend_yield' and 'combined'
+    k_values : sequence of int, optional
+        Numbers of securities to select
+    rebalance_periods : sequence of str, optional
+        Rebalance periods: 'quarterly', 'monthly', or 'weekly'
+    inputs : dict, optional
+        Pre-loaded inputs from load_analysis_inputs. If None, they are loaded.
+    output_file : str, optional
+        If given, the summary table is also written to this CSV file
+    cache : bool, optional
+        If True, identical backtests are read back from the result store instead of being run again
+    weightings : sequence of str, optional
+        Weightings of the selected stocks: 'equal', 'inv_vol', 'min_variance' or 'risk_parity'
+    **load_options
+        Keyword arguments for load_analysis_inputs, used when inputs are loaded here
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per combination with CAGR, daily Sharpe and max drawdown
+    """
+    if inputs is None:
+        inputs = load_analysis_inputs(**load_options)
+    close_df_filtered = inputs['close_df_filtered']
+    universe = _tradable(inputs)
+    store = _result_store(load_options.get('data_dir')) if cache else None
+
+    rows = []
+    for signal in signals:
+        if signal not in SWEEP_SIGNALS:
+            raise ValueError(f"Unknown signal '{signal}'. Expected one of {list(SWEEP_SIGNALS)}")
+        sort_descending = SWEEP_SIGNALS[signal]
+        signal_df = inputs['combined'] if signal == 'combined' else inputs['ratios'][signal]
+        for k in k_values:
+            for period in rebalance_periods:
+                for weighting in weightings:
+                    name = f"{signal}_k{k}_{period}" + (f"_{weighting}" if weighting != 'equal' else '')
+                    print(f"Running backtest {name}...")
+                    result = cached_backtest(name, signal_df, close_df_filtered, k, period,
+                                             sort_descending=sort_descending, universe=universe, store=store,
+                                             weighting=weighting)
+                    stats = result.stats[name]
+                    rows.append({
+                        'signal': signal,
+                        'k': k,
+                        'rebalance_period': period,
+                        'weighting': weighting,
+                        'cagr': stats.get('cagr'),
+                        'daily_sharpe': stats.get('daily_sharpe'),
+                        'max_drawdown': stats.get('max_drawdown')
+                    })
+
+    summary = pd.DataFrame(rows)
+    if output_file is not None:
+        summary.to_csv(output_file, index=False)
+    return summary
+
+
+def run_factor_evaluation(horizons=(1, 5, 20), quantiles=5, lags=(1, 5, 20, 60), inputs=None, output_file=None,
+                          **load_options):
+    """
+    Evaluate every ratio and the value composite without backtesting.
+
+    Parameters:
+    -----------
+    horizons : sequence of int, optional
+        Forward return horizons in trading days
+    quantiles : int, optional
+        Number of quantile portfolios
+    lags : sequence of int, optional
+        Rebalance intervals for the turnover
+    inputs : dict, optional
+        Pre-loaded inputs from load_analysis_inputs. If None, they are loaded.
+    output_file : str, optional
+        If given, the IC summary, quantile returns and turnover are also written to this CSV file
+    **load_options
+        Keyword arguments for load_analysis_inputs, used when inputs are loaded here
+
+    Returns:
+    --------
+    dict
+        Output of financial_analysis.ratios.factor_evaluation.evaluate_factors
+    """
+    from financial_analysis.ratios.factor_evaluation import evaluate_factors
+
+    if inputs is None:
+        inputs = load_analysis_inputs(**load_options)
+    factors = dict(inputs['ratios'])
+    factors['combined'] = inputs['combined']
+
+    with span('factors'):
+        evaluation = evaluate_factors(factors, inputs['close_df_filtered'], horizons, quantiles, lags)
+
+    if output_file is not None:
+        tables = {'ic_summary': evaluation['ic_summary'], 'quantile_returns': evaluation['quantile_returns'],
+                  'turnover': evaluation['turnover']}
+        # One long table: (table, factor, horizon or lag, statistic) -> value
+        long_table = pd.concat({name: table.stack() for name, table in tables.items()})
+        long_table.rename_axis(['table', 'factor', 'period', 'statistic']).to_csv(output_file, header=['value'])
+    return evaluation
+
+
+def run_robustness(n_samples=2000, block_size=20, offset_samples=200, confidence=0.95, inputs=None,
+                   output_file=None, cache=True, seed=0, **load_options):
+    """
+    Put confidence intervals on the CAGR, Sharpe ratio and max drawdown of the main strategies.
+
+    The backtested returns are block-bootstrapped, and each strategy is simulated again with
+    randomly shifted rebalance dates (see financial_analysis.strategies.robustness).
+
+    Parameters:
+    -----------
+    n_samples : int, optional
+        Number of block-bootstrap resamples
+    block_size : int, optional
+        Days per bootstrap block
+    offset_samples : int, optional
+        Number of simulations with random rebalance-date offsets per strategy
+    confidence : float, optional
+        Coverage of the intervals
+    inputs : dict, optional
+        Pre-loaded inputs from load_analysis_inputs. If None, they are loaded.
+    output_file : str, optional
+        If given, the table is also written to this CSV file
+    cache : bool, optional
+        If True, identical backtests are read back from the result store instead of being run again
+    seed : int, optional
+        Random seed
+    **load_options
+        Keyword arguments for load_analysis_inputs, used when inputs are loaded here
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per (strategy, method) with the historical value and the interval of each metric
+    """
+    from financial_analysis.strategies.robustness import (
+        bootstrap_metrics, confidence_intervals, performance_metrics, rebalance_offset_metrics, strategy_returns
+    )
+
+    if inputs is None:
+        inputs = load_analysis_inputs(**load_options)
+    close_df_filtered = inputs['close_df_filtered']
+    universe = _tradable(inputs)
+    store = _result_store(load_options.get('data_dir')) if cache else None
+
+    results = {}
+    offsets = {}
+    with span('robustness'):
+        for name, signal in STRATEGY_SIGNALS.items():
+            signal_df = inputs['combined'] if signal == 'combined' else inputs['ratios'][signal]
+            results[name] = cached_backtest(name, signal_df, close_df_filtered, sort_descending=SWEEP_SIGNALS[signal],
+                                            universe=universe, store=store)
+            offsets[name] = confidence_intervals(
+                rebalance_offset_metrics(signal_df, close_df_filtered, sort_descending=SWEEP_SIGNALS[signal],
+                                         universe=universe, n_samples=offset_samples, seed=seed, name=name),
+                confidence)
+        returns = strategy_returns(results)
+        historical = performance_metrics(returns)
+        bootstrap = confidence_intervals(bootstrap_metrics(returns, n_samples, block_size, seed), confidence)
+
+    tables = {'bootstrap': bootstrap, 'rebalance_offset': pd.concat(offsets.values())}
+    for table in tables.values():
+        for metric in historical.columns:
+            table[(metric, 'historical')] = historical[metric]
+    columns = pd.MultiIndex.from_product([historical.columns, ['historical', 'low', 'median', 'high']])
+    summary = pd.concat(tables, names=['method', 'strategy']).swaplevel()[columns]
+    if output_file is not None:
+        summary.to_csv(output_file)
+    return summary
 
 
 if __name__ == "__main__":
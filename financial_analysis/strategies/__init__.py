@@ -1,3 +1,41 @@
 """
 Strategy module for creating and backtesting investment strategies.
-""" 
\ No newline at end of file
+"""
+
+from .._lazy import lazy_attributes
+
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    'backtest': None,
+    'LogAvailableStocks': '.backtest',
+    'SelectUniverse': '.backtest',
+    'SelectTopK': '.backtest',
+    'create_strategy': '.backtest',
+    'create_pb_strategy': '.backtest',
+    'create_pe_strategy': '.backtest',
+    'create_dividend_strategy': '.backtest',
+    'create_combined_strategy': '.backtest',
+    'run_backtest': '.backtest',
+    'result_store': None,
+    'ResultStore': '.result_store',
+    'StoredResult': '.result_store',
+    'cached_backtest': '.result_store',
+    'get_result_store': '.result_store',
+    'save_result': '.result_store',
+    'robustness': None,
+    'bootstrap_metrics': '.robustness',
+    'confidence_intervals': '.robustness',
+    'performance_metrics': '.robustness',
+    'rebalance_offset_metrics': '.robustness',
+    'rebalance_offset_returns': '.robustness',
+    'strategy_returns': '.robustness',
+    'weighting': None,
+    'RollingCovariance': '.weighting',
+    'WeighRisk': '.weighting',
+    'WeighInverseVolatility': '.weighting',
+    'WeighMinimumVariance': '.weighting',
+    'WeighRiskParity': '.weighting',
+    'inverse_volatility_weights': '.weighting',
+    'minimum_variance_weights': '.weighting',
+    'risk_parity_weights': '.weighting',
+    'make_weighting_algo': '.weighting',
+})
@@ -5,6 +5,8 @@ Backtest module for creating and running investment strategies.
 import bt
 import pandas as pd
 
+from .weighting import PRICES_DATA, WeighRisk, make_weighting_algo
+
 
 class LogAvailableStocks(bt.Algo):
     """Algorithm for logging available stocks at each rebalance date."""
@@ -49,10 +51,43 @@ class LogAvailableStocks(bt.Algo):
         return True
 
 
+class SelectUniverse(bt.Algo):
+    """Algorithm that selects the members of a precomputed universe bitmap on each date."""
+
+    def __init__(self, universe):
+        """
+        Initialize the algorithm.
+
+        Parameters:
+        -----------
+        universe : financial_analysis.data.universe.UniverseBitmap
+            Date x symbol membership bitmap
+        """
+        super(SelectUniverse, self).__init__()
+        self.universe = universe
+
+    def __call__(self, target):
+        """
+        Execute the algorithm.
+
+        Parameters:
+        -----------
+        target : bt.Backtest
+            Backtest target
+
+        Returns:
+        --------
+        bool
+            Always returns True
+        """
+        target.temp['selected'] = self.universe.members(target.now)
+        return True
+
+
 class SelectTopK(bt.AlgoStack):
     """Algorithm for selecting top K securities based on a signal."""
     
-    def __init__(self, signal, K, sort_descending=True, all_or_none=False, filter_selected=True):
+    def __init__(self, signal, K, sort_descending=True, all_or_none=False, filter_selected=True, universe=None):
         """
         Initialize the algorithm.
         
@@ -68,12 +103,17 @@ class SelectTopK(bt.AlgoStack):
             If True, select all securities or none
         filter_selected : bool, optional
             If True, filter out securities not in the universe
+        universe : financial_analysis.data.universe.UniverseBitmap, optional
+            If given, only members of the universe on each date are eligible
         """
-        super(SelectTopK, self).__init__(bt.algos.SetStat(signal),
-                                      bt.algos.SelectN(K, sort_descending, all_or_none, filter_selected))
+        algos = [bt.algos.SetStat(signal), bt.algos.SelectN(K, sort_descending, all_or_none, filter_selected)]
+        if universe is not None:
+            algos.insert(0, SelectUniverse(universe))
+        super(SelectTopK, self).__init__(*algos)
 
 
-def create_strategy(name, signal_df, k=50, rebalance_period='quarterly', sort_descending=False):
+def create_strategy(name, signal_df, k=50, rebalance_period='quarterly', sort_descending=False, universe=None,
+                    weighting='equal'):
     """
     Create a strategy based on a signal DataFrame.
     
@@ -89,6 +129,11 @@ def create_strategy(name, signal_df, k=50, rebalance_period='quarterly', sort_de
         Rebalance period: 'quarterly', 'monthly', or 'weekly'
     sort_descending : bool, optional
         If True, sort in descending order (higher is better)
+    universe : financial_analysis.data.universe.UniverseBitmap, optional
+        If given, only members of the universe on each rebalance date are eligible
+    weighting : str or bt.Algo, optional
+        How the selected securities are weighted: 'equal', 'inv_vol', 'min_variance' or 'risk_parity'
+        (see financial_analysis.strategies.weighting), or an Algo that sets temp['weights']
         
     Returns:
     --------
@@ -109,13 +154,13 @@ def create_strategy(name, signal_df, k=50, rebalance_period='quarterly', sort_de
     return bt.Strategy(name, [
         rebalance_algo,
         LogAvailableStocks(available_stocks_log),
-        SelectTopK(signal_df, K=k, sort_descending=sort_descending),
-        bt.algos.WeighEqually(),
+        SelectTopK(signal_df, K=k, sort_descending=sort_descending, universe=universe),
+        make_weighting_algo(weighting),
         bt.algos.Rebalance()
     ])
 
 
-def create_pb_strategy(pb_df_filtered, k=50, rebalance_period='quarterly'):
+def create_pb_strategy(pb_df_filtered, k=50, rebalance_period='quarterly', universe=None, weighting='equal'):
     """
     Create a strategy based on PB ratio.
     
@@ -127,16 +172,21 @@ def create_pb_strategy(pb_df_filtered, k=50, rebalance_period='quarterly'):
         Number of securities to select
     rebalance_period : str, optional
         Rebalance period: 'quarterly', 'monthly', or 'weekly'
+    universe : financial_analysis.data.universe.UniverseBitmap, optional
+        If given, only members of the universe on each rebalance date are eligible
+    weighting : str or bt.Algo, optional
+        'equal', 'inv_vol', 'min_variance', 'risk_parity' or an Algo; see create_strategy
         
     Returns:
     --------
     bt.Strategy
         Strategy object
     """
-    return create_strategy('pb_strategy', pb_df_filtered, k, rebalance_period, sort_descending=False)
+    return create_strategy('pb_strategy', pb_df_filtered, k, rebalance_period, sort_descending=False,
+                           universe=universe, weighting=weighting)
 
 
-def create_pe_strategy(pe_df_filtered, k=50, rebalance_period='quarterly'):
+def create_pe_strategy(pe_df_filtered, k=50, rebalance_period='quarterly', universe=None, weighting='equal'):
     """
     Create a strategy based on PE ratio.
     
@@ -148,16 +198,21 @@ def create_pe_strategy(pe_df_filtered, k=50, rebalance_period='quarterly'):
         Number of securities to select
     rebalance_period : str, optional
         Rebalance period: 'quarterly', 'monthly', or 'weekly'
+    universe : financial_analysis.data.universe.UniverseBitmap, optional
+        If given, only members of the universe on each rebalance date are eligible
+    weighting : str or bt.Algo, optional
+        'equal', 'inv_vol', 'min_variance', 'risk_parity' or an Algo; see create_strategy
         
     Returns:
     --------
     bt.Strategy
         Strategy object
     """
-    return create_strategy('pe_strategy', pe_df_filtered, k, rebalance_period, sort_descending=False)
+    return create_strategy('pe_strategy', pe_df_filtered, k, rebalance_period, sort_descending=False,
+                           universe=universe, weighting=weighting)
 
 
-def create_dividend_strategy(dyr_df_filtered, k=50, rebalance_period='quarterly'):
+def create_dividend_strategy(dyr_df_filtered, k=50, rebalance_period='quarterly', universe=None, weighting='equal'):
     """
     Create a strategy based on Dividend Yield.
     
@@ -169,16 +224,21 @@ def create_dividend_strategy(dyr_df_filtered, k=50, rebalance_period='quarterly'
         Number of securities to select
     rebalance_period : str, optional
         Rebalance period: 'quarterly', 'monthly', or 'weekly'
+    universe : financial_analysis.data.universe.UniverseBitmap, optional
+        If given, only members of the universe on each rebalance date are eligible
+    weighting : str or bt.Algo, optional
+        'equal', 'inv_vol', 'min_variance', 'risk_parity' or an Algo; see create_strategy
         
     Returns:
     --------
     bt.Strategy
         Strategy object
     """
-    return create_strategy('dividend_strategy', dyr_df_filtered, k, rebalance_period, sort_descending=True)
+    return create_strategy('dividend_strategy', dyr_df_filtered, k, rebalance_period, sort_descending=True,
+                           universe=universe, weighting=weighting)
 
 
-def create_combined_strategy(combined_ratio, k=50, rebalance_period='quarterly'):
+def create_combined_strategy(combined_ratio, k=50, rebalance_period='quarterly', universe=None, weighting='equal'):
     """
     Create a strategy based on a combined ratio.
     
@@ -190,13 +250,23 @@ def create_combined_strategy(combined_ratio, k=50, rebalance_period='quarterly')
         Number of securities to select
     rebalance_period : str, optional
         Rebalance period: 'quarterly', 'monthly', or 'weekly'
+    universe : financial_analysis.data.universe.UniverseBitmap, optional
+        If given, only members of the universe on each rebalance date are eligible
+    weighting : str or bt.Algo, optional
+        'equal', 'inv_vol', 'min_variance', 'risk_parity' or an Algo; see create_strategy
         
     Returns:
     --------
     bt.Strategy
         Strategy object
     """
-    return create_strategy('combined_strategy', combined_ratio, k, rebalance_period, sort_descending=False)
+    return create_strategy('combined_strategy', combined_ratio, k, rebalance_period, sort_descending=False,
+                           universe=universe, weighting=weighting)
+
+
+def _uses_prices(strategy):
+    """Return True if an algo of the strategy reads the price panel from the backtest's additional data."""
+    return any(isinstance(algo, WeighRisk) for algo in getattr(strategy.stack, 'algos', [strategy.stack]))
 
 
 def run_backtest(strategy, price_data, name=None):
@@ -220,7 +290,9 @@ def run_backtest(strategy, price_data, name=None):
     if name is None:
         name = strategy.name
         
-    backtest = bt.Backtest(strategy, price_data, name=name)
+    # Risk-based weightings read the whole price panel by name (see financial_analysis.strategies.weighting)
+    additional_data = {PRICES_DATA: price_data} if _uses_prices(strategy) else None
+    backtest = bt.Backtest(strategy, price_data, name=name, additional_data=additional_data)
     result = bt.run(backtest)
     
     return result 
\ No newline at end of file
@@ -0,0 +1,319 @@
+"""
+Compact persistent store for backtest results.
+
+A bt Result keeps the whole strategy tree in memory, and its weights and positions span
+every symbol on every date. The store keeps what the analysis reads back: the equity
+curve, the security weights and positions as sparse (row, column, value) triplets, and
+the strategy config. Each result is a directory of .npy arrays named by a hash of the
+config, RESULT_STORE_VERSION and the input data. The arrays are memory-mapped on first
+access, so identical requests return the stored result instead of running the backtest
+again.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+
+from pyb.libs.columnar_store import get_store_dir, from_datetime_index, to_datetime_index
+
+META_FILE = 'meta.json'
+# Part of every result key; bump after a change to the strategies or algos that changes backtest results
+RESULT_STORE_VERSION = 1
+
+
+def data_fingerprint(*objects):
+    """
+    Hash the contents of DataFrames, Series, arrays and universe bitmaps.
+
+    Parameters:
+    -----------
+    *objects
+        Inputs of a backtest; None is allowed and hashes as a placeholder
+
+    Returns:
+    --------
+    str
+        Hex digest that changes whenever any value, date or label changes
+    """
+    digest = hashlib.sha256()
+    for obj in objects:
+        if obj is None:
+            digest.update(b'none')
+        elif isinstance(obj, (pd.DataFrame, pd.Series)):
+            index = obj.index
+            if isinstance(index, pd.DatetimeIndex):
+                digest.update(str(index.tz).encode())
+                digest.update(np.ascontiguousarray(index.asi8).tobytes())
+            else:
+                digest.update(json.dumps([str(label) for label in index]).encode())
+            if isinstance(obj, pd.DataFrame):
+                digest.update(json.dumps([str(label) for label in obj.columns]).encode())
+            digest.update(np.ascontiguousarray(obj.to_numpy(dtype=np.float64)).tobytes())
+        elif hasattr(obj, 'bits'):
+            # UniverseBitmap
+            digest.update(np.ascontiguousarray(obj.bits).tobytes())
+            digest.update(np.ascontiguousarray(obj.dates.asi8).tobytes())
+            digest.update(json.dumps([str(symbol) for symbol in obj.symbols]).encode())
+        else:
+            digest.update(np.ascontiguousarray(obj).tobytes())
+    return digest.hexdigest()
+
+
+def result_key(config, *data):
+    """Return the store key for a strategy config, the store version and the input data."""
+    description = {'result_store': RESULT_STORE_VERSION, 'config': config}
+    digest = hashlib.sha256(json.dumps(description, sort_keys=True, default=str).encode())
+    digest.update(data_fingerprint(*data).encode())
+    return digest.hexdigest()[:24]
+
+
+def _sparse(values):
+    """Return the (row, column, value) triplets of the non-zero, non-NaN cells."""
+    rows, cols = np.nonzero(np.nan_to_num(values) != 0)
+    return rows.astype(np.int32), cols.astype(np.int32), values[rows, cols]
+
+
+def _changes(values):
+    """Return the (row, column, value) triplets of the cells that differ from the row above."""
+    values = np.nan_to_num(values)
+    previous = np.vstack([np.zeros((1, values.shape[1])), values[:-1]])
+    rows, cols = np.nonzero(values != previous)
+    return rows.astype(np.int32), cols.astype(np.int32), values[rows, cols]
+
+
+def save_result(result, path, config=None, name=None):
+    """
+    Save a bt Result in the compact format.
+
+    Parameters:
+    -----------
+    result : bt.backtest.Result
+        Result from running a backtest
+    path : str
+        Target directory; replaced if it exists
+    config : dict, optional
+        Strategy configuration stored with the result
+    name : str, optional
+        Backtest to save. Defaults to the first one.
+
+    Returns:
+    --------
+    str
+        The path
+    """
+    backtest = result.backtests[name] if name is not None else result.backtest_list[0]
+    name = backtest.name
+    equity = result.prices[name]
+    weights = result.get_security_weights(name)
+    positions = backtest.positions.reindex(index=weights.index, columns=weights.columns, fill_value=0.0)
+
+    days, tz = from_datetime_index(equity.index)
+    holding_days, _ = from_datetime_index(weights.index)
+    weight_row, weight_col, weight_value = _sparse(weights.to_numpy(dtype=np.float64))
+    position_row, position_col, position_value = _changes(positions.to_numpy(dtype=np.float64))
+    arrays = {
+        'date': days, 'equity': equity.to_numpy(dtype=np.float64), 'holding_date': holding_days,
+        'weight_row': weight_row, 'weight_col': weight_col, 'weight_value': weight_value,
+        'position_row': position_row, 'position_col': position_col, 'position_value': position_value,
+    }
+
+    # Written to a temporary directory and renamed, so a half-written result is never visible
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for array_name, values in arrays.items():
+        np.save(os.path.join(tmp_path, f"{array_name}.npy"), values)
+    meta = {'name': name, 'config': config or {}, 'tz': tz, 'symbols': [str(symbol) for symbol in weights.columns]}
+    with open(os.path.join(tmp_path, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, default=str)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    return path
+
+
+class StoredResult:
+    """
+    A backtest result read lazily from the compact store.
+
+    It offers the parts of bt's Result used by the analysis: ``prices``, ``stats``,
+    ``display``, ``plot`` and ``get_security_weights``, plus ``returns`` and ``positions``.
+    Arrays are memory-mapped on first access; dense weights and positions are only built
+    when asked for.
+
+    Parameters:
+    -----------
+    path : str
+        Directory written by save_result
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.name = meta['name']
+        self.config = meta['config']
+        self.symbols = meta['symbols']
+        self.tz = meta['tz']
+        self._cache = {}
+
+    def __repr__(self):
+        return f"StoredResult(name={self.name!r}, path={self.path!r})"
+
+    def _array(self, name):
+        return np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode='r')
+
+    def _get(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    @property
+    def prices(self):
+        """Equity curve as a one-column DataFrame, like Result.prices."""
+        return self._get('prices', lambda: pd.DataFrame(
+            {self.name: np.array(self._array('equity'))}, index=to_datetime_index(self._array('date'), self.tz)))
+
+    @property
+    def returns(self):
+        """Daily returns of the equity curve."""
+        return self.prices[self.name].pct_change()
+
+    def _dense(self, prefix, filled):
+        index = to_datetime_index(self._array('holding_date'), self.tz)
+        values = np.full((len(index), len(self.symbols)), np.nan if filled else 0.0)
+        values[self._array(f"{prefix}_row"), self._array(f"{prefix}_col")] = self._array(f"{prefix}_value")
+        if filled:
+            # Positions are stored where they change; carry them forward and close the rest
+            values = pd.DataFrame(values).ffill().fillna(0.0).to_numpy()
+        return pd.DataFrame(values, index=index, columns=pd.Index(self.symbols))
+
+    def get_security_weights(self, backtest=0):
+        """Security weights over time as a dense (date x symbol) DataFrame."""
+        return self._get('weights', lambda: self._dense('weight', filled=False))
+
+    @property
+    def positions(self):
+        """Positions over time as a dense (date x symbol) DataFrame."""
+        return self._get('positions', lambda: self._dense('position', filled=True))
+
+    @property
+    def _group_stats(self):
+        import ffn
+        return self._get('group_stats', lambda: ffn.GroupStats(self.prices))
+
+    @property
+    def stats(self):
+        """Performance statistics, computed as bt's Result does."""
+        return self._group_stats.stats
+
+    def display(self):
+        return self._group_stats.display()
+
+    def plot(self, **kwargs):
+        return self._group_stats.plot(**kwargs)
+
+
+class ResultStore:
+    """
+    Directory of stored backtest results keyed by a hash of config and data.
+
+    Parameters:
+    -----------
+    path : str, optional
+        Store directory. Defaults to <project_root>/data/columnar/results
+    """
+
+    def __init__(self, path=None):
+        self.path = path if path is not None else get_store_dir('results')
+        self._loaded = {}
+
+    def key(self, config, *data):
+        return result_key(config, *data)
+
+    def __contains__(self, key):
+        return key in self._loaded or os.path.exists(os.path.join(self.path, key, META_FILE))
+
+    def get(self, key):
+        """Return the stored result for a key, or None if there is none."""
+        if key not in self._loaded:
+            if not os.path.exists(os.path.join(self.path, key, META_FILE)):
+                return None
+            self._loaded[key] = StoredResult(os.path.join(self.path, key))
+        return self._loaded[key]
+
+    def put(self, key, result, config=None, name=None):
+        """Save a bt Result under a key and return it as a StoredResult."""
+        os.makedirs(self.path, exist_ok=True)
+        save_result(result, os.path.join(self.path, key), config, name)
+        self._loaded.pop(key, None)
+        return self.get(key)
+
+
+_stores = {}
+
+
+def get_result_store(path=None):
+    """Return the process-wide ResultStore for a directory."""
+    path = path if path is not None else get_store_dir('results')
+    if path not in _stores:
+        _stores[path] = ResultStore(path)
+    return _stores[path]
+
+
+def cached_backtest(name, signal_df, price_data, k=50, rebalance_period='quarterly', sort_descending=False,
+                    universe=None, store=None, weighting='equal'):
+    """
+    Run a top-K strategy backtest, or return the stored result of an identical earlier run.
+
+    Parameters:
+    -----------
+    name : str
+        Strategy and backtest name
+    signal_df : pandas.DataFrame
+        Signal DataFrame for selection
+    price_data : pandas.DataFrame
+        Price data DataFrame
+    k : int, optional
+        Number of securities to select
+    rebalance_period : str, optional
+        Rebalance period: 'quarterly', 'monthly', or 'weekly'
+    sort_descending : bool, optional
+        If True, sort in descending order (higher is better)
+    universe : financial_analysis.data.universe.UniverseBitmap, optional
+        If given, only members of the universe on each rebalance date are eligible
+    store : ResultStore, optional
+        Store to read and write. If None, the backtest runs without caching and the bt Result is returned.
+    weighting : str or bt.Algo, optional
+        'equal', 'inv_vol', 'min_variance' or 'risk_parity'; see create_strategy. An Algo is only
+        accepted without a store.
+
+    Returns:
+    --------
+    StoredResult or bt.backtest.Result
+        The stored result, or the bt Result when no store is given
+    """
+    from .backtest import create_strategy, run_backtest
+
+    def run():
+        strategy = create_strategy(name, signal_df, k, rebalance_period, sort_descending=sort_descending,
+                                   universe=universe, weighting=weighting)
+        return run_backtest(strategy, price_data, name)
+
+    if store is None:
+        return run()
+    if not isinstance(weighting, str):
+        # An Algo instance has no stable description to key the stored result by
+        raise ValueError(f"Only named weightings can be cached, got {type(weighting).__name__}. "
+                         f"Pass store=None to run it without caching.")
+    # Equal-weight results keep the strategy label they were stored with before weightings existed
+    strategy = 'top_k_equal_weight' if weighting == 'equal' else f'top_k_{weighting}'
+    config = {'name': name, 'strategy': strategy, 'k': k, 'rebalance_period': rebalance_period,
+              'sort_descending': sort_descending}
+    key = store.key(config, signal_df, price_data, universe)
+    stored = store.get(key)
+    if stored is None:
+        stored = store.put(key, run(), config, name)
+    return stored
@@ -0,0 +1,312 @@
+"""
+Bootstrap and Monte Carlo robustness analysis of strategies.
+
+One historical path says little about how much of a strategy's CAGR, Sharpe ratio or
+drawdown is luck. This module resamples it in two ways, both as batched NumPy array
+operations rather than thousands of bt runs:
+
+- block bootstrap: daily returns are resampled in blocks of consecutive days (keeping
+  short-term autocorrelation and, with several strategies, their co-movement);
+- rebalance offsets: the top-K equal-weight strategy of create_strategy is simulated again
+  with every rebalance date moved by a random number of trading days into its period.
+
+Either set of samples is summarized with confidence_intervals.
+"""
+
+import numpy as np
+import pandas as pd
+
+METRICS = ('cagr', 'sharpe', 'max_drawdown')
+PERIOD_FREQUENCIES = {'quarterly': 'Q', 'monthly': 'M', 'weekly': 'W'}
+
+
+def strategy_returns(results):
+    """
+    Collect the daily returns of backtested strategies.
+
+    Parameters:
+    -----------
+    results : dict
+        Strategy name -> bt Result, StoredResult or equity curve (pandas.Series)
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Daily returns with dates as index and one column per strategy
+    """
+    columns = {}
+    for name, result in results.items():
+        if isinstance(result, pd.Series):
+            equity = result
+        else:
+            prices = result.prices
+            equity = prices[name] if name in prices.columns else prices.iloc[:, 0]
+        columns[name] = equity.pct_change().iloc[1:]
+    return pd.DataFrame(columns)
+
+
+def _metrics(returns, periods_per_year):
+    """CAGR, Sharpe ratio and max drawdown along axis 1 of a (samples x days x strategies) return array."""
+    n_days = returns.shape[1]
+    log_growth = np.log1p(returns)
+    equity = np.exp(np.cumsum(log_growth, axis=1))
+    # The curve starts at 1 before the first return
+    peak = np.maximum(np.maximum.accumulate(equity, axis=1), 1.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cagr = np.exp(log_growth.sum(axis=1) * periods_per_year / n_days) - 1
+        sharpe = returns.mean(axis=1) / returns.std(axis=1, ddof=1) * np.sqrt(periods_per_year)
+    max_drawdown = (equity / peak - 1).min(axis=1)
+    return {'cagr': cagr, 'sharpe': sharpe, 'max_drawdown': max_drawdown}
+
+
+def _as_array(returns):
+    """Daily returns as a float64 (days x strategies) array; missing days count as flat."""
+    values = returns.to_numpy(dtype=np.float64)
+    return np.where(np.isfinite(values), values, 0.0)
+
+
+def performance_metrics(returns, periods_per_year=252):
+    """
+    Compute CAGR, annualized Sharpe ratio and max drawdown of daily return series.
+
+    CAGR is annualized by the number of trading days rather than calendar time, so it is
+    comparable between resampled paths.
+
+    Parameters:
+    -----------
+    returns : pandas.DataFrame
+        Daily returns with one column per strategy or sample
+    periods_per_year : int, optional
+        Trading days per year
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per column of returns with 'cagr', 'sharpe' and 'max_drawdown'
+    """
+    metrics = _metrics(_as_array(returns)[None], periods_per_year)
+    return pd.DataFrame({name: values[0] for name, values in metrics.items()}, index=returns.columns)
+
+
+def block_bootstrap_indices(n_days, n_samples, block_size=20, seed=0):
+    """
+    Draw circular block-bootstrap day indices.
+
+    Parameters:
+    -----------
+    n_days : int
+        Length of the historical path
+    n_samples : int
+        Number of resampled paths
+    block_size : int, optional
+        Days per block; blocks wrap around the end of the path
+    seed : int or numpy.random.Generator, optional
+        Random seed
+
+    Returns:
+    --------
+    numpy.ndarray
+        Array of shape (n_samples, n_days) of day indices
+    """
+    rng = np.random.default_rng(seed)
+    block_size = max(1, min(block_size, n_days))
+    n_blocks = -(-n_days // block_size)
+    starts = rng.integers(0, n_days, (n_samples, n_blocks))
+    indices = (starts[:, :, None] + np.arange(block_size)) % n_days
+    return indices.reshape(n_samples, -1)[:, :n_days]
+
+
+def bootstrap_metrics(returns, n_samples=2000, block_size=20, seed=0, periods_per_year=252, chunk_size=250):
+    """
+    Compute performance metrics over block-bootstrap resamples of daily returns.
+
+    Every strategy is resampled with the same day indices, so their co-movement is kept.
+    Samples are processed in chunks of (chunk_size x days x strategies) arrays.
+
+    Parameters:
+    -----------
+    returns : pandas.DataFrame
+        Daily returns with one column per strategy (see strategy_returns)
+    n_samples : int, optional
+        Number of resampled paths
+    block_size : int, optional
+        Days per bootstrap block
+    seed : int, optional
+        Random seed
+    periods_per_year : int, optional
+        Trading days per year
+    chunk_size : int, optional
+        Samples per batch; bounds the memory to about chunk_size x days x strategies x 24 bytes
+
+    Returns:
+    --------
+    dict
+        Metric name ('cagr', 'sharpe', 'max_drawdown') -> DataFrame of shape (n_samples, strategies)
+    """
+    values = _as_array(returns)
+    indices = block_bootstrap_indices(len(values), n_samples, block_size, seed)
+    samples = {name: np.empty((n_samples, values.shape[1])) for name in METRICS}
+    for start in range(0, n_samples, chunk_size):
+        chunk = slice(start, start + chunk_size)
+        for name, metric in _metrics(values[indices[chunk]], periods_per_year).items():
+            samples[name][chunk] = metric
+    return {name: pd.DataFrame(metric, columns=returns.columns) for name, metric in samples.items()}
+
+
+def _period_starts(index, rebalance_period):
+    """Rows where a new rebalance period begins, as bt's RunQuarterly/RunMonthly/RunWeekly see them."""
+    if rebalance_period not in PERIOD_FREQUENCIES:
+        # create_strategy falls back to quarterly
+        rebalance_period = 'quarterly'
+    naive = index.tz_localize(None) if getattr(index, 'tz', None) is not None else index
+    periods = np.asarray(naive.to_period(PERIOD_FREQUENCIES[rebalance_period]).asi8)
+    starts = np.ones(len(periods), dtype=bool)
+    starts[1:] = periods[1:] != periods[:-1]
+    return np.nonzero(starts)[0]
+
+
+def _top_k(signal, valid, k, sort_descending):
+    """
+    Column indices of the k best valid stocks per row, -1 where a row has fewer than k.
+
+    Returns:
+    --------
+    numpy.ndarray
+        Integer array of shape (rows, k)
+    """
+    k = min(k, signal.shape[1])
+    keyed = np.where(valid, -signal if sort_descending else signal, np.inf)
+    chosen = np.argpartition(keyed, k - 1, axis=1)[:, :k]
+    chosen[~np.isfinite(np.take_along_axis(keyed, chosen, axis=1))] = -1
+    return chosen
+
+
+def rebalance_offset_returns(signal_df, close_df, k=50, rebalance_period='quarterly', sort_descending=False,
+                             universe=None, n_samples=200, max_offset=None, seed=0, chunk_size=25):
+    """
+    Simulate the top-K equal-weight strategy with randomly shifted rebalance dates.
+
+    In each sample, every rebalance date is moved from the first trading day of its period by
+    a random number of trading days (at most max_offset, and within the period). Like
+    create_strategy, the portfolio is also formed on the first date, holds the k stocks with
+    the lowest (or highest) signal among those with a price, equal-weighted at the close, and
+    drifts with prices until the next rebalance. All samples are simulated together by
+    gathering only the held stocks' prices.
+
+    Parameters:
+    -----------
+    signal_df : pandas.DataFrame
+        Signal DataFrame for selection, aligned on close_df's index and columns
+    close_df : pandas.DataFrame
+        Filtered close prices
+    k : int, optional
+        Number of securities to select
+    rebalance_period : str, optional
+        Rebalance period: 'quarterly', 'monthly', or 'weekly'
+    sort_descending : bool, optional
+        If True, higher signal values are better
+    universe : financial_analysis.data.universe.UniverseBitmap, optional
+        If given, only members of the universe on each rebalance date are eligible
+    n_samples : int, optional
+        Number of simulated paths
+    max_offset : int, optional
+        Largest shift in trading days. Defaults to any day of the period.
+    seed : int, optional
+        Random seed
+    chunk_size : int, optional
+        Samples simulated per batch
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Daily returns from the second date on, one column per sample
+    """
+    raw = close_df.to_numpy(dtype=np.float64)
+    prices = close_df.ffill().to_numpy(dtype=np.float64)
+    signal = signal_df.reindex(index=close_df.index, columns=close_df.columns).to_numpy(dtype=np.float64)
+    valid = np.isfinite(signal) & np.isfinite(raw) & (raw > 0)
+    if universe is not None:
+        valid &= universe.to_frame().reindex(index=close_df.index, columns=close_df.columns,
+                                             fill_value=False).to_numpy(dtype=bool)
+    n_days = len(prices)
+    holdings = _top_k(signal, valid, k, sort_descending)
+
+    starts = _period_starts(close_df.index, rebalance_period)
+    lengths = np.diff(np.append(starts, n_days))
+    limits = lengths - 1 if max_offset is None else np.minimum(lengths - 1, max_offset)
+    rng = np.random.default_rng(seed)
+    offsets = np.floor(rng.random((n_samples, len(starts))) * (limits + 1)).astype(np.int64)
+
+    rows = np.arange(n_days)
+    returns = np.empty((n_days - 1, n_samples))
+    for begin in range(0, n_samples, chunk_size):
+        chunk = offsets[begin:begin + chunk_size]
+        is_rebalance = np.zeros((len(chunk), n_days), dtype=bool)
+        is_rebalance[:, 0] = True
+        np.put_along_axis(is_rebalance, starts + chunk, True, axis=1)
+        # Portfolio held over day t: the one formed at the last rebalance strictly before t
+        formed = np.maximum.accumulate(np.where(is_rebalance, rows, 0), axis=1)[:, :-1]
+        held = holdings[formed]
+        present = held >= 0
+        held = np.where(present, held, 0)
+        base = prices[formed[..., None], held]
+        today = prices[rows[1:, None], held]
+        yesterday = prices[rows[:-1, None], held]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            growth = np.where(present, today / base, 0.0).sum(axis=2)
+            previous = np.where(present, yesterday / base, 0.0).sum(axis=2)
+            returns[:, begin:begin + len(chunk)] = np.where(previous > 0, growth / previous - 1, 0.0).T
+    return pd.DataFrame(returns, index=close_df.index[1:], columns=pd.RangeIndex(n_samples, name='sample'))
+
+
+def rebalance_offset_metrics(signal_df, close_df, k=50, rebalance_period='quarterly', sort_descending=False,
+                             universe=None, n_samples=200, max_offset=None, seed=0, periods_per_year=252,
+                             name='strategy'):
+    """
+    Compute performance metrics of the top-K strategy under random rebalance-date offsets.
+
+    Parameters:
+    -----------
+    signal_df, close_df, k, rebalance_period, sort_descending, universe, n_samples, max_offset, seed
+        As for rebalance_offset_returns
+    periods_per_year : int, optional
+        Trading days per year
+    name : str, optional
+        Strategy name used as the column label
+
+    Returns:
+    --------
+    dict
+        Metric name -> DataFrame of shape (n_samples, 1), as from bootstrap_metrics
+    """
+    returns = rebalance_offset_returns(signal_df, close_df, k, rebalance_period, sort_descending, universe,
+                                       n_samples, max_offset, seed)
+    metrics = performance_metrics(returns, periods_per_year)
+    return {metric: pd.DataFrame({name: metrics[metric].to_numpy()}) for metric in METRICS}
+
+
+def confidence_intervals(samples, confidence=0.95):
+    """
+    Summarize metric samples by their median and a two-sided percentile interval.
+
+    Parameters:
+    -----------
+    samples : dict
+        Metric name -> DataFrame of samples x strategies, from bootstrap_metrics or rebalance_offset_metrics
+    confidence : float, optional
+        Coverage of the interval
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per strategy with (metric, 'low' / 'median' / 'high') columns
+    """
+    tail = (1 - confidence) / 2 * 100
+    summary = {}
+    for name, values in samples.items():
+        low, median, high = np.nanpercentile(values.to_numpy(dtype=np.float64), [tail, 50, 100 - tail], axis=0)
+        summary[(name, 'low')] = low
+        summary[(name, 'median')] = median
+        summary[(name, 'high')] = high
+    columns = next(iter(samples.values())).columns
+    return pd.DataFrame(summary, index=columns)
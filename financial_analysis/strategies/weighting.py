@@ -0,0 +1,467 @@
+"""
+Risk-based weighting of the selected stocks.
+
+create_strategy weighs the top-K names equally by default. The algos here size them by
+their recent risk instead, estimated over a rolling window of daily returns of the close
+panel:
+
+- WeighInverseVolatility: weights proportional to 1 / volatility;
+- WeighMinimumVariance: long-only minimum-variance weights;
+- WeighRiskParity: weights with equal contributions to portfolio variance.
+
+The algos read the whole close panel from the backtest's additional data under
+PRICES_DATA (run_backtest passes it), falling back to bt's target.universe.
+
+The estimates come from RollingCovariance, which keeps the window sums of returns and of
+their cross products up to date as the window moves instead of recomputing them at each
+rebalance. Advancing the window costs O(rows that enter or leave the window) per symbol,
+and the covariance block of the selected names is extended by O(window) work per name
+that joins the selection; names that stay selected are not recomputed. Missing prices
+are handled pairwise: every variance and covariance uses the days on which its returns
+are present.
+"""
+
+import abc
+
+import bt
+import numpy as np
+import pandas as pd
+
+WEIGHTINGS = ('equal', 'inv_vol', 'min_variance', 'risk_parity')
+DEFAULT_WINDOW = 60
+# Name of the close panel in a backtest's additional_data
+PRICES_DATA = 'prices'
+
+
+class RollingCovariance:
+    """Rolling-window volatility and covariance of daily returns, updated incrementally."""
+
+    def __init__(self, prices, window=DEFAULT_WINDOW, min_periods=None, refresh_every=None):
+        """
+        Initialize the estimator.
+
+        Parameters:
+        -----------
+        prices : pandas.DataFrame
+            Close prices with dates as index and symbols as columns
+        window : int, optional
+            Number of daily returns in the window
+        min_periods : int, optional
+            Minimum number of returns (pairwise for covariances) for an estimate. Defaults to window // 2.
+        refresh_every : int, optional
+            Recompute the sums from the window after this many incremental row updates, to bound
+            floating-point drift. Defaults to 20 windows.
+        """
+        if window < 2:
+            raise ValueError("window must be at least 2")
+        self.window = window
+        self.min_periods = max(2, min_periods if min_periods is not None else window // 2)
+        self.refresh_every = refresh_every if refresh_every is not None else 20 * window
+        self.index = prices.index
+        self.columns = prices.columns
+        self._positions = {symbol: position for position, symbol in enumerate(self.columns)}
+        values = prices.to_numpy(dtype=np.float64, na_value=np.nan)
+        returns = np.full_like(values, np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns[1:] = values[1:] / values[:-1] - 1.0
+        returns[~np.isfinite(returns)] = np.nan
+        self._valid = ~np.isnan(returns)
+        self._returns = np.where(self._valid, returns, 0.0)
+        self._mask = self._valid.astype(np.float64)
+        # Window [start, end) of return rows and the per-symbol sums over it
+        self._start = self._end = 0
+        self._count = np.zeros(len(self.columns))
+        self._sum = np.zeros(len(self.columns))
+        self._sumsq = np.zeros(len(self.columns))
+        self._updates = 0
+        # Pairwise sums over the tracked columns: N = M'M, A = Z'M, C = Z'Z
+        self._tracked = np.array([], dtype=np.int64)
+        self._slots = {}
+        self._pair_count = self._pair_sum = self._cross = np.zeros((0, 0))
+
+    def _rows(self, start, end, columns=None):
+        returns, mask = self._returns[start:end], self._mask[start:end]
+        if columns is not None:
+            returns, mask = returns[:, columns], mask[:, columns]
+        return returns, mask
+
+    def _add_rows(self, start, end, sign):
+        """Add (sign=1) or remove (sign=-1) return rows [start, end) from every running sum."""
+        if start >= end:
+            return
+        returns, mask = self._rows(start, end)
+        self._count += sign * mask.sum(axis=0)
+        self._sum += sign * returns.sum(axis=0)
+        self._sumsq += sign * np.square(returns).sum(axis=0)
+        if len(self._tracked):
+            returns, mask = returns[:, self._tracked], mask[:, self._tracked]
+            self._pair_count += sign * (mask.T @ mask)
+            self._pair_sum += sign * (returns.T @ mask)
+            self._cross += sign * (returns.T @ returns)
+        self._updates += end - start
+
+    def _rebuild(self, start, end):
+        """Recompute every running sum from the rows of the window."""
+        returns, mask = self._rows(start, end)
+        self._count = mask.sum(axis=0)
+        self._sum = returns.sum(axis=0)
+        self._sumsq = np.square(returns).sum(axis=0)
+        returns, mask = returns[:, self._tracked], mask[:, self._tracked]
+        self._pair_count = mask.T @ mask
+        self._pair_sum = returns.T @ mask
+        self._cross = returns.T @ returns
+        self._start, self._end, self._updates = start, end, 0
+
+    def advance(self, date):
+        """
+        Move the window so that it ends with the return of `date` (or the last date before it).
+
+        Parameters:
+        -----------
+        date : pandas.Timestamp
+            Date of the estimate
+        """
+        end = int(self.index.searchsorted(date, side='right'))
+        start = max(0, end - self.window)
+        if end == self._end:
+            return
+        if end < self._end or start >= self._end or self._updates + (end - self._end) > self.refresh_every:
+            # Moving backwards, past a whole window, or after many updates: start from the window rows
+            self._rebuild(start, end)
+            return
+        self._add_rows(self._end, end, 1.0)
+        self._add_rows(self._start, start, -1.0)
+        self._start, self._end = start, end
+
+    def _track(self, positions):
+        """Keep pairwise sums for exactly these column positions, computing only the new ones."""
+        wanted = set(positions)
+        if wanted == self._slots.keys():
+            return
+        kept = [slot for slot, position in enumerate(self._tracked) if position in wanted]
+        added = sorted(wanted - self._slots.keys())
+        order = np.concatenate([self._tracked[kept], np.array(added, dtype=np.int64)])
+        n_old, n = len(kept), len(order)
+
+        pair_count, pair_sum, cross = np.empty((n, n)), np.empty((n, n)), np.empty((n, n))
+        pair_count[:n_old, :n_old] = self._pair_count[np.ix_(kept, kept)]
+        pair_sum[:n_old, :n_old] = self._pair_sum[np.ix_(kept, kept)]
+        cross[:n_old, :n_old] = self._cross[np.ix_(kept, kept)]
+        if added:
+            returns, mask = self._rows(self._start, self._end, order)
+            new_returns, new_mask = returns[:, n_old:], mask[:, n_old:]
+            pair_count[:, n_old:] = mask.T @ new_mask
+            pair_count[n_old:, :] = pair_count[:, n_old:].T
+            pair_sum[:, n_old:] = returns.T @ new_mask
+            pair_sum[n_old:, :] = new_returns.T @ mask
+            cross[:, n_old:] = returns.T @ new_returns
+            cross[n_old:, :] = cross[:, n_old:].T
+        self._tracked, self._pair_count, self._pair_sum, self._cross = order, pair_count, pair_sum, cross
+        self._slots = {position: slot for slot, position in enumerate(order.tolist())}
+
+    def _locate(self, symbols):
+        return [self._positions[symbol] for symbol in symbols]
+
+    def _volatility_values(self, date, positions=None):
+        self.advance(date)
+        count, total, squares = self._count, self._sum, self._sumsq
+        if positions is not None:
+            count, total, squares = count[positions], total[positions], squares[positions]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = (squares - total * total / count) / (count - 1)
+        return np.sqrt(np.where(count >= self.min_periods, np.maximum(variance, 0.0), np.nan))
+
+    def _covariance_values(self, date, positions):
+        self.advance(date)
+        self._track(positions)
+        slots = [self._slots[position] for position in positions]
+        count = self._pair_count[np.ix_(slots, slots)]
+        pair_sum = self._pair_sum[np.ix_(slots, slots)]
+        cross = self._cross[np.ix_(slots, slots)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            covariance = (cross - pair_sum * pair_sum.T / count) / (count - 1)
+        covariance = np.where(count >= self.min_periods, covariance, np.nan)
+        diagonal = np.arange(len(slots))
+        covariance[diagonal, diagonal] = np.maximum(covariance[diagonal, diagonal], 0.0)
+        return covariance
+
+    def volatility(self, date, symbols=None):
+        """
+        Return the daily return volatility of each symbol over the window ending on `date`.
+
+        Parameters:
+        -----------
+        date : pandas.Timestamp
+            Date of the estimate
+        symbols : list, optional
+            Symbols to return. Defaults to all columns.
+
+        Returns:
+        --------
+        pandas.Series
+            Standard deviation of daily returns; NaN where fewer than min_periods returns are present
+        """
+        if symbols is None:
+            return pd.Series(self._volatility_values(date), index=self.columns)
+        symbols = list(symbols)
+        return pd.Series(self._volatility_values(date, self._locate(symbols)), index=symbols)
+
+    def covariance(self, date, symbols):
+        """
+        Return the covariance matrix of daily returns of `symbols` over the window ending on `date`.
+
+        Parameters:
+        -----------
+        date : pandas.Timestamp
+            Date of the estimate
+        symbols : list
+            Symbols of the matrix
+
+        Returns:
+        --------
+        pandas.DataFrame
+            Pairwise covariances; NaN where fewer than min_periods pairs of returns are present
+        """
+        symbols = list(symbols)
+        return pd.DataFrame(self._covariance_values(date, self._locate(symbols)), index=symbols, columns=symbols)
+
+
+def inverse_volatility_weights(volatility):
+    """
+    Return weights proportional to the inverse of each volatility.
+
+    Parameters:
+    -----------
+    volatility : numpy.ndarray
+        Positive volatilities
+
+    Returns:
+    --------
+    numpy.ndarray
+        Weights summing to one
+    """
+    inverse = 1.0 / volatility
+    return inverse / inverse.sum()
+
+
+def minimum_variance_weights(covariance, max_iterations=100):
+    """
+    Return long-only minimum-variance weights.
+
+    The unconstrained solution is proportional to inv(S) @ 1. Names that get a negative
+    weight are removed and the rest solved again until every weight is non-negative.
+
+    Parameters:
+    -----------
+    covariance : numpy.ndarray
+        Positive definite covariance matrix
+    max_iterations : int, optional
+        Maximum number of re-solves
+
+    Returns:
+    --------
+    numpy.ndarray
+        Weights summing to one
+    """
+    n = len(covariance)
+    active = np.ones(n, dtype=bool)
+    weights = np.zeros(n)
+    for _ in range(max_iterations):
+        sub = covariance[np.ix_(active, active)]
+        try:
+            solution = np.linalg.solve(sub, np.ones(active.sum()))
+        except np.linalg.LinAlgError:
+            solution = np.linalg.lstsq(sub, np.ones(active.sum()), rcond=None)[0]
+        if (solution >= 0).all() or active.sum() == 1:
+            weights[:] = 0.0
+            weights[active] = np.maximum(solution, 0.0)
+            break
+        indices = np.flatnonzero(active)
+        active[indices[solution < 0]] = False
+    total = weights.sum()
+    return weights / total if total > 0 else np.full(n, 1.0 / n)
+
+
+def risk_parity_weights(covariance, tolerance=1e-10, max_iterations=100):
+    """
+    Return weights whose contributions w_i * (S w)_i to the portfolio variance are equal.
+
+    Solves min 0.5 y'Sy - sum(log y_i) / n, whose solution normalized to sum to one is the
+    equal risk contribution portfolio, by Newton's method with steps halved to keep y positive.
+
+    Parameters:
+    -----------
+    covariance : numpy.ndarray
+        Positive definite covariance matrix
+    tolerance : float, optional
+        Convergence threshold on the largest relative Newton step
+    max_iterations : int, optional
+        Maximum number of Newton steps
+
+    Returns:
+    --------
+    numpy.ndarray
+        Weights summing to one
+    """
+    n = len(covariance)
+    budget = 1.0 / n
+    y = 1.0 / np.sqrt(np.diag(covariance))
+    y /= np.sqrt(y @ covariance @ y)
+    for _ in range(max_iterations):
+        gradient = covariance @ y - budget / y
+        hessian = covariance + np.diag(budget / (y * y))
+        step = np.linalg.solve(hessian, gradient)
+        scale = 1.0
+        while np.any(y - scale * step <= 0):
+            scale *= 0.5
+        y = y - scale * step
+        if np.max(np.abs(scale * step) / y) < tolerance:
+            break
+    return y / y.sum()
+
+
+class WeighRisk(bt.Algo, abc.ABC):
+    """
+    Base algorithm that sets temp['weights'] from risk estimates of the selected stocks.
+
+    Selected stocks without enough return history for an estimate are dropped, as bt's
+    WeighInvVol does. If none has an estimate, the selection is weighed equally.
+    Subclasses implement weights().
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, min_periods=None, shrinkage=0.1):
+        """
+        Initialize the algorithm.
+
+        Parameters:
+        -----------
+        window : int, optional
+            Number of daily returns in the estimation window
+        min_periods : int, optional
+            Minimum number of returns for an estimate. Defaults to window // 2.
+        shrinkage : float, optional
+            Fraction by which covariances are pulled towards zero (the diagonal is kept), which keeps
+            the pairwise-estimated matrix well conditioned
+        """
+        super(WeighRisk, self).__init__()
+        self.window = window
+        self.min_periods = min_periods
+        self.shrinkage = shrinkage
+        self.estimator = None
+        self._prices = None
+
+    def _estimator(self, target):
+        """Return the estimator over the backtest's prices, building it on first use."""
+        try:
+            # The whole panel is given once, so the estimator is built once and never reads past
+            # the date it is asked about
+            prices = target.get_data(PRICES_DATA)
+        except KeyError:
+            # target.universe only reaches up to target.now, so it is read again once the backtest
+            # has moved past the estimator's last date
+            if self.estimator is not None and self._prices is None and target.now <= self.estimator.index[-1]:
+                return self.estimator
+            self.estimator, self._prices = RollingCovariance(target.universe, self.window, self.min_periods), None
+            return self.estimator
+        if self.estimator is None or self._prices is not prices:
+            self.estimator = RollingCovariance(prices, self.window, self.min_periods)
+            self._prices = prices
+        return self.estimator
+
+    @abc.abstractmethod
+    def weights(self, estimator, date, selected):
+        """Return a weight per symbol in `selected`, NaN where no estimate is available."""
+
+    def __call__(self, target):
+        """
+        Execute the algorithm.
+
+        Parameters:
+        -----------
+        target : bt.Backtest
+            Backtest target
+
+        Returns:
+        --------
+        bool
+            Always returns True
+        """
+        selected = list(target.temp['selected'])
+        if len(selected) <= 1:
+            target.temp['weights'] = {symbol: 1.0 for symbol in selected}
+            return True
+        weights = self.weights(self._estimator(target), target.now, selected).dropna()
+        if weights.empty or not weights.sum() > 0:
+            weights = pd.Series(1.0 / len(selected), index=selected)
+        target.temp['weights'] = weights.to_dict()
+        return True
+
+    def _covariance(self, estimator, date, selected):
+        """Return the shrunk covariance of the selected stocks that have a volatility estimate."""
+        volatility = estimator.volatility(date, selected)
+        usable = volatility[volatility > 0].index.tolist()
+        if not usable:
+            return usable, None
+        covariance = estimator.covariance(date, usable).to_numpy()
+        # Pairs without enough overlapping returns are taken as uncorrelated
+        covariance = np.nan_to_num(covariance, nan=0.0)
+        diagonal = np.diag(np.diag(covariance))
+        return usable, (1.0 - self.shrinkage) * covariance + self.shrinkage * diagonal
+
+
+class WeighInverseVolatility(WeighRisk):
+    """Algorithm that weighs the selected stocks by the inverse of their rolling volatility."""
+
+    def weights(self, estimator, date, selected):
+        volatility = estimator.volatility(date, selected)
+        volatility = volatility[volatility > 0]
+        return pd.Series(inverse_volatility_weights(volatility.to_numpy()), index=volatility.index)
+
+
+class WeighMinimumVariance(WeighRisk):
+    """Algorithm that sets long-only minimum-variance weights over the selected stocks."""
+
+    def weights(self, estimator, date, selected):
+        usable, covariance = self._covariance(estimator, date, selected)
+        if not usable:
+            return pd.Series(dtype=float)
+        return pd.Series(minimum_variance_weights(covariance), index=usable)
+
+
+class WeighRiskParity(WeighRisk):
+    """Algorithm that sets equal-risk-contribution weights over the selected stocks."""
+
+    def weights(self, estimator, date, selected):
+        usable, covariance = self._covariance(estimator, date, selected)
+        if not usable:
+            return pd.Series(dtype=float)
+        return pd.Series(risk_parity_weights(covariance), index=usable)
+
+
+def make_weighting_algo(weighting='equal', window=DEFAULT_WINDOW):
+    """
+    Return the bt algorithm for a weighting scheme.
+
+    Parameters:
+    -----------
+    weighting : str or bt.Algo, optional
+        'equal', 'inv_vol', 'min_variance' or 'risk_parity'; an Algo is returned as is
+    window : int, optional
+        Number of daily returns in the estimation window of the risk-based schemes
+
+    Returns:
+    --------
+    bt.Algo
+        Algorithm that sets temp['weights'] from temp['selected']
+    """
+    if isinstance(weighting, bt.Algo):
+        return weighting
+    if weighting == 'equal':
+        return bt.algos.WeighEqually()
+    if weighting == 'inv_vol':
+        return WeighInverseVolatility(window)
+    if weighting == 'min_variance':
+        return WeighMinimumVariance(window)
+    if weighting == 'risk_parity':
+        return WeighRiskParity(window)
+    raise ValueError(f"Unknown weighting '{weighting}'. Expected one of {list(WEIGHTINGS)}.")
@@ -1,3 +1,17 @@
 """
 Visualization module for analyzing and displaying financial data.
-""" 
\ No newline at end of file
+"""
+
+from .._lazy import lazy_attributes
+
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    'analysis': None,
+    'compare_strategies_performance': '.analysis',
+    'display_strategy_stats': '.analysis',
+    'analyze_sector_performance': '.analysis',
+    'plot_sector_allocation': '.analysis',
+    'plot_sector_comparisons': '.analysis',
+    'analyze_strategy_holdings': '.analysis',
+    'plot_rolling_returns': '.analysis',
+    'plot_drawdowns': '.analysis',
+})
@@ -4,7 +4,18 @@ Analysis and visualization functions for financial data.
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+
+
+def _returns(result):
+    """Daily returns of a bt Result or a StoredResult; bt only keeps the equity curve."""
+    return result.prices.iloc[:, 0].pct_change()
+
+
+def _positions(result):
+    """Positions over time of a bt Result (first backtest) or a StoredResult."""
+    if hasattr(result, 'backtest_list'):
+        return result.backtest_list[0].positions
+    return result.positions
 
 
 def compare_strategies_performance(results, figsize=(14, 8), title='Strategy Performance Comparison'):
@@ -25,6 +36,8 @@ def compare_strategies_performance(results, figsize=(14, 8), title='Strategy Per
     matplotlib.figure.Figure
         Figure object
     """
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(figsize=figsize)
     
     for name, result in results.items():
@@ -57,7 +70,7 @@ def analyze_sector_performance(strategy_result, stocks_info):
     
     Parameters:
     -----------
-    strategy_result : bt.backtest.Result
+    strategy_result : bt.backtest.Result or StoredResult
         Result from running a backtest
     stocks_info : pandas.DataFrame
         DataFrame containing stock information including sector data
@@ -68,7 +81,7 @@ def analyze_sector_performance(strategy_result, stocks_info):
         Sector analysis DataFrame
     """
     # Get latest weights
-    latest_weights = strategy_result.weights.iloc[-1]
+    latest_weights = strategy_result.get_security_weights().iloc[-1]
     
     # Get sectors for each stock
     sectors = {}
@@ -108,6 +121,8 @@ def plot_sector_allocation(sector_weights, title='Sector Allocation', figsize=(1
     matplotlib.figure.Figure
         Figure object
     """
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(figsize=figsize)
     sector_weights.plot(kind='bar', ax=ax, title=title)
     plt.tight_layout()
@@ -131,6 +146,8 @@ def plot_sector_comparisons(sector_weights_dict, figsize=(16, 12)):
     matplotlib.figure.Figure
         Figure object
     """
+    import matplotlib.pyplot as plt
+
     num_strategies = len(sector_weights_dict)
     if num_strategies <= 2:
         num_rows, num_cols = 1, num_strategies
@@ -163,7 +180,7 @@ def analyze_strategy_holdings(strategy_result, date=None):
     
     Parameters:
     -----------
-    strategy_result : bt.backtest.Result
+    strategy_result : bt.backtest.Result or StoredResult
         Result from running a backtest
     date : str or pd.Timestamp, optional
         Date to analyze holdings. If None, uses the last date.
@@ -173,14 +190,15 @@ def analyze_strategy_holdings(strategy_result, date=None):
     pandas.DataFrame
         Holdings analysis DataFrame
     """
+    all_positions = _positions(strategy_result)
     if date is None:
-        date = strategy_result.positions.index[-1]
+        date = all_positions.index[-1]
     
     # Get positions at date
-    positions = strategy_result.positions.loc[date]
+    positions = all_positions.loc[date]
     
     # Get weights at date
-    weights = strategy_result.weights.loc[date]
+    weights = strategy_result.get_security_weights().loc[date].reindex(positions.index, fill_value=0.0)
     
     # Create DataFrame with positions and weights
     holdings_df = pd.DataFrame({
@@ -218,11 +236,13 @@ def plot_rolling_returns(results, window=20, figsize=(14, 8), title='Rolling Ret
     matplotlib.figure.Figure
         Figure object
     """
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(figsize=figsize)
     
     for name, result in results.items():
         # Get returns
-        returns = result.returns
+        returns = _returns(result)
         # Calculate rolling returns
         rolling_returns = returns.rolling(window).mean() * 252  # Annualize
         rolling_returns.plot(ax=ax, label=name)
@@ -251,6 +271,8 @@ def plot_drawdowns(results, figsize=(14, 8), title='Drawdowns'):
     matplotlib.figure.Figure
         Figure object
     """
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(figsize=figsize)
     
     for name, result in results.items():
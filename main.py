@@ -1,29 +1,21 @@
 # main.py
-import argparse
-import subprocess
-import os
 import sys
 
+from pyb.cli import main as cli_main
 
-def main():
-    parser = argparse.ArgumentParser(description="Lixinger Data Downloader")
-    parser.add_argument("--stock-info", action="store_true", help="Download stock information")
-    parser.add_argument("--fundamental", action="store_true", help="Download fundamental data")
-    args = parser.parse_args()
+# Flags accepted by the original downloader, mapped to their subcommands
+LEGACY_FLAGS = {'--stock-info': 'stock-info', '--fundamental': 'fundamental'}
 
-    base_dir = os.path.dirname(os.path.abspath(__file__))
 
-    if args.stock_info:
-        print("Running stock information downloader...")
-        subprocess.run([sys.executable, os.path.join(base_dir, "scripts", "download_stock_info.py")])
-
-    if args.fundamental:
-        print("Running fundamental data downloader...")
-        subprocess.run([sys.executable, os.path.join(base_dir, "scripts", "download_fundamental.py")])
-
-    if not args.stock_info and not args.fundamental:
-        print("No action specified. Use --stock-info and/or --fundamental.")
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    legacy = [LEGACY_FLAGS[arg] for arg in argv if arg in LEGACY_FLAGS]
+    if legacy and all(arg in LEGACY_FLAGS for arg in argv):
+        # Every command runs, as before; the first failure decides the exit code
+        codes = [cli_main([command]) or 0 for command in legacy]
+        return next((code for code in codes if code), 0)
+    return cli_main(argv)
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
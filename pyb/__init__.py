@@ -1,10 +1,39 @@
-from .libs.fundamental_interface import get_fundamental_data
-from .libs.stock_info_interface import get_ah_stock_codes, get_stock_info_summary
-from .libs.candlestick_download_interface import download_candlestick_data
-from .libs.candlestick_interface import get_candlestick_data
-from .libs.stock_info_interface import get_stock_info_summary
-from .libs.stock_info_interface import get_ah_stock_codes
-from .libs.stock_info_dataframe_interface import get_stock_info_dataframe
-__all__ = ['get_fundamental_data', 'get_ah_stock_codes', 'get_stock_info_summary', 'download_candlestick_data', 'get_candlestick_data']
-
 # pyb package initialization
+#
+# Public helpers are resolved lazily (PEP 562) so that ``import pyb`` stays
+# cheap: pandas and the interface modules are only imported the first time
+# one of the names below is accessed.
+import importlib
+
+_LAZY_ATTRS = {
+    'get_fundamental_data': '.libs.fundamental_interface',
+    'get_ah_stock_codes': '.libs.stock_info_interface',
+    'get_stock_info_summary': '.libs.stock_info_interface',
+    'is_ah_stock': '.libs.stock_info_interface',
+    'download_candlestick_data': '.libs.candlestick_download_interface',
+    'get_candlestick_data': '.libs.candlestick_interface',
+    'get_ohlcv_panel': '.libs.ohlcv_interface',
+    'get_stock_info_dataframe': '.libs.stock_info_dataframe_interface',
+    'connect': '.libs.data_service',
+    'query': '.libs.query',
+    'configure_quota': '.libs.quota',
+    'enable_response_cache': '.libs.response_cache',
+}
+
+__all__ = ['get_fundamental_data', 'get_ah_stock_codes', 'get_stock_info_summary', 'is_ah_stock',
+           'download_candlestick_data', 'get_candlestick_data', 'get_ohlcv_panel', 'get_stock_info_dataframe',
+           'connect', 'query', 'configure_quota', 'enable_response_cache']
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    # Cache on the module so later lookups bypass __getattr__ entirely
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
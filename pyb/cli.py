@@ -0,0 +1,444 @@
+"""
+Command-line entry point for downloading, converting and analyzing Lixinger data.
+
+Every subcommand runs in the current process, so one invocation shares a single HTTP
+session and a single stock-info registry. Heavy modules are imported inside the
+subcommand handlers to keep ``pyb --help`` fast.
+
+Usage:
+    pyb stock-info
+    pyb fundamental --workers 4 --rate-limit 10
+    pyb candlestick --start-date 2024-01-01 --end-date 2025-01-01 --ah
+    pyb convert --dataset candlestick_data
+    pyb catalog --verify
+    pyb analyze --output-dir figures
+    pyb sweep --signals pb combined --k 20 50 --rebalance monthly quarterly --weighting equal risk_parity
+    pyb factors --horizons 1 5 20
+    pyb robustness --samples 2000 --offset-samples 200
+    pyb update
+    pyb serve --preload close pb pe_ttm
+    pyb quota
+    pyb cache --clear-expired
+"""
+
+import argparse
+import os
+import sys
+
+from pyb.paths import get_data_dir
+
+# Mirrors financial_analysis.strategies.weighting.WEIGHTINGS, which would import bt
+WEIGHTINGS = ('equal', 'inv_vol', 'min_variance', 'risk_parity')
+
+
+def _configure_client(args):
+    """Apply the base URL, rate limit, cross-process quota and response cache to the process-wide API client."""
+    from pyb.libs.api_client import rate_limiter, enable_response_cache
+    from pyb.libs.endpoints import set_base_url
+    from pyb.libs.quota import configure_quota
+    if args.base_url:
+        set_base_url(args.base_url)
+    rate_limiter.set_rate(args.rate_limit)
+    if args.quota_rate or args.daily_quota or args.priority:
+        # Incremental updates go ahead of backfills running at the same time
+        priority = args.priority or ('high' if getattr(args, 'incremental', False) else 'normal')
+        configure_quota(rate=args.quota_rate, burst=args.quota_burst, daily_limit=args.daily_quota,
+                        priority=priority, path=args.quota_file or os.path.join(args.data_dir, 'api_quota.json'))
+    if args.cache or args.offline:
+        enable_response_cache(os.path.join(args.data_dir, 'api_cache.sqlite'), ttl=_cache_ttl(args),
+                              max_bytes=int(args.cache_size * 1024 * 1024), offline=args.offline)
+
+
+def _cache_ttl(args):
+    """Return the response cache TTL in seconds; --cache-ttl 0 keeps responses until they are evicted."""
+    return args.cache_ttl * 3600 if args.cache_ttl > 0 else None
+
+
+def _registry(args):
+    from pyb.libs.stock_info_interface import get_stock_info_registry
+    return get_stock_info_registry(os.path.join(args.data_dir, 'stock_info.json'))
+
+
+def cmd_stock_info(args):
+    from pyb.scripts import download_stock_info
+    _configure_client(args)
+    download_stock_info.main(data_dir=args.data_dir, force=args.force, include_delisted=not args.listed_only)
+
+
+def cmd_fundamental(args):
+    from pyb.scripts import download_fundamental
+    _configure_client(args)
+    download_fundamental.main(registry=_registry(args), data_dir=args.data_dir, start_date=args.start_date,
+                              end_date=args.end_date, workers=args.workers,
+                              request_interval=args.request_interval, force=args.force)
+
+
+def cmd_candlestick(args):
+    from pyb.libs.candlestick_download_interface import download_candlestick_data
+    _configure_client(args)
+    symbols = args.symbols
+    if args.ah:
+        from pyb.libs.stock_info_interface import is_ah_stock
+        registry = _registry(args)
+        symbols = (symbols or []) + [stock['stockCode'] for stock in registry.records
+                                     if is_ah_stock(stock.get('mutualMarkets'))]
+    if not symbols:
+        print("No symbols given. Use --symbols and/or --ah.")
+        return
+    candlestick_type = args.type or ('ex_rights' if args.factors else 'bc_rights')
+    if args.stream:
+        from pyb.libs.candlestick_download_interface import iter_download_candlestick_data
+        from pyb.libs.columnar_store import get_store_dir
+        if args.store == 'columnar':
+            output_dir = get_store_dir('candlestick_data', args.data_dir)
+        else:
+            output_dir = os.path.join(args.data_dir, 'candlestick_data')
+        statuses = {}
+        for summary in iter_download_candlestick_data(symbols, args.start_date, args.end_date, candlestick_type,
+                                                      output_dir, args.request_interval, args.workers, args.store,
+                                                      args.incremental, args.factors):
+            statuses[summary['status']] = statuses.get(summary['status'], 0) + 1
+        print(f"Finished: {statuses}")
+        return
+    download_candlestick_data(symbols, args.start_date, args.end_date, candlestick_type=candlestick_type,
+                              candlestick_dir=os.path.join(args.data_dir, 'candlestick_data'),
+                              request_interval=args.request_interval, workers=args.workers,
+                              incremental=args.incremental, factors=args.factors)
+
+
+def cmd_convert(args):
+    from pyb.libs.columnar_store import convert_json_dir, get_store_dir
+    for dataset in args.dataset:
+        json_dir = os.path.join(args.data_dir, dataset)
+        store_dir = get_store_dir(dataset, args.data_dir)
+        print(f"Converting {json_dir} -> {store_dir}...")
+        converted = convert_json_dir(json_dir, store_dir, symbols=args.symbols, overwrite=args.force)
+        written = sum(1 for rows in converted.values() if rows is not None)
+        print(f"Converted {written} of {len(converted)} symbols.")
+
+
+def cmd_catalog(args):
+    from pyb.libs.catalog import get_catalog
+    from pyb.libs.columnar_store import get_store_dir
+    for dataset in args.dataset:
+        # Only candlestick files carry a price adjustment
+        adjustment = args.adjustment if dataset == 'candlestick_data' else None
+        for directory, fmt in ((os.path.join(args.data_dir, dataset), 'json'),
+                               (get_store_dir(dataset, args.data_dir), 'npz')):
+            if not os.path.isdir(directory):
+                continue
+            catalog = get_catalog(directory)
+            changes = catalog.scan(fmt, adjustment=adjustment, verify=args.verify)
+            coverage = catalog.coverage()
+            print(f"{directory}: {len(coverage)} symbols, {int(coverage['rows'].sum())} rows, "
+                  f"{coverage['first_date'].min()} to {coverage['last_date'].max()} "
+                  f"({len(changes['indexed'])} indexed, {len(changes['removed'])} removed, "
+                  f"{len(changes['corrupt'])} changed on disk)")
+            if args.show:
+                print(coverage.to_string())
+
+
+def cmd_serve(args):
+    from pyb.libs.data_service import DataService
+    service = DataService(args.data_dir, socket_path=args.socket, refresh_interval=args.refresh_interval)
+    preload = [('candlestick_data' if field == 'close' else 'fundamental_data', field) for field in args.preload]
+    try:
+        service.serve_forever(preload)
+    except KeyboardInterrupt:
+        print("Data service stopped.")
+
+
+def cmd_query(args):
+    from pyb.libs.query import get_query_store
+    result = get_query_store(args.data_dir).query(args.sql, refresh=not args.no_refresh)
+    if args.output:
+        result.to_csv(args.output, index=False)
+        print(f"{len(result)} rows saved to {args.output}")
+    else:
+        print(result.to_string(index=False))
+
+
+def _load_options(args):
+    return {'aligned': args.aligned, 'compact': args.compact, 'chunked': args.chunked,
+            'memory_budget_mb': args.memory_budget, 'neutralize': args.neutralize, 'workers': args.workers,
+            'rebuild': args.rebuild, 'data_dir': args.data_dir}
+
+
+def cmd_quota(args):
+    from pyb.libs.quota import QuotaCoordinator
+    coordinator = QuotaCoordinator(args.quota_file or os.path.join(args.data_dir, 'api_quota.json'),
+                                   rate=args.quota_rate, daily_limit=args.daily_quota)
+    status = coordinator.status()
+    limit = status['daily_limit'] if status['daily_limit'] is not None else 'unlimited'
+    print(f"Requests today: {status['used_today']} / {limit}")
+    if status['rate']:
+        print(f"Tokens available: {status['tokens']:.1f} (refilling at {status['rate']:g}/s)")
+    else:
+        print("No shared rate limit set")
+    if status['blocked_for']:
+        print(f"Blocked after a 429 for another {status['blocked_for']:.1f}s")
+    print("Waiting: " + ', '.join(f"{count} {name}" for name, count in status['waiting'].items()))
+    for day, count in sorted(status['ledger'].items())[-args.days:]:
+        print(f"  {day}  {count}")
+
+
+def cmd_cache(args):
+    from pyb.libs.response_cache import ResponseCache
+    cache = ResponseCache(os.path.join(args.data_dir, 'api_cache.sqlite'), ttl=_cache_ttl(args))
+    if args.clear or args.clear_expired:
+        removed = cache.clear(expired_only=not args.clear)
+        print(f"Removed {removed} cached responses")
+    stats = cache.stats()
+    print(f"{stats['entries']} cached responses, {stats['bytes'] / 1024 / 1024:.1f} MiB compressed")
+
+
+def cmd_analyze(args):
+    from financial_analysis import run_analysis
+    run_analysis.main(output_dir=args.output_dir, report_file=args.report, profile_dir=args.profile_dir,
+                      trace_memory=args.trace_memory, cache=not args.no_cache, weighting=args.weighting,
+                      **_load_options(args))
+
+
+def cmd_sweep(args):
+    from financial_analysis import run_analysis
+    summary = run_analysis.run_sweep(signals=args.signals, k_values=args.k, rebalance_periods=args.rebalance,
+                                     output_file=args.output, cache=not args.no_cache, weightings=args.weighting,
+                                     **_load_options(args))
+    print(summary.to_string(index=False))
+
+
+def cmd_update(args):
+    from financial_analysis.live import update_live_state
+    summary = update_live_state(state_dir=args.state_dir, rebuild=args.rebuild, data_dir=args.data_dir)
+    print(f"Portfolios as of {summary['last_date']}:")
+    for name, weights in summary['weights'].items():
+        print(f"  {name}: {len(weights)} holdings: {' '.join(sorted(weights))}")
+
+
+def cmd_factors(args):
+    from financial_analysis import run_analysis
+    evaluation = run_analysis.run_factor_evaluation(horizons=args.horizons, quantiles=args.quantiles, lags=args.lags,
+                                                    output_file=args.output, **_load_options(args))
+    for name in ('ic_summary', 'quantile_returns', 'turnover'):
+        print(f"\n=== {name} ===")
+        print(evaluation[name].to_string())
+
+
+def cmd_robustness(args):
+    from financial_analysis import run_analysis
+    summary = run_analysis.run_robustness(n_samples=args.samples, block_size=args.block_size,
+                                          offset_samples=args.offset_samples, confidence=args.confidence,
+                                          output_file=args.output, cache=not args.no_cache, seed=args.seed,
+                                          **_load_options(args))
+    print(summary.to_string())
+
+
+def _add_download_options(parser, concurrent=True):
+    parser.add_argument('--rate-limit', type=float, default=None,
+                        help="Maximum API requests per second across all workers")
+    parser.add_argument('--force', action='store_true', help="Re-download data that already exists")
+    _add_cache_options(parser)
+    parser.add_argument('--cache', action='store_true',
+                        help="Answer repeated requests from the local response cache (<data-dir>/api_cache.sqlite)")
+    parser.add_argument('--cache-size', type=float, default=512,
+                        help="MiB of compressed responses kept before the least recently used are evicted")
+    parser.add_argument('--offline', action='store_true',
+                        help="Serve requests only from the response cache and never reach the network")
+    _add_quota_options(parser)
+    parser.add_argument('--quota-burst', type=float, default=None,
+                        help="Requests the shared quota may send at once (defaults to one second's worth)")
+    parser.add_argument('--priority', choices=['high', 'normal', 'low'], default=None,
+                        help="Priority on the shared quota (default 'high' with --incremental, else 'normal')")
+    if concurrent:
+        parser.add_argument('--workers', type=int, default=1, help="Number of concurrent download threads")
+        parser.add_argument('--request-interval', type=float, default=0.07,
+                            help="Seconds each worker waits between requests")
+
+
+def _add_quota_options(parser):
+    parser.add_argument('--quota-rate', type=float, default=None,
+                        help="Requests per second shared by every pyb process using the same quota file")
+    parser.add_argument('--daily-quota', type=int, default=None, help="Requests allowed per day across processes")
+    parser.add_argument('--quota-file', default=None, help="Shared quota state (defaults to <data-dir>/api_quota.json)")
+
+
+def _add_cache_options(parser):
+    parser.add_argument('--cache-ttl', type=float, default=24, help="Hours a cached response stays valid (0 to never expire)")
+
+
+def _add_load_options(parser):
+    parser.add_argument('--aligned', action='store_true',
+                        help="Build prices and ratios on one trading calendar with as-of fundamentals")
+    parser.add_argument('--compact', action='store_true',
+                        help="Load prices and ratios as float32 to roughly halve memory")
+    parser.add_argument('--chunked', action='store_true',
+                        help="Prepare prices and ratios out of core in symbol chunks written to the columnar store")
+    parser.add_argument('--memory-budget', type=float, default=None,
+                        help="Memory budget in MiB per chunk for --chunked")
+    parser.add_argument('--neutralize', action='store_true',
+                        help="Remove sector and log market cap from PB, PE and dividend yield at every date")
+    parser.add_argument('--workers', type=int, default=4, help="Number of analysis stages run at the same time")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="Run every analysis stage even if its stored artifact is up to date")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Always run the backtests instead of reading identical ones from the result store")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='pyb', description="Lixinger data downloader and analysis runner")
+    parser.add_argument('--data-dir', default=get_data_dir(), help="Root data directory")
+    parser.add_argument('--base-url', default=None,
+                        help="API base URL, e.g. a local mock server (defaults to $LIXINGER_BASE_URL or the public API)")
+    parser.add_argument('--report', default=None,
+                        help="Write a JSON run report (stage timings, memory, API request histograms) to this file")
+    parser.add_argument('--profile-dir', default=None, help="Dump a cProfile file per stage into this directory")
+    parser.add_argument('--trace-memory', action='store_true', help="Record tracemalloc peaks per stage in the report")
+    subparsers = parser.add_subparsers(dest='command', metavar='command')
+    subparsers.required = True
+
+    p = subparsers.add_parser('stock-info', help="Download stock information")
+    p.add_argument('--listed-only', action='store_true', help="Exclude delisted stocks")
+    _add_download_options(p, concurrent=False)
+    p.set_defaults(func=cmd_stock_info)
+
+    p = subparsers.add_parser('fundamental', help="Download fundamental data for mutual-market stocks")
+    p.add_argument('--start-date', default='2015-01-01', help="Start date (YYYY-MM-DD)")
+    p.add_argument('--end-date', default='2025-01-01', help="End date (YYYY-MM-DD)")
+    _add_download_options(p)
+    p.set_defaults(func=cmd_fundamental)
+
+    p = subparsers.add_parser('candlestick', help="Download candlestick data")
+    p.add_argument('--symbols', nargs='+', help="Stock codes to download")
+    p.add_argument('--ah', action='store_true', help="Download all AH stocks from the stock info")
+    p.add_argument('--start-date', required=True, help="Start date (YYYY-MM-DD)")
+    p.add_argument('--end-date', required=True, help="End date (YYYY-MM-DD)")
+    p.add_argument('--type', help="Adjustment type (default 'bc_rights', or 'ex_rights' with --factors)")
+    p.add_argument('--stream', action='store_true',
+                   help="Write each symbol as it arrives and keep only summaries in memory")
+    p.add_argument('--store', choices=['json', 'columnar'], default='json',
+                   help="Storage format for --stream: compact JSON or the columnar store")
+    p.add_argument('--incremental', action='store_true',
+                   help="Only download the date ranges missing from the data catalog and merge them in")
+    p.add_argument('--factors', action='store_true',
+                   help="Store unadjusted bars plus adjustment factors, from which loaders compute any adjustment")
+    _add_download_options(p)
+    p.set_defaults(func=cmd_candlestick)
+
+    p = subparsers.add_parser('convert', help="Convert JSON data into the columnar store")
+    p.add_argument('--dataset', nargs='+', default=['candlestick_data', 'fundamental_data'],
+                   help="Datasets to convert")
+    p.add_argument('--symbols', nargs='+', help="Only convert these stock codes")
+    p.add_argument('--force', action='store_true', help="Re-convert symbols that are up to date")
+    p.set_defaults(func=cmd_convert)
+
+    p = subparsers.add_parser('catalog', help="Index the data files and print their coverage")
+    p.add_argument('--dataset', nargs='+', default=['candlestick_data', 'fundamental_data'],
+                   help="Datasets to index, both as JSON and in the columnar store")
+    p.add_argument('--adjustment', default=None,
+                   help="Adjustment type to record for candlestick files that are not catalogued yet")
+    p.add_argument('--verify', action='store_true', help="Recompute checksums and re-index files that changed")
+    p.add_argument('--show', action='store_true', help="Print the coverage of every symbol")
+    p.set_defaults(func=cmd_catalog)
+
+    p = subparsers.add_parser('query', help="Run a SQL query over the candlestick, fundamental and stock_info tables")
+    p.add_argument('sql', help="SELECT statement")
+    p.add_argument('--output', default=None, help="Optional CSV file for the result")
+    p.add_argument('--no-refresh', action='store_true',
+                   help="Query the tables as last synced instead of reloading changed files first")
+    p.set_defaults(func=cmd_query)
+
+    p = subparsers.add_parser('analyze', help="Run the full ratio analysis and save the figures")
+    p.add_argument('--output-dir', default='.', help="Directory for the generated figures")
+    p.add_argument('--weighting', choices=WEIGHTINGS, default='equal',
+                   help="Weighting of the selected stocks (risk-based ones use a 60-day rolling covariance)")
+    _add_load_options(p)
+    p.set_defaults(func=cmd_analyze)
+
+    p = subparsers.add_parser('sweep', help="Backtest a grid of signals, portfolio sizes and rebalance periods")
+    p.add_argument('--signals', nargs='+', default=['pb', 'pe', 'dividend_yield', 'combined'],
+                   help="Signals to test")
+    p.add_argument('--k', nargs='+', type=int, default=[20, 50, 100], help="Portfolio sizes")
+    p.add_argument('--rebalance', nargs='+', default=['monthly', 'quarterly'], help="Rebalance periods")
+    p.add_argument('--weighting', nargs='+', choices=WEIGHTINGS, default=['equal'],
+                   help="Weightings of the selected stocks")
+    p.add_argument('--output', default=None, help="Optional CSV file for the summary table")
+    _add_load_options(p)
+    p.set_defaults(func=cmd_sweep)
+
+    p = subparsers.add_parser('factors', help="Evaluate the ratios and the composite by rank IC, quantiles and turnover")
+    p.add_argument('--horizons', nargs='+', type=int, default=[1, 5, 20], help="Forward return horizons in days")
+    p.add_argument('--quantiles', type=int, default=5, help="Number of quantile portfolios")
+    p.add_argument('--lags', nargs='+', type=int, default=[1, 5, 20, 60], help="Turnover intervals in days")
+    p.add_argument('--output', default=None, help="Optional CSV file for the result tables")
+    _add_load_options(p)
+    p.set_defaults(func=cmd_factors)
+
+    p = subparsers.add_parser('robustness', help="Bootstrap and rebalance-offset confidence intervals of the strategies")
+    p.add_argument('--samples', type=int, default=2000, help="Number of block-bootstrap resamples")
+    p.add_argument('--block-size', type=int, default=20, help="Days per bootstrap block")
+    p.add_argument('--offset-samples', type=int, default=200,
+                   help="Simulations with random rebalance-date offsets per strategy")
+    p.add_argument('--confidence', type=float, default=0.95, help="Coverage of the intervals")
+    p.add_argument('--seed', type=int, default=0, help="Random seed")
+    p.add_argument('--output', default=None, help="Optional CSV file for the table")
+    _add_load_options(p)
+    p.set_defaults(func=cmd_robustness)
+
+    p = subparsers.add_parser('update', help="Append new trading days to the live signals and portfolios")
+    p.add_argument('--state-dir', default=None, help="Live state directory (defaults to <data-dir>/columnar/live)")
+    p.add_argument('--rebuild', action='store_true', help="Rebuild the live state from the whole history")
+    p.set_defaults(func=cmd_update)
+
+    p = subparsers.add_parser('serve', help="Serve price and fundamental panels to local processes from shared memory")
+    p.add_argument('--socket', default=None, help="Unix socket to listen on (defaults to one per data directory)")
+    p.add_argument('--preload', nargs='+', default=[],
+                   help="Panels to load at startup: 'close' for prices, ratio names such as 'pb' for fundamentals")
+    p.add_argument('--refresh-interval', type=float, default=1.0,
+                   help="Minimum seconds between checks of the data files for changes")
+    p.set_defaults(func=cmd_serve)
+
+    p = subparsers.add_parser('quota', help="Show the shared API quota: tokens, waiting jobs and requests per day")
+    _add_quota_options(p)
+    p.add_argument('--days', type=int, default=7, help="Number of days of the ledger to print")
+    p.set_defaults(func=cmd_quota)
+
+    p = subparsers.add_parser('cache', help="Show or clear the local API response cache")
+    _add_cache_options(p)
+    p.add_argument('--clear', action='store_true', help="Delete every cached response")
+    p.add_argument('--clear-expired', action='store_true', help="Delete cached responses older than --cache-ttl")
+    p.set_defaults(func=cmd_cache)
+
+    return parser
+
+
+def main(argv=None):
+    from pyb.libs.quota import QuotaExceeded
+    args = build_parser().parse_args(argv)
+    try:
+        return _run(args)
+    except QuotaExceeded as e:
+        print(f"Error: {e}")
+        return 1
+
+
+def _run(args):
+    # The analysis manages its own per-stage instrumentation
+    if args.func is cmd_analyze or not (args.report or args.profile_dir):
+        args.func(args)
+        return 0
+
+    from pyb.libs import instrumentation
+    recorder = instrumentation.enable(trace_memory=args.trace_memory, profile_dir=args.profile_dir)
+    try:
+        with instrumentation.span(args.command):
+            args.func(args)
+    finally:
+        instrumentation.disable()
+        if args.report:
+            recorder.write_report(args.report)
+            print(f"Run report saved to {args.report}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
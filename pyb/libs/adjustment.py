@@ -0,0 +1,246 @@
+"""
+Price adjustment computed on demand from unadjusted bars and corporate-action factors.
+
+Downloading every adjustment type ('ex_rights', 'bc_rights', 'fc_rights') costs a full
+download each, and one type overwrites the other's files. Instead the candlestick files can
+hold the unadjusted ('ex_rights') bars, with a sparse factor series per symbol in the
+sibling ``adjustment_factors`` dataset: one record per corporate action, holding the step
+of the backward adjustment factor F on its ex-date. Loaders then turn stored prices into
+any adjustment type with one cumulative product over the date x symbol grid:
+
+    bc_rights = ex_rights * F        fc_rights = ex_rights * F / F[last]
+
+The API has no factor endpoint, so the factors are derived from one 'ex_rights' and one
+'bc_rights' download of the same range (see factor_events).
+"""
+
+import os
+import numpy as np
+
+from .columnar_store import read_json_symbol, read_symbol
+
+ADJUSTMENTS = ('ex_rights', 'bc_rights', 'fc_rights')
+PRICE_FIELDS = ('open', 'high', 'low', 'close')
+FACTOR_DATASET = 'adjustment_factors'
+# Prices from the API are rounded to this tick
+PRICE_TICK = 0.001
+
+
+def get_factor_dir(candlestick_dir):
+    """Return the factor dataset directory that belongs to a candlestick directory."""
+    return os.path.join(os.path.dirname(os.path.abspath(candlestick_dir)), FACTOR_DATASET)
+
+
+def factor_events(days, raw_close, adjusted_close, tick=PRICE_TICK):
+    """
+    Derive corporate-action events from unadjusted and backward-adjusted closes of one stock.
+
+    The backward factor F = adjusted / raw is constant between corporate actions. An event is
+    recorded on the first day F moves by more than the rounding of the two prices allows.
+
+    Args:
+        days (numpy.ndarray): Sorted dates (datetime64[D]).
+        raw_close (numpy.ndarray): Unadjusted ('ex_rights') closes; NaN where missing.
+        adjusted_close (numpy.ndarray): Backward-adjusted ('bc_rights') closes; NaN where missing.
+        tick (float): Price rounding of the API.
+
+    Returns:
+        tuple: (event dates, ratios). The first ratio is F itself, each later one the step of F,
+            so np.cumprod(ratios) is F from each event date on.
+    """
+    valid = np.isfinite(raw_close) & np.isfinite(adjusted_close) & (raw_close > 0) & (adjusted_close > 0)
+    days, raw, adjusted = days[valid], raw_close[valid], adjusted_close[valid]
+    factor = adjusted / raw
+    # Relative error of a ratio of two prices each rounded to the tick, for F and for the level it is compared to
+    slack = tick * (1.0 / raw + 1.0 / adjusted)
+    event_rows, ratios, level = [], [], None
+    for i in range(len(days)):
+        if level is None or abs(factor[i] / level - 1.0) > slack[i]:
+            ratios.append(factor[i] if level is None else factor[i] / level)
+            event_rows.append(i)
+            level = factor[i]
+    return days[event_rows], np.array(ratios, dtype=np.float64)
+
+
+def factor_records(event_days, ratios, tz='+08:00'):
+    """Return factor events as records ({'date', 'factor'}) in the API's date format."""
+    return [{'date': f"{day}T00:00:00{tz}", 'factor': float(ratio)}
+            for day, ratio in zip(event_days.astype(str), ratios)]
+
+
+def read_factors(factor_dir, symbol):
+    """
+    Read one symbol's factor events from <factor_dir>/<symbol>.npz or <symbol>.json.
+
+    Returns:
+        tuple: (event dates, ratios), or None if the symbol has no factors.
+    """
+    if os.path.exists(os.path.join(factor_dir, f"{symbol}.npz")):
+        columns = read_symbol(factor_dir, symbol, ['factor'])
+    else:
+        columns = read_json_symbol(factor_dir, symbol, ['factor'])
+    if columns is None or not len(columns['date']):
+        return None
+    return columns['date'], columns['factor']
+
+
+def backward_factors(event_days, ratios, days):
+    """Return F on each of ``days``: the product of the ratios on or before the day (NaN before the first event)."""
+    cumulative = np.cumprod(ratios)
+    positions = np.searchsorted(event_days, days, side='right') - 1
+    return np.where(positions >= 0, cumulative[np.maximum(positions, 0)], np.nan)
+
+
+def adjustment_multipliers(days, symbols, stored, adjustment, factor_dir):
+    """
+    Build the (date x symbol) multipliers that turn stored prices into another adjustment type.
+
+    The factor events of all symbols are scattered into one ratio grid, and a single cumulative
+    product down the dates gives every symbol's backward factor at once.
+
+    Args:
+        days (numpy.ndarray): Sorted dates (datetime64[D]) of the price grid.
+        symbols (list): Stock codes of the price grid's columns.
+        stored (list): Adjustment type each symbol is stored in (None if unknown).
+        adjustment (str): Requested type: 'ex_rights', 'bc_rights' or 'fc_rights'.
+        factor_dir (str): Factor dataset directory.
+
+    Returns:
+        tuple: (multipliers of shape (len(days), len(symbols)), boolean mask of the symbols that could
+            be converted). Multipliers are NaN before a symbol's first factor event.
+    """
+    if adjustment not in ADJUSTMENTS:
+        raise ValueError(f"Unknown adjustment '{adjustment}'. Expected one of {list(ADJUSTMENTS)}.")
+    multipliers = np.ones((len(days), len(symbols)))
+    convertible = np.array([kind == adjustment for kind in stored], dtype=bool)
+    needed = [j for j, kind in enumerate(stored) if kind != adjustment and kind in ADJUSTMENTS]
+    if not needed or not len(days):
+        return multipliers, convertible
+
+    steps = np.ones((len(days), len(needed)))
+    first_rows = np.full(len(needed), len(days))
+    totals = np.ones(len(needed))
+    for k, j in enumerate(needed):
+        events = read_factors(factor_dir, symbols[j])
+        if events is None:
+            continue
+        event_days, ratios = events
+        # Events before the grid fold into its first row; events after it only count towards the total
+        rows = np.searchsorted(days, event_days)
+        inside = rows < len(days)
+        np.multiply.at(steps[:, k], rows[inside], ratios[inside])
+        first_rows[k] = rows[0]
+        totals[k] = np.prod(ratios)
+        convertible[j] = True
+    factors = np.cumprod(steps, axis=0)
+    factors[np.arange(len(days))[:, None] < first_rows[None, :]] = np.nan
+
+    scales = {'ex_rights': np.ones_like(factors), 'bc_rights': factors, 'fc_rights': factors / totals}
+    kinds = np.array([stored[j] for j in needed], dtype=object)
+    target = scales[adjustment]
+    for kind in set(kinds):
+        columns = np.nonzero(kinds == kind)[0]
+        multipliers[:, np.array(needed)[columns]] = target[:, columns] / scales[kind][:, columns]
+    return multipliers, convertible
+
+
+def _stored_adjustments(symbols, candlestick_dir, fmt='json'):
+    """Return the adjustment type each symbol's file is stored in, from the data catalog."""
+    from .catalog import get_catalog
+    entries = get_catalog(candlestick_dir).entries(list(symbols), fmt) if os.path.isdir(candlestick_dir) else {}
+    return [entries[symbol]['adjustment'] if symbol in entries else None for symbol in symbols]
+
+
+def _report_unconvertible(symbols, stored, convertible, adjustment, factor_dir):
+    for symbol, kind, ok in zip(symbols, stored, convertible):
+        if ok:
+            continue
+        if kind is None:
+            print(f"Warning: Unknown adjustment of the candlestick data for {symbol}; it cannot be turned into "
+                  f"'{adjustment}'. Skipping {symbol}.")
+        else:
+            print(f"Warning: No adjustment factors for {symbol} in {factor_dir}; its '{kind}' prices cannot be "
+                  f"turned into '{adjustment}'. Skipping {symbol}.")
+
+
+def adjust_frame(frame, candlestick_dir, adjustment, output_format='bt', factor_dir=None, fmt='json'):
+    """
+    Convert a frame from get_candlestick_data to an adjustment type.
+
+    Symbols that are already stored in the requested type are left as they are; symbols whose
+    prices cannot be converted (unknown type or no factors) are dropped with a warning.
+
+    Args:
+        frame (pandas.DataFrame): 'bt' (date x symbol) or 'double' ([date, symbol] index) frame.
+        candlestick_dir (str): Directory the frame was loaded from; its catalog holds the stored types.
+        adjustment (str): 'ex_rights', 'bc_rights' or 'fc_rights'.
+        output_format (str): Layout of the frame, 'bt' or 'double'.
+        factor_dir (str, optional): Factor dataset directory. Defaults to the sibling of candlestick_dir.
+        fmt (str): Format of the candlestick files, 'json' or 'npz'.
+
+    Returns:
+        pandas.DataFrame: The adjusted frame.
+    """
+    from .columnar_store import from_datetime_index
+    if frame.empty:
+        return frame
+    if factor_dir is None:
+        factor_dir = get_factor_dir(candlestick_dir)
+
+    if output_format == 'bt':
+        symbols = [str(symbol) for symbol in frame.columns]
+        days, _ = from_datetime_index(frame.index)
+        stored = _stored_adjustments(symbols, candlestick_dir, fmt)
+        multipliers, convertible = adjustment_multipliers(days, symbols, stored, adjustment, factor_dir)
+        _report_unconvertible(symbols, stored, convertible, adjustment, factor_dir)
+        adjusted = frame * multipliers.astype(frame.to_numpy().dtype, copy=False)
+        return adjusted.loc[:, convertible]
+
+    if output_format == 'double':
+        dates_level, symbols_level = frame.index.levels[0], frame.index.levels[1]
+        date_codes, symbol_codes = frame.index.codes[0], frame.index.codes[1]
+        symbols = [str(symbol) for symbol in symbols_level]
+        days, _ = from_datetime_index(dates_level)
+        stored = _stored_adjustments(symbols, candlestick_dir, fmt)
+        multipliers, convertible = adjustment_multipliers(days, symbols, stored, adjustment, factor_dir)
+        _report_unconvertible(symbols, stored, convertible, adjustment, factor_dir)
+        scale = multipliers[date_codes, symbol_codes]
+        adjusted = frame.copy()
+        for field in PRICE_FIELDS:
+            if field in adjusted.columns:
+                adjusted[field] = adjusted[field].to_numpy() * scale.astype(adjusted[field].dtype, copy=False)
+        return adjusted[convertible[symbol_codes]]
+
+    print(f"Adjustment is not supported for output format '{output_format}'. Returning stored prices.")
+    return frame
+
+
+def adjust_panel(panel, candlestick_dir, adjustment, factor_dir=None, fmt='json'):
+    """
+    Convert the price fields of an OHLCVPanel to an adjustment type in place.
+
+    Symbols whose prices cannot be converted are set to NaN with a warning.
+
+    Args:
+        panel (pyb.libs.ohlcv_interface.OHLCVPanel): Panel from get_ohlcv_panel.
+        candlestick_dir (str): Directory the panel was loaded from.
+        adjustment (str): 'ex_rights', 'bc_rights' or 'fc_rights'.
+        factor_dir (str, optional): Factor dataset directory. Defaults to the sibling of candlestick_dir.
+        fmt (str): Format of the candlestick files, 'json' or 'npz'.
+
+    Returns:
+        OHLCVPanel: The same panel.
+    """
+    from .columnar_store import from_datetime_index
+    if factor_dir is None:
+        factor_dir = get_factor_dir(candlestick_dir)
+    days, _ = from_datetime_index(panel.dates)
+    stored = _stored_adjustments(panel.symbols, candlestick_dir, fmt)
+    multipliers, convertible = adjustment_multipliers(days, panel.symbols, stored, adjustment, factor_dir)
+    _report_unconvertible(panel.symbols, stored, convertible, adjustment, factor_dir)
+    multipliers[:, ~convertible] = np.nan
+    multipliers = multipliers.astype(panel.values.dtype, copy=False)
+    for i, field in enumerate(panel.fields):
+        if field in PRICE_FIELDS:
+            panel.values[i] *= multipliers
+    return panel
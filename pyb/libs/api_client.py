@@ -1,12 +1,167 @@
 # libs/api_client.py
+import os
+import threading
+import time
 import requests
+from . import instrumentation
+from . import quota
+from . import response_cache
+from .response_cache import enable_response_cache, disable_response_cache  # noqa: F401  (re-exported)
+
+MAX_RETRIES = 3
+RETRY_INTERVAL = 0.14  # base back-off in seconds after a 429 response
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class APIError(Exception):
+    """Raised when the API answers with a non-200 status or a non-success code."""
+
+    def __init__(self, message, status_code=None, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def get_token():
+    """Return the API token from config/config.py, falling back to the LIXINGER_TOKEN environment variable."""
+    try:
+        from config.config import TOKEN
+        return TOKEN
+    except ImportError:
+        return os.environ.get("LIXINGER_TOKEN", "")
+
+
+def _parse_retry_after(value):
+    """Parse a Retry-After header given in seconds; return None if absent or not numeric."""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Thread-safe limiter that spaces out requests by a minimum interval."""
+
+    def __init__(self, min_interval=0.0):
+        """
+        Args:
+            min_interval (float): Minimum number of seconds between two requests.
+        """
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def set_rate(self, requests_per_second):
+        """Set the limit in requests per second (None or 0 disables limiting)."""
+        self.min_interval = 1.0 / requests_per_second if requests_per_second else 0.0
+
+    def wait(self):
+        """Block until the caller is allowed to send the next request."""
+        if self.min_interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_time)
+            self._next_time = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+rate_limiter = RateLimiter()
+
+
+def get_session():
+    """Return the process-wide HTTP session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = requests.Session()
+    return _session
+
 
 def post_request(url, payload):
-    """Send a POST request and verify the API response."""
-    response = requests.post(url, json=payload)
+    """
+    Send a POST request and verify the API response.
+
+    When a shared quota is configured (pyb.libs.quota.configure_quota), the request first
+    draws a token from it, and a 429 answer holds the quota for every process. When the
+    response cache is enabled (enable_response_cache), a cached answer to the same endpoint
+    and payload is returned without a request, and successful answers are stored.
+    """
+    cache = response_cache.get_response_cache()
+    if cache is not None:
+        cached = cache.get(url, payload)
+        if cached is not None:
+            return cached
+        if cache.offline:
+            raise APIError(f"No cached response for {url} in offline mode")
+    coordinator = quota.get_coordinator()
+    if coordinator is not None:
+        coordinator.acquire()
+    rate_limiter.wait()
+    start = time.perf_counter()
+    response = get_session().post(url, json=payload)
+    recorder = instrumentation.get_recorder()
+    if recorder is not None:
+        recorder.record_request(url, time.perf_counter() - start, len(response.content), response.status_code)
     if response.status_code != 200:
-        raise Exception(f"Request failed with status code {response.status_code}")
+        retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+        if response.status_code == 429 and coordinator is not None:
+            coordinator.backoff(retry_after if retry_after is not None else RETRY_INTERVAL)
+        raise APIError(f"Request failed with status code {response.status_code}", status_code=response.status_code,
+                       retry_after=retry_after)
     result = response.json()
     if result.get("code") != 1:
-        raise Exception(f"API error: {result.get('message')}")
+        raise APIError(f"API error: {result.get('message')}", status_code=response.status_code)
+    if cache is not None:
+        cache.put(url, payload, result)
     return result
+
+
+def call_with_retries(func, *args, label="request", max_retries=MAX_RETRIES, retry_interval=RETRY_INTERVAL, **kwargs):
+    """
+    Call a download function, retrying with a growing back-off when the API answers 429 or a 5xx status.
+
+    A Retry-After header sent with the 429 takes precedence when it asks for a longer wait.
+
+    Args:
+        func (callable): The download function to call.
+        label (str): Description used in log messages.
+        max_retries (int): Maximum number of attempts.
+        retry_interval (float): Base back-off in seconds; attempt n waits n * retry_interval.
+
+    Returns:
+        The function's return value, or None if every attempt failed.
+
+    Raises:
+        QuotaExceeded: If the shared daily quota is used up; retrying cannot help, so the job stops.
+    """
+    for attempt in range(1, max_retries + 1):
+        try:
+            result = func(*args, **kwargs)
+            _record_retries(func, attempt - 1)
+            return result
+        except quota.QuotaExceeded:
+            raise
+        except Exception as e:
+            if '429' in str(e):
+                print(f"Received 429 Too Many Requests for {label}, attempt {attempt}/{max_retries}. Waiting before retrying...")
+                time.sleep(max(retry_interval * attempt, getattr(e, 'retry_after', None) or 0.0))
+            elif (getattr(e, 'status_code', None) or 0) >= 500:
+                print(f"Server error for {label} ({e}), attempt {attempt}/{max_retries}. Waiting before retrying...")
+                time.sleep(retry_interval * attempt)
+            else:
+                print(f"Error downloading {label}: {e}")
+                _record_retries(func, attempt - 1)
+                return None
+    _record_retries(func, max_retries)
+    return None
+
+
+def _record_retries(func, retries):
+    recorder = instrumentation.get_recorder()
+    if recorder is not None:
+        recorder.record_retries(getattr(func, '__name__', 'request'), retries)
@@ -1,5 +1,5 @@
-from config.config import TOKEN
-from .api_client import post_request
+from .api_client import post_request, get_token
+from .endpoints import endpoint_url, CANDLESTICK_PATH
 
 
 def download_candlestick(stock_code, start_date, end_date, candlestick_type='bc_rights'):
@@ -15,9 +15,9 @@ def download_candlestick(stock_code, start_date, end_date, candlestick_type='bc_
     Returns:
         list: The list of candlestick data records from the API.
     """
-    url = "https://open.lixinger.com/api/hk/company/candlestick"
+    url = endpoint_url(CANDLESTICK_PATH)
     payload = {
-        "token": TOKEN,
+        "token": get_token(),
         "type": candlestick_type,
         "startDate": start_date,
         "endDate": end_date,
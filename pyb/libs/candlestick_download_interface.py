@@ -1,56 +1,312 @@
 import os
-import json
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .api_client import call_with_retries
 from .candlestick import download_candlestick
+from .catalog import get_catalog
+from .adjustment import backward_factors, factor_events, factor_records, get_factor_dir, read_factors
+from .columnar_store import write_symbol, write_json_symbol, get_store_dir, records_to_columns
 from pyb.paths import get_data_dir
 
 
-def download_candlestick_data(stock_codes, start_date, end_date, candlestick_type='bc_rights', candlestick_dir=None, request_interval=0.07):
+def _fetch(stock, start_date, end_date, candlestick_type):
+    """Download candlestick data for one stock; return the records, [] if empty or None on error."""
+    print(f"Downloading candlestick data for {stock}...")
+    return call_with_retries(download_candlestick, stock, start_date, end_date,
+                             candlestick_type=candlestick_type, label=f"candlestick data for {stock}")
+
+
+def _save_json(stock, data, candlestick_dir, compact=False, adjustment=None, covered=None, merge=False):
+    """Write one stock's records to <candlestick_dir>/<stock>.json; return the records written or None on error."""
+    output_file = os.path.join(candlestick_dir, f"{stock}.json")
+    try:
+        records = write_json_symbol(candlestick_dir, stock, data, compact, adjustment, covered, merge)
+        print(f"Candlestick data for {stock} saved to {output_file}")
+        return records
+    except Exception as e:
+        print(f"Error saving data for {stock} to {output_file}: {e}")
+        return None
+
+
+def _fetch_ranges(stock, ranges, candlestick_type, request_interval):
+    """Download each missing date range of one stock; return the combined records or None if any range failed."""
+    data = []
+    for i, (range_start, range_end) in enumerate(ranges):
+        if i:
+            time.sleep(request_interval)
+        part = _fetch(stock, range_start, range_end, candlestick_type)
+        if part is None:
+            return None
+        data.extend(part)
+    return data
+
+
+def _fetch_with_factors(stock, ranges, candlestick_type, request_interval, factors):
+    """Download the missing ranges, plus the same ranges as 'bc_rights' when factors are derived."""
+    data = _fetch_ranges(stock, ranges, candlestick_type, request_interval)
+    if not factors or not data:
+        return data, None
+    time.sleep(request_interval)
+    adjusted = _fetch_ranges(stock, ranges, 'bc_rights', request_interval)
+    if adjusted is None:
+        return None, None
+    return data, adjusted
+
+
+def _save_factors(stock, raw, adjusted, factor_dir, store, covered):
+    """
+    Derive one stock's adjustment factors from its stored unadjusted closes and the downloaded
+    'bc_rights' records, and save them to the factor dataset.
+    """
+    days, raw_close = raw['date'], raw['close']
+    # Backward-adjusted closes of days downloaded earlier are reconstructed from the stored factors
+    stored = read_factors(factor_dir, stock)
+    if stored is not None:
+        adjusted_close = raw_close * backward_factors(stored[0], stored[1], days)
+    else:
+        adjusted_close = np.full(len(days), np.nan)
+    new = records_to_columns(adjusted, ['close'])
+    rows = np.searchsorted(days, new['date'])
+    keep = rows < len(days)
+    keep[keep] = days[rows[keep]] == new['date'][keep]
+    adjusted_close[rows[keep]] = new['close'][keep]
+    event_days, ratios = factor_events(days, raw_close, adjusted_close)
+    if not len(event_days):
+        return
+    records = factor_records(event_days, ratios, str(raw['tz']) or '+08:00')
+    try:
+        if store == 'columnar':
+            write_symbol(factor_dir, stock, records, ['factor'], covered=covered)
+        else:
+            write_json_symbol(factor_dir, stock, records, compact=True, covered=covered)
+    except Exception as e:
+        print(f"Error saving adjustment factors for {stock} to {factor_dir}: {e}")
+
+
+def _covered(stock, output_dir, fmt, start_date, end_date):
+    """Return the date range recorded for a stock's file after a write, falling back to the requested one."""
+    entry = get_catalog(output_dir).entry(stock, fmt)
+    if entry is None or entry['covered_from'] is None:
+        return start_date, end_date
+    return entry['covered_from'], entry['covered_to']
+
+
+def _plan(stock, start_date, end_date, plans):
+    """Return the (ranges, merge) download plan of one stock; the whole range when not incremental."""
+    if plans is None:
+        return [(start_date, end_date)], False
+    return plans[stock]
+
+
+def _download_one(stock, start_date, end_date, candlestick_type, candlestick_dir, request_interval, plans=None,
+                  factors=False):
+    """Download and save candlestick data for a single stock; return the downloaded data or None."""
+    ranges, merge = _plan(stock, start_date, end_date, plans)
+    if not ranges:
+        print(f"Candlestick data for {stock} already covers {start_date} to {end_date}.")
+        return []
+    data, adjusted = _fetch_with_factors(stock, ranges, candlestick_type, request_interval, factors)
+    if data is None or (not data and not merge):
+        print(f"No data returned for {stock}.")
+        data = None
+    elif not data:
+        print(f"No new data returned for {stock}.")
+        get_catalog(candlestick_dir).extend_coverage(stock, start_date, end_date)
+    else:
+        records = _save_json(stock, data, candlestick_dir, adjustment=candlestick_type, covered=(start_date, end_date),
+                             merge=merge)
+        if factors and records is not None:
+            _save_factors(stock, records_to_columns(records, ['close']), adjusted, get_factor_dir(candlestick_dir),
+                          'json', _covered(stock, candlestick_dir, 'json', start_date, end_date))
+    time.sleep(request_interval)
+    return data
+
+
+def _stream_one(stock, start_date, end_date, candlestick_type, output_dir, request_interval, store, plans=None,
+                factors=False):
+    """Download and save one stock, then drop the payload and return a lightweight summary."""
+    summary = {'symbol': stock, 'rows': 0, 'first_date': None, 'last_date': None, 'status': 'error', 'path': None}
+    ranges, merge = _plan(stock, start_date, end_date, plans)
+    if not ranges:
+        print(f"Candlestick data for {stock} already covers {start_date} to {end_date}.")
+        summary['status'] = 'current'
+        return summary
+    data, adjusted = _fetch_with_factors(stock, ranges, candlestick_type, request_interval, factors)
+    if data is None:
+        print(f"No data returned for {stock}.")
+    elif not data:
+        print(f"No data returned for {stock}.")
+        summary['status'] = 'empty'
+        if merge:
+            get_catalog(output_dir).extend_coverage(stock, start_date, end_date)
+    else:
+        covered = (start_date, end_date)
+        raw = None
+        if store == 'columnar':
+            try:
+                raw = write_symbol(output_dir, stock, data, adjustment=candlestick_type, covered=covered, merge=merge)
+                dates = raw['date']
+                summary['path'] = os.path.join(output_dir, f"{stock}.npz")
+                print(f"Candlestick data for {stock} saved to {summary['path']}")
+            except Exception as e:
+                print(f"Error saving data for {stock} to {output_dir}: {e}")
+        else:
+            records = _save_json(stock, data, output_dir, compact=True, adjustment=candlestick_type, covered=covered,
+                                 merge=merge)
+            if records is not None:
+                dates = [rec['date'][:10] for rec in records if rec.get('date') is not None]
+                summary['path'] = os.path.join(output_dir, f"{stock}.json")
+                if factors:
+                    raw = records_to_columns(records, ['close'])
+        if factors and raw is not None:
+            fmt = 'npz' if store == 'columnar' else 'json'
+            _save_factors(stock, raw, adjusted, get_factor_dir(output_dir), store,
+                          _covered(stock, output_dir, fmt, start_date, end_date))
+        if summary['path'] is not None:
+            summary['status'] = 'ok'
+            summary['rows'] = len(dates)
+            summary['first_date'] = str(min(dates))[:10] if len(dates) else None
+            summary['last_date'] = str(max(dates))[:10] if len(dates) else None
+    del data, adjusted
+    time.sleep(request_interval)
+    return summary
+
+
+def _check_factors(candlestick_type, factors):
+    if factors and candlestick_type != 'ex_rights':
+        raise ValueError(f"Adjustment factors are derived for unadjusted bars; use candlestick_type='ex_rights' "
+                         f"instead of '{candlestick_type}'.")
+
+
+def _plan_downloads(stock_codes, start_date, end_date, candlestick_type, candlestick_dir, fmt):
+    """Bring the directory's catalog up to date and plan the missing date ranges of every stock."""
+    catalog = get_catalog(candlestick_dir)
+    # Files from before the catalog have no known adjustment and are downloaded again in full once
+    catalog.scan(fmt)
+    return catalog.plan_downloads(stock_codes, start_date, end_date, candlestick_type, fmt)
+
+
+def iter_download_candlestick_data(stock_codes, start_date, end_date, candlestick_type='bc_rights', candlestick_dir=None,
+                                   request_interval=0.07, workers=1, store='json', incremental=False, factors=False):
+    """
+    Download candlestick data and yield a small summary per stock as soon as it is saved.
+
+    Each payload is written straight to storage and released, and at most ``2 * workers`` downloads are
+    in flight, so memory use does not grow with the size of the universe.
+
+    Args:
+        stock_codes (list or str): A list of stock codes or a single stock code string.
+        start_date (str): Start date in YYYY-MM-DD format.
+        end_date (str): End date in YYYY-MM-DD format.
+        candlestick_type (str): Adjustment type; defaults to 'bc_rights'.
+        candlestick_dir (str, optional): Output directory. Defaults to <project_root>/data/candlestick_data for
+            store='json' and <project_root>/data/columnar/candlestick_data for store='columnar'.
+        request_interval (float): Seconds each worker waits between API requests. Default is 0.07.
+        workers (int): Number of concurrent download threads. Default is 1.
+        store (str): 'json' for compact (unindented) JSON files or 'columnar' for the columnar .npz store.
+        incremental (bool): Only download the date ranges the data catalog (pyb.libs.catalog) has no record of
+            and merge them into the stored files. Default is False, which replaces the files.
+        factors (bool): Also download the same ranges as 'bc_rights' and save the adjustment factors they imply
+            to the sibling 'adjustment_factors' dataset (see pyb.libs.adjustment), so loaders can compute any
+            adjustment type from the stored bars. Requires candlestick_type='ex_rights'.
+
+    Yields:
+        dict: {'symbol', 'rows', 'first_date', 'last_date', 'status', 'path'} where status is 'ok', 'empty',
+            'current' (nothing to download) or 'error'. Rows and dates describe the stored file after the write.
+            Summaries are yielded in the order of stock_codes.
+    """
+    if store not in ('json', 'columnar'):
+        raise ValueError(f"Unknown store '{store}'. Expected 'json' or 'columnar'.")
+    _check_factors(candlestick_type, factors)
+    if isinstance(stock_codes, str):
+        stock_codes = [stock_codes]
+
+    if candlestick_dir is None:
+        if store == 'columnar':
+            candlestick_dir = get_store_dir('candlestick_data')
+        else:
+            candlestick_dir = os.path.join(get_data_dir(), "candlestick_data")
+    os.makedirs(candlestick_dir, exist_ok=True)
+
+    plans = None
+    if incremental:
+        fmt = 'npz' if store == 'columnar' else 'json'
+        plans = _plan_downloads(stock_codes, start_date, end_date, candlestick_type, candlestick_dir, fmt)
+    args = (start_date, end_date, candlestick_type, candlestick_dir, request_interval, store, plans, factors)
+    if workers <= 1:
+        for stock in stock_codes:
+            yield _stream_one(stock, *args)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for stock in stock_codes:
+            pending.append(executor.submit(_stream_one, stock, *args))
+            # Bound the number of in-flight payloads
+            while len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def download_candlestick_data(stock_codes, start_date, end_date, candlestick_type='bc_rights', candlestick_dir=None,
+                              request_interval=0.07, workers=1, stream=False, store='json', incremental=False,
+                              factors=False):
     """
     Download candlestick data for a list of stock codes and save them as JSON files in the candlestick data directory.
-    
+
     This function is designed to be used in a Jupyter notebook or other interactive environment and provides an interface for downloading data without command-line input.
-    
+
     Args:
         stock_codes (list or str): A list of stock codes or a single stock code string.
         start_date (str): Start date in YYYY-MM-DD format.
         end_date (str): End date in YYYY-MM-DD format.
         candlestick_type (str): Adjustment type; defaults to 'bc_rights'.
         candlestick_dir (str, optional): Path to the directory to store JSON files. If not provided, defaults to <project_root>/data/candlestick_data.
-        request_interval (float): Seconds to wait between API requests. Default is 0.07.
-        
+        request_interval (float): Seconds each worker waits between API requests. Default is 0.07.
+        workers (int): Number of concurrent download threads. Default is 1.
+        stream (bool): If True, write each stock as it arrives and keep only per-stock summaries in memory
+            (see iter_download_candlestick_data). Default is False.
+        store (str): With stream=True, 'json' (compact JSON) or 'columnar' (.npz columnar store).
+        incremental (bool): Only download the date ranges missing from the stored files, as recorded in the data
+            catalog (pyb.libs.catalog), and merge them in. Default is False, which replaces the files.
+        factors (bool): Store unadjusted bars plus adjustment factors: with candlestick_type='ex_rights', the same
+            ranges are also downloaded as 'bc_rights' and the factors they imply are saved to the sibling
+            'adjustment_factors' dataset. get_candlestick_data(adjustment=...) then computes any adjustment type.
+
     Returns:
         dict: A dictionary mapping each stock code to its downloaded candlestick data (list). If download fails for a stock, its value will be None.
+            With incremental=True only the newly downloaded records are returned ([] when nothing was missing).
+            With stream=True the values are summaries ({'rows', 'first_date', 'last_date', 'status', 'path', ...}) instead.
     """
+    if stream:
+        summaries = iter_download_candlestick_data(stock_codes, start_date, end_date, candlestick_type, candlestick_dir,
+                                                   request_interval, workers, store, incremental, factors)
+        return {summary['symbol']: summary for summary in summaries}
+
+    _check_factors(candlestick_type, factors)
     # Ensure stock_codes is a list
     if isinstance(stock_codes, str):
         stock_codes = [stock_codes]
-        
+
     # Determine the candlestick data directory
     if candlestick_dir is None:
         data_dir = get_data_dir()
         candlestick_dir = os.path.join(data_dir, "candlestick_data")
     os.makedirs(candlestick_dir, exist_ok=True)
 
-    results = {}
-    for stock in stock_codes:
-        print(f"Downloading candlestick data for {stock}...")
-        data = download_candlestick(stock, start_date, end_date, candlestick_type=candlestick_type)
-        if not data:
-            print(f"No data returned for {stock}.")
-            results[stock] = None
-        else:
-            output_file = os.path.join(candlestick_dir, f"{stock}.json")
-            try:
-                with open(output_file, "w", encoding="utf-8") as f:
-                    json.dump(data, f, indent=4, ensure_ascii=False)
-                print(f"Candlestick data for {stock} saved to {output_file}")
-            except Exception as e:
-                print(f"Error saving data for {stock} to {output_file}: {e}")
-            results[stock] = data
-        time.sleep(request_interval)
+    plans = None
+    if incremental:
+        plans = _plan_downloads(stock_codes, start_date, end_date, candlestick_type, candlestick_dir, 'json')
+    args = (start_date, end_date, candlestick_type, candlestick_dir, request_interval, plans, factors)
+    if workers <= 1:
+        return {stock: _download_one(stock, *args) for stock in stock_codes}
 
-    return results
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {stock: executor.submit(_download_one, stock, *args) for stock in stock_codes}
+        return {stock: future.result() for stock, future in futures.items()}
 
 
 if __name__ == '__main__':
@@ -59,4 +315,4 @@ if __name__ == '__main__':
     start = '2024-02-17'
     end = '2025-02-17'
     data_map = download_candlestick_data(stock_list, start, end)
-    print(data_map) 
\ No newline at end of file
+    print(data_map)
@@ -1,10 +1,11 @@
 import os
 import json
-import glob
 import pandas as pd
+from .columnar_store import slice_records
 
 
-def get_candlestick_data(symbols=None, output_format='bt', candlestick_dir=None):
+def get_candlestick_data(symbols=None, output_format='bt', candlestick_dir=None, compact=False, adjustment=None,
+                         start_date=None, end_date=None):
     """
     Retrieve candlestick data for selected stocks from local JSON files.
     
@@ -12,6 +13,13 @@ def get_candlestick_data(symbols=None, output_format='bt', candlestick_dir=None)
       symbols: A list of symbols or a single symbol string. If not provided, all stocks in the candlestick data directory are used.
       output_format: Desired output format, 'bt' for pivot table (date index, symbols as columns with close price) or 'double' for multiindex dataframe on [date, symbol].
       candlestick_dir: Optional path to the directory containing candlestick JSON files. If not provided, defaults to <project_root>/data/candlestick_data.
+      compact: If True, return float32 values with a categorical symbol level (see pyb.libs.compact_frames), roughly halving memory.
+      adjustment: Price adjustment to return: 'ex_rights', 'bc_rights' or 'fc_rights'. Prices stored in another type are
+        converted with the stored adjustment factors (see pyb.libs.adjustment); symbols that cannot be converted are skipped.
+        If not provided, prices are returned as stored.
+      start_date: First date to return (YYYY-MM-DD, inclusive). Symbols whose catalogued dates all lie outside the range
+        are not read, and the range is cut out of each file's sorted records by binary search before they are converted.
+      end_date: Last date to return (YYYY-MM-DD, inclusive).
     
     Returns:
       pandas.DataFrame: The resulting dataframe according to the selected format.
@@ -21,12 +29,21 @@ def get_candlestick_data(symbols=None, output_format='bt', candlestick_dir=None)
     if candlestick_dir is None:
         candlestick_dir = os.path.join(BASE_DIR, 'data', 'candlestick_data')
     
-    # If symbols is None, get all available symbols from JSON files
+    # If symbols is None, get all available symbols from the data catalog (or the JSON files)
     if symbols is None:
-        all_files = glob.glob(os.path.join(candlestick_dir, '*.json'))
-        symbols = [os.path.splitext(os.path.basename(f))[0] for f in all_files]
+        from .catalog import list_dataset_symbols
+        symbols = list_dataset_symbols(candlestick_dir, '.json')
     elif isinstance(symbols, str):
         symbols = [symbols]
+    if start_date is not None or end_date is not None:
+        from .catalog import prune_symbols
+        symbols = prune_symbols(candlestick_dir, symbols, start_date, end_date)
+
+    if compact:
+        from .compact_frames import load_compact_frame
+        result = load_compact_frame(symbols, candlestick_dir, 'close', output_format, label='Candlestick',
+                                    start_date=start_date, end_date=end_date)
+        return _adjust(result, candlestick_dir, adjustment, output_format)
     
     records = []
     for symbol in symbols:
@@ -41,7 +58,7 @@ def get_candlestick_data(symbols=None, output_format='bt', candlestick_dir=None)
             print(f"Error loading data for symbol {symbol} from {file_path}: {e}")
             continue
         
-        for rec in data:
+        for rec in slice_records(data, start_date, end_date):
             record_date = rec.get('date')
             close_val = rec.get('close')
             if record_date is not None and close_val is not None:
@@ -70,7 +87,15 @@ def get_candlestick_data(symbols=None, output_format='bt', candlestick_dir=None)
         print(f"Output format '{output_format}' not recognized. Returning original dataframe.")
         result = df
     
-    return result
+    return _adjust(result, candlestick_dir, adjustment, output_format)
+
+
+def _adjust(result, candlestick_dir, adjustment, output_format):
+    """Convert loaded prices to the requested adjustment type, if any."""
+    if adjustment is None:
+        return result
+    from .adjustment import adjust_frame
+    return adjust_frame(result, candlestick_dir, adjustment, output_format)
 
 
 if __name__ == '__main__':
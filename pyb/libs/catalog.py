@@ -0,0 +1,509 @@
+"""
+Catalog of per-symbol data coverage.
+
+Each data root (the parent of the dataset directories, e.g. <project_root>/data or
+<project_root>/data/columnar) holds one SQLite file, catalog.sqlite, with a row per
+dataset and symbol: first and last date, row count, the date range that was requested
+from the API, adjustment type, checksum, size and mtime of the file. Writers update
+the row in a transaction right after the file is renamed into place, so loaders can
+list and plan reads, and downloaders can compute the exact missing date ranges,
+without opening the data files.
+
+An entry whose size or mtime no longer matches its file (written by another tool, or
+a crash between the rename and the catalog update) is treated as missing and is
+rebuilt from the file the next time it is looked up.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+CATALOG_FILE = 'catalog.sqlite'
+
+# Forward-adjusted prices rewrite the whole history after every corporate action, so they can never be appended to
+FORWARD_ADJUSTMENTS = ('fc_rights', 'lxr_fc_rights')
+
+FORMATS = {'.json': 'json', '.npz': 'npz'}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    dataset TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    format TEXT NOT NULL,
+    first_date TEXT,
+    last_date TEXT,
+    rows INTEGER NOT NULL,
+    covered_from TEXT,
+    covered_to TEXT,
+    adjustment TEXT,
+    checksum TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (dataset, symbol)
+);
+CREATE TABLE IF NOT EXISTS datasets (
+    dataset TEXT PRIMARY KEY,
+    format TEXT NOT NULL,
+    directory_mtime_ns INTEGER NOT NULL
+);
+"""
+
+_COLUMNS = ('symbol', 'format', 'first_date', 'last_date', 'rows', 'covered_from', 'covered_to', 'adjustment',
+            'checksum', 'size', 'mtime_ns', 'updated_at')
+
+
+def file_checksum(path):
+    """Return the BLAKE2b digest (32 hex characters) of a file's contents."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def checksum_bytes(data):
+    """Return the file_checksum of bytes about to be written."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def directory_state(directory):
+    """Return a directory's mtime in nanoseconds, or None if it does not exist."""
+    try:
+        return os.stat(directory).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _day(value):
+    """Normalize a date string, datetime64 or date to 'YYYY-MM-DD' (None stays None)."""
+    if value is None:
+        return None
+    return str(np.datetime64(str(value)[:10], 'D'))
+
+
+def _shift(day, days):
+    return str(np.datetime64(day, 'D') + np.timedelta64(days, 'D'))
+
+
+def date_range_of(dates):
+    """
+    Return the first date, last date and count of a collection of dates.
+
+    Args:
+        dates (sequence): Date strings as returned by the API or a datetime64[D] array.
+
+    Returns:
+        tuple: (first 'YYYY-MM-DD' or None, last 'YYYY-MM-DD' or None, number of dates)
+    """
+    days = np.asarray([str(d)[:10] for d in dates], dtype='datetime64[D]')
+    if not len(days):
+        return None, None, 0
+    return str(days.min()), str(days.max()), len(days)
+
+
+class DataCatalog:
+    """
+    Coverage catalog for one dataset directory.
+
+    Args:
+        directory (str): Dataset directory holding <symbol>.json or <symbol>.npz files. The catalog
+            lives in <parent of directory>/catalog.sqlite and the dataset is the directory's name.
+    """
+
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        self.dataset = os.path.basename(self.directory)
+        self.path = os.path.join(os.path.dirname(self.directory), CATALOG_FILE)
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def __repr__(self):
+        return f"DataCatalog(dataset={self.dataset!r}, path={self.path!r})"
+
+    def _connect(self):
+        """Open a connection; each call gets its own so the catalog can be used from several threads."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            with self._lock:
+                # WAL lets loaders read while a downloader writes; NORMAL skips an fsync per commit
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.executescript(_SCHEMA)
+                self._initialized = True
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def _file(self, symbol, fmt):
+        return os.path.join(self.directory, f"{symbol}.{fmt}")
+
+    def record(self, symbol, fmt, dates, adjustment=None, covered=None, checksum=None, merge=False,
+               directory_was=None):
+        """
+        Record a file that was just written.
+
+        Args:
+            symbol (str): Stock code.
+            fmt (str): 'json' or 'npz'.
+            dates (sequence): Dates of the rows in the file.
+            adjustment (str, optional): Price adjustment type, e.g. 'bc_rights'.
+            covered (tuple, optional): (start, end) date range that was requested from the API. Defaults to
+                the first and last date.
+            checksum (str, optional): file_checksum of the file, if the writer already has it.
+            merge (bool): The records were added to the stored ones, so the new range extends the recorded one.
+            directory_was (int, optional): directory_state() from before the write. If the catalog was current
+                then, it stays current; otherwise symbols() keeps listing the directory until the next scan().
+
+        Returns:
+            dict: The catalog entry.
+        """
+        path = self._file(symbol, fmt)
+        stat = os.stat(path)
+        first_date, last_date, rows = date_range_of(dates)
+        covered_from, covered_to = covered if covered is not None else (first_date, last_date)
+        previous = self._stored([symbol]).get(symbol) if merge else None
+        if previous is not None and previous['covered_from'] is not None:
+            covered_from = min(_day(covered_from), previous['covered_from'])
+            covered_to = max(_day(covered_to), previous['covered_to'])
+        entry = {
+            'symbol': symbol, 'format': fmt, 'first_date': first_date, 'last_date': last_date, 'rows': rows,
+            'covered_from': _day(covered_from), 'covered_to': _day(covered_to), 'adjustment': adjustment,
+            'checksum': checksum or file_checksum(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'updated_at': time.time(),
+        }
+        self._upsert([entry], fmt, directory_was)
+        return entry
+
+    def _upsert(self, entries, fmt, directory_was=None):
+        connection = self._connect()
+        try:
+            with connection:
+                connection.executemany(
+                    f"INSERT OR REPLACE INTO entries (dataset, {', '.join(_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * (len(_COLUMNS) + 1))})",
+                    [(self.dataset, *(entry[column] for column in _COLUMNS)) for entry in entries])
+                if directory_was is not None:
+                    # Only advance a listing that was complete before this write
+                    connection.execute("UPDATE datasets SET directory_mtime_ns = ? "
+                                       "WHERE dataset = ? AND format = ? AND directory_mtime_ns = ?",
+                                       (directory_state(self.directory), self.dataset, fmt, directory_was))
+        finally:
+            connection.close()
+
+    def extend_coverage(self, symbol, start_date, end_date):
+        """Widen the requested range of a symbol whose file did not change, e.g. after an empty download."""
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute(
+                    "UPDATE entries SET covered_from = min(coalesce(covered_from, ?), ?), "
+                    "covered_to = max(coalesce(covered_to, ?), ?), updated_at = ? WHERE dataset = ? AND symbol = ?",
+                    (_day(start_date), _day(start_date), _day(end_date), _day(end_date), time.time(),
+                     self.dataset, symbol))
+        finally:
+            connection.close()
+
+    def remove(self, symbols):
+        """Drop the entries of symbols whose files were deleted."""
+        connection = self._connect()
+        try:
+            with connection:
+                connection.executemany("DELETE FROM entries WHERE dataset = ? AND symbol = ?",
+                                       [(self.dataset, symbol) for symbol in symbols])
+        finally:
+            connection.close()
+
+    def _stored(self, symbols=None):
+        connection = self._connect()
+        try:
+            query = f"SELECT {', '.join(_COLUMNS)} FROM entries WHERE dataset = ?"
+            rows = connection.execute(query, (self.dataset,)).fetchall()
+        finally:
+            connection.close()
+        entries = {row[0]: dict(zip(_COLUMNS, row)) for row in rows}
+        if symbols is not None:
+            entries = {symbol: entries[symbol] for symbol in symbols if symbol in entries}
+        return entries
+
+    def _scan_file(self, symbol, fmt, adjustment=None):
+        """Index one file by reading its dates; return the entry or None if unreadable."""
+        from .columnar_store import read_json_symbol, read_symbol
+        if fmt == 'npz':
+            columns = read_symbol(self.directory, symbol, fields=[])
+        else:
+            columns = read_json_symbol(self.directory, symbol, fields=[])
+        if columns is None:
+            return None
+        path = self._file(symbol, fmt)
+        stat = os.stat(path)
+        first_date, last_date, rows = date_range_of(columns['date'])
+        return {
+            'symbol': symbol, 'format': fmt, 'first_date': first_date, 'last_date': last_date, 'rows': rows,
+            'covered_from': first_date, 'covered_to': last_date, 'adjustment': adjustment,
+            'checksum': file_checksum(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'updated_at': time.time(),
+        }
+
+    def entries(self, symbols, fmt='json', adjustment=None, rescan=True):
+        """
+        Return the up-to-date entries of some symbols.
+
+        Each file is only stat'ed; files that are missing from the catalog or changed since they were
+        recorded are read once and re-indexed. Symbols without a file are left out.
+
+        Args:
+            symbols (list): Stock codes.
+            fmt (str): 'json' or 'npz'.
+            adjustment (str, optional): Adjustment type to record for files that are not catalogued yet.
+            rescan (bool): If False, leave out such files instead of reading them.
+
+        Returns:
+            dict: Mapping of symbol to entry.
+        """
+        stored = self._stored(symbols)
+        entries, rescanned, gone = {}, [], []
+        for symbol in symbols:
+            try:
+                stat = os.stat(self._file(symbol, fmt))
+            except OSError:
+                if symbol in stored:
+                    gone.append(symbol)
+                continue
+            entry = stored.get(symbol)
+            if entry is not None and entry['format'] == fmt and entry['size'] == stat.st_size \
+                    and entry['mtime_ns'] == stat.st_mtime_ns:
+                entries[symbol] = entry
+                continue
+            if not rescan:
+                continue
+            entry = self._scan_file(symbol, fmt, stored[symbol]['adjustment'] if symbol in stored else adjustment)
+            if entry is not None:
+                entries[symbol] = entry
+                rescanned.append(entry)
+        if rescanned:
+            self._upsert(rescanned, fmt)
+        if gone:
+            self.remove(gone)
+        return entries
+
+    def entry(self, symbol, fmt='json'):
+        """Return the up-to-date entry of one symbol, or None if it has no file."""
+        return self.entries([symbol], fmt).get(symbol)
+
+    def symbols(self, fmt='json'):
+        """
+        Return the symbols of the dataset without listing the directory, if the catalog is current.
+
+        Returns:
+            list: Sorted stock codes, or None when files were added, renamed or removed since the last
+            catalog update (compare the directory's mtime); list the directory and run scan() then.
+        """
+        if not os.path.exists(self.path):
+            return None
+        connection = self._connect()
+        try:
+            state = connection.execute("SELECT format, directory_mtime_ns FROM datasets WHERE dataset = ?",
+                                       (self.dataset,)).fetchone()
+            if state is None or state[0] != fmt or state[1] != os.stat(self.directory).st_mtime_ns:
+                return None
+            rows = connection.execute("SELECT symbol FROM entries WHERE dataset = ? AND format = ? ORDER BY symbol",
+                                      (self.dataset, fmt)).fetchall()
+        finally:
+            connection.close()
+        return [row[0] for row in rows]
+
+    def scan(self, fmt='json', adjustment=None, verify=False):
+        """
+        Bring the catalog in line with the directory.
+
+        Args:
+            fmt (str): 'json' or 'npz'.
+            adjustment (str, optional): Adjustment type to record for files that are not catalogued yet.
+            verify (bool): Also recompute the checksum of unchanged files and re-index those that differ.
+
+        Returns:
+            dict: {'indexed', 'unchanged', 'removed', 'corrupt'} lists of symbols.
+        """
+        # Taken before listing, so a file added meanwhile leaves the listing stale rather than incomplete
+        directory_was = directory_state(self.directory)
+        suffix = f".{fmt}"
+        present = sorted(name[:-len(suffix)] for name in os.listdir(self.directory)
+                         if name.endswith(suffix) and not name.endswith(f".tmp{suffix}"))
+        stored = self._stored()
+        corrupt = []
+        if verify:
+            corrupt = [symbol for symbol in present
+                       if symbol in stored and file_checksum(self._file(symbol, fmt)) != stored[symbol]['checksum']]
+            # Forget them so they are re-indexed from the files
+            if corrupt:
+                self.remove(corrupt)
+        before = {symbol: stored[symbol] for symbol in present if symbol in stored and symbol not in corrupt}
+        entries = self.entries(present, fmt, adjustment)
+        indexed, unchanged = [], []
+        for symbol in present:
+            if symbol not in entries:
+                continue
+            previous = before.get(symbol)
+            if previous is not None and (previous['size'], previous['mtime_ns']) == \
+                    (entries[symbol]['size'], entries[symbol]['mtime_ns']):
+                unchanged.append(symbol)
+            else:
+                indexed.append(symbol)
+        removed = sorted(set(stored) - set(present))
+        if removed:
+            self.remove(removed)
+        # Record the directory state even when nothing changed, so symbols() can answer from the catalog
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute("INSERT OR REPLACE INTO datasets VALUES (?, ?, ?)",
+                                   (self.dataset, fmt, directory_was))
+        finally:
+            connection.close()
+        return {'indexed': indexed, 'unchanged': unchanged, 'removed': removed, 'corrupt': corrupt}
+
+    def plan_downloads(self, symbols, start_date, end_date, adjustment=None, fmt='json'):
+        """
+        Work out which date ranges must be downloaded for each symbol to cover [start_date, end_date].
+
+        Only the ranges outside the dates already requested for a symbol are returned, so a
+        stock listed after start_date is not requested again for the years before its IPO.
+        The whole range is returned, to replace the file, when the symbol has no file, when
+        its adjustment type differs, or for forward-adjusted prices, whose history changes
+        with every corporate action.
+
+        Args:
+            symbols (list): Stock codes.
+            start_date (str): Start date in YYYY-MM-DD format.
+            end_date (str): End date in YYYY-MM-DD format.
+            adjustment (str, optional): Adjustment type of the download.
+            fmt (str): 'json' or 'npz'.
+
+        Returns:
+            dict: Mapping of symbol to (ranges, merge): a list of (start, end) date strings, empty when
+            the file already covers the range, and whether the downloads extend the stored file.
+        """
+        start_date, end_date = _day(start_date), _day(end_date)
+        entries = self.entries(symbols, fmt)
+        plans = {}
+        for symbol in symbols:
+            entry = entries.get(symbol)
+            if entry is None or entry['adjustment'] != adjustment or adjustment in FORWARD_ADJUSTMENTS \
+                    or entry['covered_from'] is None:
+                plans[symbol] = ([(start_date, end_date)], False)
+                continue
+            # Gaps run up to the stored range, so the covered dates stay contiguous
+            ranges = []
+            if start_date < entry['covered_from']:
+                ranges.append((start_date, _shift(entry['covered_from'], -1)))
+            if end_date > entry['covered_to']:
+                ranges.append((_shift(entry['covered_to'], 1), end_date))
+            plans[symbol] = (ranges, True)
+        return plans
+
+    def missing_ranges(self, symbol, start_date, end_date, adjustment=None, fmt='json'):
+        """Return the (start, end) date ranges one symbol is missing; see plan_downloads."""
+        return self.plan_downloads([symbol], start_date, end_date, adjustment, fmt)[symbol][0]
+
+    def coverage(self, symbols=None):
+        """
+        Return the catalog as a DataFrame indexed by symbol.
+
+        Args:
+            symbols (list, optional): Stock codes to include. Defaults to every catalogued symbol.
+
+        Returns:
+            pandas.DataFrame: One row per symbol with the catalog columns.
+        """
+        import pandas as pd
+        entries = self._stored(symbols)
+        frame = pd.DataFrame(list(entries.values()), columns=list(_COLUMNS)).set_index('symbol').sort_index()
+        frame['updated_at'] = pd.to_datetime(frame['updated_at'], unit='s')
+        return frame
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(directory):
+    """Return the process-wide DataCatalog for a dataset directory."""
+    directory = os.path.abspath(directory)
+    with _catalogs_lock:
+        if directory not in _catalogs:
+            _catalogs[directory] = DataCatalog(directory)
+        return _catalogs[directory]
+
+
+def record_write(directory, symbol, fmt, dates, adjustment=None, covered=None, checksum=None, merge=False,
+                 directory_was=None):
+    """
+    Record a freshly written file in its dataset's catalog.
+
+    A catalog that cannot be written (read-only data root, locked database) only costs the
+    shortcut: a warning is printed and the file is indexed again on its next lookup.
+    """
+    try:
+        return get_catalog(directory).record(symbol, fmt, dates, adjustment, covered, checksum, merge, directory_was)
+    except (sqlite3.Error, OSError) as e:
+        print(f"Warning: could not update the catalog for {symbol} in {directory}: {e}")
+        return None
+
+
+def list_dataset_symbols(directory, extension='.json'):
+    """
+    Return the symbols of a dataset directory, from the catalog when it is current.
+
+    Args:
+        directory (str): Dataset directory.
+        extension (str): '.json' or '.npz'.
+
+    Returns:
+        list: Sorted stock codes; empty if the directory does not exist.
+    """
+    if not os.path.isdir(directory):
+        return []
+    try:
+        symbols = get_catalog(directory).symbols(FORMATS[extension])
+    except sqlite3.Error:
+        symbols = None
+    if symbols is None:
+        symbols = sorted(os.path.splitext(name)[0] for name in os.listdir(directory)
+                         if name.endswith(extension) and not name.endswith(f".tmp{extension}"))
+    return symbols
+
+
+def prune_symbols(directory, symbols, start_date=None, end_date=None, fmt='json'):
+    """
+    Drop the symbols whose catalogued dates all lie outside [start_date, end_date].
+
+    Uses the first and last date recorded per file, so the pruned files are not opened.
+    Symbols without a current catalog entry are kept, for the caller to read (or report).
+
+    Args:
+        directory (str): Dataset directory.
+        symbols (list): Stock codes.
+        start_date (str, optional): First date of interest (inclusive).
+        end_date (str, optional): Last date of interest (inclusive).
+        fmt (str): 'json' or 'npz'.
+
+    Returns:
+        list: The symbols that may have rows in the range, in their original order.
+    """
+    start_date, end_date = _day(start_date), _day(end_date)
+    if (start_date is None and end_date is None) or not os.path.isdir(directory):
+        return list(symbols)
+    try:
+        entries = get_catalog(directory).entries(list(symbols), fmt, rescan=False)
+    except sqlite3.Error:
+        return list(symbols)
+
+    def overlaps(entry):
+        if entry['first_date'] is None:
+            return False
+        return (start_date is None or entry['last_date'] >= start_date) and \
+            (end_date is None or entry['first_date'] <= end_date)
+    return [symbol for symbol in symbols if symbol not in entries or overlaps(entries[symbol])]
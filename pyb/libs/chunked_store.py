@@ -0,0 +1,169 @@
+import os
+import json
+import shutil
+import numpy as np
+from .columnar_store import to_datetime_index
+
+META_FILE = 'meta.json'
+
+
+class ChunkedPanel:
+    """
+    A (dates x symbols) panel stored on disk as blocks of rows or columns.
+
+    Each block is a plain .npy file that is memory-mapped on read, so a date slice or a
+    group of symbols can be read without loading the rest of the panel. Blocks split the
+    panel along the symbols ('symbol' axis) when written by symbol-chunked steps, or along
+    the dates ('date' axis) when written by cross-sectional steps or appended day by day.
+
+    Args:
+        path (str): Directory holding meta.json and the block files.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.days = np.array(meta['days'], dtype='datetime64[D]')
+        self.tz = meta['tz']
+        self.symbols = meta['symbols']
+        self.axis = meta['axis']
+        self.dtype = np.dtype(meta['dtype'])
+        self.blocks = [tuple(bounds) for bounds in meta['blocks']]
+        self._positions = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+    @classmethod
+    def create(cls, path, days, symbols, axis='symbol', dtype='float32', tz=''):
+        """
+        Create an empty panel, replacing any panel already stored at path.
+
+        Args:
+            path (str): Target directory.
+            days (numpy.ndarray): Calendar as datetime64[D].
+            symbols (list): Column labels.
+            axis (str): 'symbol' if blocks hold groups of columns, 'date' if they hold groups of rows.
+            dtype (str): Value dtype.
+            tz (str): UTC offset recorded with the calendar, '' for naive dates.
+
+        Returns:
+            ChunkedPanel: The new, empty panel.
+        """
+        if axis not in ('symbol', 'date'):
+            raise ValueError(f"Unknown axis '{axis}'. Expected 'symbol' or 'date'.")
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.makedirs(path)
+        meta = {'days': [str(day) for day in np.asarray(days, dtype='datetime64[D]')], 'tz': tz,
+                'symbols': list(symbols), 'axis': axis, 'dtype': np.dtype(dtype).name, 'blocks': []}
+        with open(os.path.join(path, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        return cls(path)
+
+    @property
+    def shape(self):
+        return len(self.days), len(self.symbols)
+
+    @property
+    def index(self):
+        """The calendar as a pandas DatetimeIndex."""
+        return to_datetime_index(self.days, self.tz)
+
+    def _block_file(self, start):
+        return os.path.join(self.path, f"block_{start:08d}.npy")
+
+    def _save_block(self, start, values):
+        tmp_file = self._block_file(start) + '.tmp.npy'
+        np.save(tmp_file, values)
+        os.replace(tmp_file, self._block_file(start))
+
+    def _update_meta(self, **fields):
+        meta_file = os.path.join(self.path, META_FILE)
+        with open(meta_file, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        meta.update(fields)
+        with open(meta_file + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(meta_file + '.tmp', meta_file)
+
+    def write_block(self, start, values):
+        """
+        Write the block starting at row (axis='date') or column (axis='symbol') `start`.
+
+        Blocks are written to a temporary file and renamed, and meta.json is updated last,
+        so an interrupted run never leaves a half-written block visible.
+        """
+        values = np.asarray(values, dtype=self.dtype)
+        expected = len(self.symbols) if self.axis == 'date' else len(self.days)
+        if values.shape[1 if self.axis == 'date' else 0] != expected:
+            raise ValueError(f"Block shape {values.shape} does not match the panel shape {self.shape}")
+        stop = start + values.shape[0 if self.axis == 'date' else 1]
+        self._save_block(start, values)
+        self.blocks = sorted([b for b in self.blocks if b[0] != start] + [(start, stop)])
+        self._update_meta(blocks=[list(b) for b in self.blocks])
+
+    def append(self, days, values):
+        """
+        Append rows for dates after the last stored date to a panel stored in date blocks.
+
+        The rows become one new block and the calendar in meta.json is extended in the same
+        atomic update, so appending never rewrites the blocks already stored.
+
+        Args:
+            days (numpy.ndarray): New dates as datetime64[D], sorted and after the last stored date.
+            values (numpy.ndarray): Rows of shape (len(days), symbols).
+        """
+        if self.axis != 'date':
+            raise ValueError("Rows can only be appended to a panel stored in date blocks")
+        days = np.asarray(days, dtype='datetime64[D]')
+        values = np.asarray(values, dtype=self.dtype)
+        if values.shape != (len(days), len(self.symbols)):
+            raise ValueError(f"Rows of shape {values.shape} do not match {len(days)} dates and "
+                             f"{len(self.symbols)} symbols")
+        if len(days) == 0:
+            return
+        if len(self.days) and days[0] <= self.days[-1]:
+            raise ValueError(f"Appended dates must follow the last stored date {self.days[-1]}")
+        start = len(self.days)
+        self._save_block(start, values)
+        self.days = np.concatenate([self.days, days])
+        self.blocks = self.blocks + [(start, len(self.days))]
+        self._update_meta(days=[str(day) for day in self.days], blocks=[list(b) for b in self.blocks])
+
+    def read(self, rows=None, columns=None):
+        """
+        Read part of the panel into memory.
+
+        Args:
+            rows (slice, optional): Date positions to read. Defaults to every date.
+            columns (list, optional): Symbols to read. Defaults to every symbol.
+
+        Returns:
+            numpy.ndarray: Values with shape (dates, symbols); NaN where no block was written.
+        """
+        rows = rows if rows is not None else slice(0, len(self.days))
+        row_start, row_stop, _ = rows.indices(len(self.days))
+        positions = np.arange(len(self.symbols)) if columns is None else \
+            np.array([self._positions[symbol] for symbol in columns], dtype=np.intp)
+        out = np.full((row_stop - row_start, len(positions)), np.nan, dtype=self.dtype)
+        for start, stop in self.blocks:
+            # Only blocks overlapping the request are opened, so reading the latest rows of a
+            # panel grown by many appends touches one file
+            if self.axis == 'date':
+                lo, hi = max(start, row_start), min(stop, row_stop)
+                if lo < hi:
+                    block = np.load(self._block_file(start), mmap_mode='r')
+                    out[lo - row_start:hi - row_start] = block[lo - start:hi - start][:, positions]
+            else:
+                inside = (positions >= start) & (positions < stop)
+                if inside.any():
+                    block = np.load(self._block_file(start), mmap_mode='r')
+                    out[:, inside] = block[row_start:row_stop][:, positions[inside] - start]
+        return out
+
+    def to_frame(self, rows=None, columns=None):
+        """Read part of the panel as a DataFrame indexed by date with symbols as columns."""
+        import pandas as pd
+        rows = rows if rows is not None else slice(0, len(self.days))
+        columns = list(self.symbols) if columns is None else list(columns)
+        return pd.DataFrame(self.read(rows, columns), index=self.index[rows],
+                            columns=pd.Index(columns, name='symbol'))
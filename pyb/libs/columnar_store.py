@@ -0,0 +1,430 @@
+import os
+import json
+import datetime
+import numpy as np
+from pyb.paths import get_data_dir
+
+
+def get_store_dir(dataset, data_dir=None):
+    """
+    Return the columnar store directory for a dataset.
+
+    Args:
+        dataset (str): Dataset name, e.g. 'candlestick_data' or 'fundamental_data'.
+        data_dir (str, optional): Root data directory. Defaults to <project_root>/data.
+
+    Returns:
+        str: Path to <data_dir>/columnar/<dataset>.
+    """
+    if data_dir is None:
+        data_dir = get_data_dir()
+    return os.path.join(data_dir, 'columnar', dataset)
+
+
+def parse_dates(date_strings):
+    """
+    Convert Lixinger date strings ('2015-01-02T00:00:00+08:00') to a datetime64[D] array.
+
+    Args:
+        date_strings (list): Date strings as returned by the API.
+
+    Returns:
+        tuple: (numpy.ndarray of datetime64[D], str UTC offset such as '+08:00' or '' if naive)
+    """
+    days = np.array([d[:10] for d in date_strings], dtype='datetime64[D]')
+    tz = ''
+    if date_strings:
+        first = date_strings[0]
+        if len(first) > 19 and first[-6] in '+-':
+            tz = first[-6:]
+    return days, tz
+
+
+def _tzinfo(tz):
+    """Build a fixed-offset tzinfo from a '+08:00' style string."""
+    sign = -1 if tz[0] == '-' else 1
+    hours, minutes = int(tz[1:3]), int(tz[4:6])
+    return datetime.timezone(sign * datetime.timedelta(hours=hours, minutes=minutes))
+
+
+def to_datetime_index(days, tz=''):
+    """
+    Convert a datetime64[D] array into a pandas DatetimeIndex matching the JSON loaders.
+
+    Args:
+        days (numpy.ndarray): Dates as datetime64[D].
+        tz (str): UTC offset recorded with the data, '' for naive dates.
+
+    Returns:
+        pandas.DatetimeIndex: The dates, localized to the recorded offset when present.
+    """
+    import pandas as pd
+    index = pd.DatetimeIndex(np.asarray(days).astype('datetime64[ns]'), name='date')
+    if tz:
+        index = index.tz_localize(_tzinfo(tz))
+    return index
+
+
+def from_datetime_index(index):
+    """
+    Split a pandas DatetimeIndex into a datetime64[D] array and its UTC offset; the inverse of to_datetime_index.
+
+    Args:
+        index (pandas.DatetimeIndex): Dates, naive or localized to a fixed offset.
+
+    Returns:
+        tuple: (numpy.ndarray of datetime64[D], str UTC offset such as '+08:00' or '' if naive)
+    """
+    tz = ''
+    if index.tz is not None:
+        if len(index):
+            offset = index[0].strftime('%z')
+            tz = f"{offset[:3]}:{offset[3:]}"
+        index = index.tz_localize(None)
+    return index.values.astype('datetime64[D]'), tz
+
+
+def records_to_columns(records, fields=None):
+    """
+    Turn a list of API records into sorted column arrays.
+
+    Records without a date are dropped. Numeric fields become float64 arrays with NaN for
+    missing values; non-numeric fields are skipped.
+
+    Args:
+        records (list): Records as returned by the API (dicts with a 'date' key).
+        fields (list, optional): Fields to keep. Defaults to every numeric field found.
+
+    Returns:
+        dict: Mapping of 'date' (datetime64[D]), 'tz' and each field to a numpy array, sorted by date.
+    """
+    records = [rec for rec in records if rec.get('date') is not None]
+    if fields is None:
+        fields = []
+        for rec in records:
+            for key, value in rec.items():
+                if key != 'date' and key not in fields and isinstance(value, (int, float)) and not isinstance(value, bool):
+                    fields.append(key)
+    days, tz = parse_dates([rec['date'] for rec in records])
+    order = np.argsort(days, kind='stable')
+    columns = {'date': days[order], 'tz': np.array(tz)}
+    for field in fields:
+        values = np.array([rec.get(field) for rec in records], dtype=object)
+        values[values == None] = np.nan  # noqa: E711 - elementwise comparison
+        columns[field] = values.astype(np.float64)[order]
+    return columns
+
+
+def date_bound(value):
+    """Normalize a date bound (string, datetime64, date or Timestamp) to 'YYYY-MM-DD'; None stays None."""
+    if value is None:
+        return None
+    return str(np.datetime64(str(value)[:10], 'D'))
+
+
+def _first_true(n, predicate):
+    """Binary search for the first index in range(n) where a monotone predicate holds (n if none)."""
+    lo, hi = 0, n
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if predicate(mid):
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+def slice_records(records, start_date=None, end_date=None):
+    """
+    Return the records dated within [start_date, end_date] by binary search.
+
+    Records must be sorted by date, in either direction: the API returns them newest
+    first and merged files are stored oldest first. Only O(log n) dates are looked at.
+
+    Args:
+        records (list): Records with a 'date' key, sorted by date.
+        start_date (str, optional): First date to keep (inclusive).
+        end_date (str, optional): Last date to keep (inclusive).
+
+    Returns:
+        list: A slice of records.
+    """
+    start_date, end_date = date_bound(start_date), date_bound(end_date)
+    if not records or (start_date is None and end_date is None):
+        return records
+    try:
+        def day(i):
+            return records[i]['date'][:10]
+        n = len(records)
+        if day(0) <= day(n - 1):
+            lo = 0 if start_date is None else _first_true(n, lambda i: day(i) >= start_date)
+            hi = n if end_date is None else _first_true(n, lambda i: day(i) > end_date)
+        else:
+            lo = 0 if end_date is None else _first_true(n, lambda i: day(i) <= end_date)
+            hi = n if start_date is None else _first_true(n, lambda i: day(i) < start_date)
+    except (KeyError, TypeError):
+        # Records without a date cannot be searched; filter them one by one
+        return [rec for rec in records if rec.get('date') is not None
+                and (start_date is None or rec['date'][:10] >= start_date)
+                and (end_date is None or rec['date'][:10] <= end_date)]
+    return records[lo:max(lo, hi)]
+
+
+def _date_rows(days, start_date=None, end_date=None):
+    """Slice of the sorted datetime64[D] days within [start_date, end_date], found by binary search."""
+    start_date, end_date = date_bound(start_date), date_bound(end_date)
+    lo = 0 if start_date is None else int(np.searchsorted(days, np.datetime64(start_date, 'D'), side='left'))
+    hi = len(days) if end_date is None else int(np.searchsorted(days, np.datetime64(end_date, 'D'), side='right'))
+    return slice(lo, max(lo, hi))
+
+
+def slice_columns(columns, start_date=None, end_date=None):
+    """Restrict date-sorted columns (from read_symbol or read_json_symbol) to [start_date, end_date]."""
+    if start_date is None and end_date is None:
+        return columns
+    rows = _date_rows(columns['date'], start_date, end_date)
+    return {name: values if name == 'tz' else values[rows] for name, values in columns.items()}
+
+
+def _merge_columns(stored, columns):
+    """Combine stored columns with newer ones; rows of the newer columns win on equal dates."""
+    keep = ~np.isin(stored['date'], columns['date'])
+    fields = [name for name in stored if name not in ('date', 'tz')]
+    fields += [name for name in columns if name not in ('date', 'tz') and name not in stored]
+    days = np.concatenate([stored['date'][keep], columns['date']])
+    order = np.argsort(days, kind='stable')
+    merged = {'date': days[order], 'tz': np.array(str(columns['tz']) or str(stored['tz']))}
+    for field in fields:
+        old = stored[field][keep] if field in stored else np.full(int(keep.sum()), np.nan)
+        new = columns[field] if field in columns else np.full(len(columns['date']), np.nan)
+        merged[field] = np.concatenate([old, new])[order]
+    return merged
+
+
+def write_symbol(store_dir, symbol, records, fields=None, adjustment=None, covered=None, merge=False):
+    """
+    Write one symbol's records into the columnar store as <store_dir>/<symbol>.npz.
+
+    The file is written to a temporary path and renamed, so readers never observe a partial file,
+    and is then recorded in the dataset's catalog (see pyb.libs.catalog).
+
+    Args:
+        store_dir (str): Columnar store directory for the dataset.
+        symbol (str): Stock code.
+        records (list): Records as returned by the API.
+        fields (list, optional): Fields to keep. Defaults to every numeric field.
+        adjustment (str, optional): Price adjustment type recorded in the catalog.
+        covered (tuple, optional): (start, end) date range requested from the API, recorded in the catalog.
+        merge (bool): Add the records to the stored ones instead of replacing them.
+
+    Returns:
+        dict: The columns that were written.
+    """
+    from .catalog import directory_state, record_write
+    os.makedirs(store_dir, exist_ok=True)
+    directory_was = directory_state(store_dir)
+    columns = records_to_columns(records, fields)
+    if merge:
+        stored = read_symbol(store_dir, symbol)
+        if stored is not None:
+            columns = _merge_columns(stored, columns)
+    output_file = os.path.join(store_dir, f"{symbol}.npz")
+    tmp_file = output_file + '.tmp.npz'
+    np.savez(tmp_file, **columns)
+    os.replace(tmp_file, output_file)
+    record_write(store_dir, symbol, 'npz', columns['date'], adjustment, covered, merge=merge,
+                 directory_was=directory_was)
+    return columns
+
+
+def _read_json_records(file_path):
+    """Read a JSON file as a list of records; return None (after a message) if it is unreadable."""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        print(f"Error loading data from {file_path}: {e}")
+        return None
+    if isinstance(data, dict) and 'data' in data:
+        data = data['data']
+    if not isinstance(data, list):
+        print(f"Unexpected data format in {file_path}. Expected a list of records.")
+        return None
+    return data
+
+
+def write_json_symbol(json_dir, symbol, records, compact=False, adjustment=None, covered=None, merge=False):
+    """
+    Write one symbol's records as <json_dir>/<symbol>.json and record the file in the dataset's catalog.
+
+    Like write_symbol, the file is written to a temporary path and renamed.
+
+    Args:
+        json_dir (str): Directory for the dataset's JSON files.
+        symbol (str): Stock code.
+        records (list): Records as returned by the API.
+        compact (bool): Write unindented JSON.
+        adjustment (str, optional): Price adjustment type recorded in the catalog.
+        covered (tuple, optional): (start, end) date range requested from the API, recorded in the catalog.
+        merge (bool): Add the records to the stored ones instead of replacing them; records of the
+            same date are replaced and the result is sorted by date.
+
+    Returns:
+        list: The records that were written.
+    """
+    from .catalog import checksum_bytes, directory_state, record_write
+    os.makedirs(json_dir, exist_ok=True)
+    directory_was = directory_state(json_dir)
+    output_file = os.path.join(json_dir, f"{symbol}.json")
+    if merge and os.path.exists(output_file):
+        stored = _read_json_records(output_file) or []
+        by_date = {rec['date'][:10]: rec for rec in stored if rec.get('date') is not None}
+        by_date.update((rec['date'][:10], rec) for rec in records if rec.get('date') is not None)
+        records = [by_date[day] for day in sorted(by_date)]
+    if compact:
+        text = json.dumps(records, separators=(',', ':'), ensure_ascii=False)
+    else:
+        text = json.dumps(records, indent=4, ensure_ascii=False)
+    data = text.encode('utf-8')
+    tmp_file = output_file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_file, output_file)
+    dates = [rec['date'] for rec in records if rec.get('date') is not None]
+    record_write(json_dir, symbol, 'json', dates, adjustment, covered, checksum_bytes(data), merge=merge,
+                 directory_was=directory_was)
+    return records
+
+
+def read_symbol(store_dir, symbol, fields=None, start_date=None, end_date=None):
+    """
+    Read one symbol from the columnar store.
+
+    Only the requested fields are decompressed, and only the rows within the date range
+    (found by binary search over the sorted dates) are kept.
+
+    Args:
+        store_dir (str): Columnar store directory for the dataset.
+        symbol (str): Stock code.
+        fields (list, optional): Fields to load. Defaults to all stored fields.
+        start_date (str, optional): First date to return (inclusive).
+        end_date (str, optional): Last date to return (inclusive).
+
+    Returns:
+        dict: Mapping of 'date', 'tz' and each requested field to a numpy array, or None if the
+        symbol is not in the store. Requested fields that are not stored are returned as NaN.
+    """
+    file_path = os.path.join(store_dir, f"{symbol}.npz")
+    if not os.path.exists(file_path):
+        return None
+    with np.load(file_path) as npz:
+        names = [name for name in npz.files if name not in ('date', 'tz')] if fields is None else fields
+        days = npz['date']
+        rows = _date_rows(days, start_date, end_date)
+        columns = {'date': days[rows], 'tz': str(npz['tz'])}
+        for name in names:
+            columns[name] = npz[name][rows] if name in npz.files else np.full(len(columns['date']), np.nan)
+    return columns
+
+
+def list_symbols(store_dir):
+    """Return the symbols present in a columnar store directory, from its catalog when it is current."""
+    from .catalog import list_dataset_symbols
+    return list_dataset_symbols(store_dir, '.npz')
+
+
+def convert_json_dir(json_dir, store_dir, symbols=None, overwrite=False):
+    """
+    Convert a directory of per-symbol JSON files into the columnar store.
+
+    Args:
+        json_dir (str): Directory containing <symbol>.json files.
+        store_dir (str): Target columnar store directory.
+        symbols (list, optional): Symbols to convert. Defaults to every JSON file in json_dir.
+        overwrite (bool): Re-convert symbols whose .npz is newer than the JSON file.
+
+    The adjustment type and requested date range of each JSON file are carried over from its catalog entry.
+
+    Returns:
+        dict: Mapping of symbol to number of rows written (None if the symbol was skipped).
+    """
+    from .catalog import get_catalog, list_dataset_symbols
+    if symbols is None:
+        symbols = list_dataset_symbols(json_dir, '.json')
+    json_entries = get_catalog(json_dir).entries(symbols, 'json', rescan=False) if os.path.isdir(json_dir) else {}
+
+    converted = {}
+    for symbol in symbols:
+        json_file = os.path.join(json_dir, f"{symbol}.json")
+        npz_file = os.path.join(store_dir, f"{symbol}.npz")
+        if not os.path.exists(json_file):
+            print(f"Warning: JSON file not found for symbol {symbol} at {json_file}")
+            converted[symbol] = None
+            continue
+        if not overwrite and os.path.exists(npz_file) and os.path.getmtime(npz_file) >= os.path.getmtime(json_file):
+            converted[symbol] = None
+            continue
+        data = _read_json_records(json_file)
+        if data is None:
+            converted[symbol] = None
+            continue
+        entry = json_entries.get(symbol)
+        if entry is not None:
+            columns = write_symbol(store_dir, symbol, data, adjustment=entry['adjustment'],
+                                   covered=(entry['covered_from'], entry['covered_to']))
+        else:
+            columns = write_symbol(store_dir, symbol, data)
+        converted[symbol] = len(columns['date'])
+    return converted
+
+
+def read_json_symbol(json_dir, symbol, fields=None, start_date=None, end_date=None):
+    """
+    Read one symbol's JSON file into the same column layout as read_symbol.
+
+    The date range is cut out of the parsed records by binary search (see slice_records)
+    before they are converted, so only the rows within it are turned into columns.
+
+    Args:
+        json_dir (str): Directory containing <symbol>.json files.
+        symbol (str): Stock code.
+        fields (list, optional): Fields to load. Defaults to every numeric field.
+        start_date (str, optional): First date to return (inclusive).
+        end_date (str, optional): Last date to return (inclusive).
+
+    Returns:
+        dict: Columns sorted by date, or None if the file is missing or unreadable.
+    """
+    file_path = os.path.join(json_dir, f"{symbol}.json")
+    if not os.path.exists(file_path):
+        return None
+    data = _read_json_records(file_path)
+    if data is None:
+        return None
+    columns = records_to_columns(slice_records(data, start_date, end_date), fields)
+    columns['tz'] = str(columns['tz'])
+    return columns
+
+
+def load_symbol(symbol, json_dir, store_dir=None, fields=None, start_date=None, end_date=None):
+    """
+    Load one symbol's columns, preferring the columnar store when it is at least as new as the JSON file.
+
+    Args:
+        symbol (str): Stock code.
+        json_dir (str): Directory containing <symbol>.json files.
+        store_dir (str, optional): Columnar store directory for the same dataset.
+        fields (list, optional): Fields to load.
+        start_date (str, optional): First date to return (inclusive).
+        end_date (str, optional): Last date to return (inclusive).
+
+    Returns:
+        dict: Columns sorted by date, or None if the symbol is in neither store.
+    """
+    if store_dir is not None:
+        npz_file = os.path.join(store_dir, f"{symbol}.npz")
+        json_file = os.path.join(json_dir, f"{symbol}.json")
+        if os.path.exists(npz_file) and (not os.path.exists(json_file)
+                                         or os.path.getmtime(npz_file) >= os.path.getmtime(json_file)):
+            return read_symbol(store_dir, symbol, fields, start_date, end_date)
+    return read_json_symbol(json_dir, symbol, fields, start_date, end_date)
@@ -0,0 +1,80 @@
+import numpy as np
+from .columnar_store import read_json_symbol, to_datetime_index
+
+COMPACT_DTYPE = np.float32
+
+
+def _load_symbols(symbols, data_dir, field, label, start_date=None, end_date=None):
+    """Read one field for each symbol; return [(symbol_code, dates, values)] and the recorded UTC offset."""
+    loaded, tz = [], ''
+    for code, symbol in enumerate(symbols):
+        columns = read_json_symbol(data_dir, symbol, [field], start_date, end_date)
+        if columns is None:
+            print(f"Warning: {label} file not found for symbol {symbol} in {data_dir}")
+            continue
+        keep = ~np.isnan(columns[field])
+        if not keep.any() and (start_date is not None or end_date is not None):
+            # Like the default loaders, a stock without rows in the range gets no column
+            continue
+        loaded.append((code, columns['date'][keep], columns[field][keep].astype(COMPACT_DTYPE)))
+        tz = tz or columns['tz']
+    return loaded, tz
+
+
+def load_compact_frame(symbols, data_dir, field, output_format='bt', label='Data', start_date=None, end_date=None):
+    """
+    Load one field for many symbols as a compact float32 frame.
+
+    Values are float32, dates are stored as int32 offsets into a sorted date level, and
+    symbols as categorical codes, so a full-universe panel needs about half the memory
+    of the float64 pivot table built by the default loaders.
+
+    Args:
+        symbols (list): Stock codes.
+        data_dir (str): Directory containing <symbol>.json files.
+        field (str): Field to load, e.g. 'close' or 'pb'.
+        output_format (str): 'bt' for a (date x symbol) float32 panel or 'double' for a float32 column
+            indexed by [date, symbol] with a categorical symbol level.
+        label (str): Dataset name used in warnings.
+        start_date (str, optional): First date to load (inclusive).
+        end_date (str, optional): Last date to load (inclusive).
+
+    Returns:
+        pandas.DataFrame: The resulting dataframe according to the selected format.
+    """
+    import pandas as pd
+
+    loaded, tz = _load_symbols(symbols, data_dir, field, label, start_date, end_date)
+    if not any(len(dates) for _, dates, _ in loaded):
+        print(f"No {label.lower()} records found.")
+        return pd.DataFrame()
+
+    days = np.unique(np.concatenate([dates for _, dates, _ in loaded]))
+    calendar = to_datetime_index(days, tz)
+    # int32 day offsets of every record into the sorted date level
+    offsets = [np.searchsorted(days, dates).astype(np.int32) for _, dates, _ in loaded]
+
+    if output_format == 'bt':
+        present = [symbols[code] for code, _, _ in loaded]
+        panel = np.full((len(days), len(loaded)), np.nan, dtype=COMPACT_DTYPE)
+        for j, ((_, _, values), rows) in enumerate(zip(loaded, offsets)):
+            panel[rows, j] = values
+        columns = pd.Index(present, name='symbol')
+        # Match the default loader, whose pivot table sorts the symbol columns
+        order = np.argsort(present, kind='stable')
+        return pd.DataFrame(panel[:, order], index=calendar, columns=columns[order])
+
+    day_codes = np.concatenate(offsets)
+    symbol_codes = np.concatenate([np.full(len(dates), code, dtype=np.int32) for code, dates, _ in loaded])
+    values = np.concatenate([values for _, _, values in loaded])
+    symbol_level = pd.CategoricalIndex(symbols, name='symbol')
+    if output_format == 'double':
+        order = np.lexsort((symbol_level.codes[symbol_codes], day_codes))
+        index = pd.MultiIndex(levels=[calendar, symbol_level], codes=[day_codes[order], symbol_codes[order]],
+                              names=['date', 'symbol'], verify_integrity=False)
+        return pd.DataFrame({field: values[order]}, index=index)
+
+    print(f"Output format '{output_format}' not recognized. Returning original dataframe.")
+    return pd.DataFrame({'date': calendar[day_codes],
+                         'symbol': pd.Categorical.from_codes(symbol_codes, categories=symbols),
+                         field: values})
@@ -0,0 +1,483 @@
+"""
+Local data service that keeps price and fundamental panels in shared memory.
+
+``pyb serve`` starts a long-lived process that loads each requested (date x symbol)
+panel once, copies it into a POSIX shared memory segment and answers requests over a
+Unix socket. ``pyb.connect()`` returns a client whose ``get_candlestick_data`` and
+``get_fundamental_data`` map those segments read-only, so every notebook and script on
+the machine shares one copy of each panel instead of loading its own.
+
+Before answering, the service stats the dataset's files (at most once per
+``refresh_interval``). When files were added, changed or removed it reloads only those
+symbols, builds the new panel in a fresh segment and unlinks the old one; clients that
+still hold the old panel keep their mapping until they drop it.
+"""
+
+import os
+import json
+import atexit
+import mmap
+import time
+import struct
+import socket
+import hashlib
+import tempfile
+import threading
+import socketserver
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
+
+from pyb.paths import get_data_dir
+from .columnar_store import from_datetime_index, to_datetime_index
+
+DATASETS = ('candlestick_data', 'fundamental_data')
+
+_HEADER = struct.Struct('!I')
+
+# Segments created by a service in this process; they stay registered for unlinking at exit
+_owned_segments = set()
+
+
+def default_socket_path(data_dir=None):
+    """Return the service socket for a data directory: <tmp>/pyb-<uid>-<hash of data_dir>.sock."""
+    data_dir = os.path.abspath(data_dir if data_dir is not None else get_data_dir())
+    digest = hashlib.sha256(data_dir.encode()).hexdigest()[:12]
+    # Unix socket paths are limited to about 100 characters, so the socket cannot live in the data directory
+    return os.path.join(tempfile.gettempdir(), f"pyb-{os.getuid()}-{digest}.sock")
+
+
+def _send(sock, message):
+    payload = json.dumps(message).encode('utf-8')
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _receive(sock):
+    """Read one length-prefixed JSON message; return None when the peer closed the connection."""
+    header = _recv_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+    payload = _recv_exactly(sock, _HEADER.unpack(header)[0])
+    if payload is None:
+        raise ConnectionError("Data service connection closed mid-message")
+    return json.loads(payload.decode('utf-8'))
+
+
+def _recv_exactly(sock, size):
+    chunks, remaining = [], size
+    while remaining:
+        chunk = sock.recv(min(remaining, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def _map_segment(name, nbytes):
+    """Map a shared memory segment read-only; the mapping lives as long as the arrays built on it."""
+    segment = shared_memory.SharedMemory(name=name)
+    if name not in _owned_segments:
+        # Attaching registers the segment with this process's resource tracker, which would unlink it at exit
+        resource_tracker.unregister(segment._name, 'shared_memory')
+    try:
+        return mmap.mmap(segment._fd, nbytes, prot=mmap.PROT_READ)
+    finally:
+        segment.close()
+
+
+def _frame(buffer, shape, dtype, days, tz, unit, columns):
+    """Build a read-only (date x symbol) DataFrame over a shared buffer without copying it."""
+    import pandas as pd
+    values = np.frombuffer(buffer, dtype=dtype, count=shape[0] * shape[1]).reshape(shape)
+    index = to_datetime_index(np.asarray(days, dtype='datetime64[D]'), tz).as_unit(unit)
+    return pd.DataFrame(values, index=index, columns=pd.Index(columns, name='symbol'), copy=False)
+
+
+def _snapshot(directory):
+    """Return {symbol: (size, mtime_ns)} of the dataset's JSON files."""
+    snapshot = {}
+    try:
+        entries = os.scandir(directory)
+    except OSError:
+        return snapshot
+    with entries:
+        for entry in entries:
+            if entry.name.endswith('.json'):
+                stat = entry.stat()
+                snapshot[entry.name[:-len('.json')]] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+class _Panel:
+    """One served panel: its shared segment, the read-only frame over it and the file state it reflects."""
+
+    def __init__(self, frame, snapshot, version):
+        values = np.ascontiguousarray(frame.to_numpy(dtype=np.float64))
+        self.nbytes = values.nbytes
+        self.segment = shared_memory.SharedMemory(create=True, size=max(self.nbytes, 1))
+        _owned_segments.add(self.segment.name)
+        view = np.ndarray(values.shape, dtype=values.dtype, buffer=self.segment.buf)
+        view[:] = values
+        del view
+        buffer = mmap.mmap(self.segment._fd, max(self.nbytes, 1), prot=mmap.PROT_READ)
+        # The service reads the panel back through the same read-only mapping as its clients
+        self.segment.close()
+        days, self.tz = from_datetime_index(frame.index)
+        self.days = days.astype(np.int64).tolist()
+        self.unit = frame.index.unit
+        self.columns = [str(symbol) for symbol in frame.columns]
+        self.shape = list(values.shape)
+        self.frame = _frame(buffer, values.shape, 'float64', self.days, self.tz, self.unit, self.columns)
+        self.snapshot = snapshot
+        self.version = version
+        self.checked = time.monotonic()
+
+    def describe(self, known_version=None):
+        reply = {'ok': True, 'segment': self.segment.name, 'version': self.version, 'shape': self.shape,
+                 'dtype': 'float64', 'nbytes': self.nbytes}
+        if known_version != self.version:
+            reply.update(days=self.days, tz=self.tz, unit=self.unit, columns=self.columns)
+        return reply
+
+    def release(self):
+        try:
+            self.segment.unlink()
+        except FileNotFoundError:
+            pass
+        _owned_segments.discard(self.segment.name)
+
+
+class DataService:
+    """
+    Serve (date x symbol) panels of the local data stores from shared memory.
+
+    Args:
+        data_dir (str, optional): Root data directory. Defaults to <project_root>/data.
+        socket_path (str, optional): Unix socket to listen on. Defaults to default_socket_path(data_dir).
+        refresh_interval (float): Minimum seconds between two checks of a dataset's files.
+    """
+
+    def __init__(self, data_dir=None, socket_path=None, refresh_interval=1.0):
+        self.data_dir = os.path.abspath(data_dir if data_dir is not None else get_data_dir())
+        self.socket_path = socket_path or default_socket_path(self.data_dir)
+        self.refresh_interval = refresh_interval
+        self.panels = {}
+        self.stats = {'requests': 0, 'loads': 0, 'reloads': 0, 'reloaded_symbols': 0}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._server = None
+        self._thread = None
+
+    def _load(self, dataset, field, symbols=None):
+        import pandas as pd
+        directory = os.path.join(self.data_dir, dataset)
+        if dataset == 'candlestick_data':
+            if field != 'close':
+                raise ValueError("The data service serves the 'close' field of the candlestick data")
+            from .candlestick_interface import get_candlestick_data
+            frame = get_candlestick_data(symbols, 'bt', candlestick_dir=directory)
+        elif dataset == 'fundamental_data':
+            from .fundamental_interface import get_fundamental_data
+            frame = get_fundamental_data(symbols, field, 'bt', fundamental_dir=directory)
+        else:
+            raise ValueError(f"Unknown dataset '{dataset}'. Expected one of {DATASETS}.")
+        if frame.empty and not isinstance(frame.index, pd.DatetimeIndex):
+            frame = pd.DataFrame(index=pd.DatetimeIndex([], name='date'), columns=pd.Index([], name='symbol'),
+                                 dtype=np.float64)
+        return frame
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def panel(self, dataset, field):
+        """Return the up-to-date _Panel for a dataset field, loading or refreshing it as needed."""
+        key = (dataset, field)
+        with self._key_lock(key):
+            panel = self.panels.get(key)
+            if panel is not None and time.monotonic() - panel.checked < self.refresh_interval:
+                return panel
+            directory = os.path.join(self.data_dir, dataset)
+            snapshot = _snapshot(directory)
+            if panel is None:
+                replacement = _Panel(self._load(dataset, field), snapshot, 1)
+                self.stats['loads'] += 1
+            else:
+                changed = sorted(symbol for symbol, state in snapshot.items() if panel.snapshot.get(symbol) != state)
+                removed = [symbol for symbol in panel.snapshot if symbol not in snapshot]
+                if not changed and not removed:
+                    panel.checked = time.monotonic()
+                    return panel
+                replacement = _Panel(self._patch(panel.frame, dataset, field, changed, removed), snapshot,
+                                     panel.version + 1)
+                self.stats['reloads'] += 1
+                self.stats['reloaded_symbols'] += len(changed) + len(removed)
+            self.panels[key] = replacement
+            if panel is not None:
+                panel.release()
+            return replacement
+
+    def _patch(self, frame, dataset, field, changed, removed):
+        """Rebuild a panel with only the changed symbols reloaded from their files."""
+        import pandas as pd
+        frame = frame.drop(columns=[symbol for symbol in changed + removed if symbol in frame.columns])
+        if changed:
+            update = self._load(dataset, field, changed)
+            if not update.empty:
+                frame = frame.join(update, how='outer')
+        # Like a fresh load: only dates with at least one value, symbols in sorted order
+        frame = frame.dropna(how='all').sort_index(axis=1)
+        frame.columns = pd.Index(frame.columns, name='symbol')
+        return frame
+
+    def invalidate(self, dataset=None):
+        """Drop the cached panels of a dataset (or all of them); the next request loads them again."""
+        with self._lock:
+            keys = [key for key in self.panels if dataset is None or key[0] == dataset]
+        for key in keys:
+            with self._key_lock(key):
+                panel = self.panels.pop(key, None)
+                if panel is not None:
+                    panel.release()
+        return len(keys)
+
+    def handle(self, request):
+        """Answer one request message."""
+        self.stats['requests'] += 1
+        op = request.get('op')
+        if op == 'panel':
+            panel = self.panel(request['dataset'], request['field'])
+            return panel.describe(request.get('version'))
+        if op == 'stats':
+            panels = [{'dataset': key[0], 'field': key[1], 'version': panel.version, 'shape': panel.shape,
+                       'nbytes': panel.nbytes} for key, panel in list(self.panels.items())]
+            return {'ok': True, 'stats': dict(self.stats), 'panels': panels,
+                    'nbytes': sum(panel['nbytes'] for panel in panels)}
+        if op == 'invalidate':
+            return {'ok': True, 'dropped': self.invalidate(request.get('dataset'))}
+        if op == 'ping':
+            return {'ok': True, 'data_dir': self.data_dir}
+        if op == 'shutdown':
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {'ok': True}
+        return {'ok': False, 'error': f"Unknown operation '{op}'"}
+
+    def _handler_class(self):
+        service = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                while True:
+                    try:
+                        request = _receive(self.request)
+                    except (ConnectionError, ValueError):
+                        return
+                    if request is None:
+                        return
+                    try:
+                        reply = service.handle(request)
+                    except Exception as e:
+                        reply = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+                    _send(self.request, reply)
+
+        return Handler
+
+    def _bind(self):
+        if os.path.exists(self.socket_path):
+            # A socket nobody answers on is left over from a service that did not shut down cleanly
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                    probe.connect(self.socket_path)
+                raise RuntimeError(f"A data service is already listening on {self.socket_path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.remove(self.socket_path)
+        self._server = socketserver.ThreadingUnixStreamServer(self.socket_path, self._handler_class())
+        self._server.daemon_threads = True
+
+    def serve_forever(self, preload=()):
+        """
+        Listen until shutdown() is called or the process is interrupted.
+
+        Args:
+            preload (sequence): (dataset, field) pairs to load before accepting requests.
+        """
+        for dataset, field in preload:
+            self.panel(dataset, field)
+        self._bind()
+        print(f"Serving {self.data_dir} on {self.socket_path}")
+        server = self._server
+        try:
+            server.serve_forever()
+        finally:
+            self._server = None
+            self._close(server)
+
+    def start(self, preload=()):
+        """Serve from a background thread of this process and return the service."""
+        for dataset, field in preload:
+            self.panel(dataset, field)
+        self._bind()
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        # Unlink the segments when the process exits without calling shutdown()
+        atexit.register(self.shutdown)
+        return self
+
+    def shutdown(self):
+        if self._server is not None:
+            server, self._server = self._server, None
+            server.shutdown()
+            if self._thread is not None:
+                self._thread.join()
+                self._close(server)
+
+    def _close(self, server):
+        server.server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self.invalidate()
+
+
+class DataClient:
+    """
+    Connection to a running DataService.
+
+    The panels it returns are read-only DataFrames over the service's shared memory;
+    operations that produce new frames work as usual, in-place assignment does not.
+
+    Args:
+        socket_path (str): Unix socket of the service.
+    """
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._sock.connect(socket_path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            self._sock.close()
+            raise ConnectionError(f"No data service is listening on {socket_path}. Start one with 'pyb serve'.") \
+                from None
+        self._lock = threading.Lock()
+        self._frames = {}
+
+    def __repr__(self):
+        return f"DataClient(socket_path={self.socket_path!r})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._sock.close()
+        self._frames.clear()
+
+    def request(self, op, **fields):
+        """Send one request and return the reply; raises RuntimeError when the service reports an error."""
+        with self._lock:
+            _send(self._sock, dict(fields, op=op))
+            reply = _receive(self._sock)
+        if reply is None:
+            raise ConnectionError("The data service closed the connection")
+        if not reply.get('ok'):
+            raise RuntimeError(f"Data service error: {reply.get('error')}")
+        return reply
+
+    def panel(self, dataset, field):
+        """
+        Return the full (date x symbol) panel of one dataset field.
+
+        Args:
+            dataset (str): 'candlestick_data' or 'fundamental_data'.
+            field (str): 'close' for candlestick data, or a fundamental ratio such as 'pb'.
+
+        Returns:
+            pandas.DataFrame: Read-only panel in shared memory, as returned by the 'bt' loaders for every symbol.
+        """
+        key = (dataset, field)
+        cached = self._frames.get(key)
+        for attempt in range(2):
+            reply = self.request('panel', dataset=dataset, field=field,
+                                 version=cached[0] if cached is not None else None)
+            if cached is not None and reply['version'] == cached[0]:
+                return cached[1]
+            try:
+                buffer = _map_segment(reply['segment'], max(reply['nbytes'], 1))
+            except FileNotFoundError:
+                # The panel was replaced between the reply and the mapping; ask again
+                cached = None
+                continue
+            frame = _frame(buffer, reply['shape'], reply['dtype'], reply['days'], reply['tz'], reply['unit'],
+                           reply['columns'])
+            self._frames[key] = (reply['version'], frame)
+            return frame
+        raise RuntimeError(f"Could not map the {dataset} '{field}' panel")
+
+    @staticmethod
+    def _select(frame, symbols, label):
+        if symbols is None:
+            return frame
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        present = [symbol for symbol in symbols if symbol in frame.columns]
+        for symbol in symbols:
+            if symbol not in frame.columns:
+                print(f"Warning: {label} data not found for symbol {symbol}")
+        # Copies only the selected columns; dates on which none of them has a value are dropped as by the loaders
+        return frame[sorted(set(present))].dropna(how='all')
+
+    def get_candlestick_data(self, symbols=None, output_format='bt'):
+        """
+        Return close prices like pyb.get_candlestick_data, served from shared memory.
+
+        Args:
+            symbols (list or str, optional): Stock codes. If None, the full panel is returned without copying.
+            output_format (str): Only 'bt' (date index, symbols as columns) is served.
+
+        Returns:
+            pandas.DataFrame: Close prices.
+        """
+        if output_format != 'bt':
+            raise ValueError("The data service serves 'bt' panels; load other formats with pyb.get_candlestick_data")
+        return self._select(self.panel('candlestick_data', 'close'), symbols, 'Candlestick')
+
+    def get_fundamental_data(self, symbols=None, ratio='mc', output_format='bt'):
+        """
+        Return one fundamental ratio like pyb.get_fundamental_data, served from shared memory.
+
+        Args:
+            symbols (list or str, optional): Stock codes. If None, the full panel is returned without copying.
+            ratio (str): The ratio to return, e.g. 'pb'.
+            output_format (str): Only 'bt' (date index, symbols as columns) is served.
+
+        Returns:
+            pandas.DataFrame: The ratio panel.
+        """
+        if output_format != 'bt':
+            raise ValueError("The data service serves 'bt' panels; load other formats with pyb.get_fundamental_data")
+        return self._select(self.panel('fundamental_data', ratio), symbols, 'Fundamental')
+
+    def stats(self):
+        """Return the service's counters and the panels it holds."""
+        reply = self.request('stats')
+        return {'stats': reply['stats'], 'panels': reply['panels'], 'nbytes': reply['nbytes']}
+
+    def invalidate(self, dataset=None):
+        """Make the service reload a dataset (or every dataset) on the next request."""
+        return self.request('invalidate', dataset=dataset)['dropped']
+
+
+def connect(socket_path=None, data_dir=None):
+    """
+    Connect to the local data service started with ``pyb serve``.
+
+    Args:
+        socket_path (str, optional): Unix socket of the service. Defaults to default_socket_path(data_dir).
+        data_dir (str, optional): Data directory the service was started for. Defaults to <project_root>/data.
+
+    Returns:
+        DataClient: Client with get_candlestick_data and get_fundamental_data methods.
+    """
+    return DataClient(socket_path or default_socket_path(data_dir))
@@ -0,0 +1,44 @@
+# libs/endpoints.py
+import os
+
+DEFAULT_BASE_URL = "https://open.lixinger.com/api"
+
+CANDLESTICK_PATH = "/hk/company/candlestick"
+STOCK_INFO_PATH = "/hk/company"
+# fsTableType -> fundamental endpoint path
+FUNDAMENTAL_PATHS = {
+    "non_financial": "/hk/company/fundamental/non_financial",
+    "bank": "/hk/company/fundamental/bank",
+    "insurance": "/hk/company/fundamental/insurance",
+    "security": "/hk/company/fundamental/security",
+    "other_financial": "/hk/company/fundamental/other_financial",
+}
+
+_base_url = None
+
+
+def get_base_url():
+    """
+    Return the API base URL.
+
+    Resolution order: set_base_url(), the LIXINGER_BASE_URL environment variable, then the
+    public endpoint. Pointing it at a local stand-in server makes downloads testable offline.
+    """
+    return (_base_url or os.environ.get("LIXINGER_BASE_URL") or DEFAULT_BASE_URL).rstrip("/")
+
+
+def set_base_url(url):
+    """Override the API base URL for this process (None restores the default resolution)."""
+    global _base_url
+    _base_url = url
+
+
+def endpoint_url(path):
+    """Join an endpoint path onto the current base URL."""
+    return get_base_url() + path
+
+
+def fundamental_url(fs_table_type):
+    """Return the fundamental endpoint URL for an fsTableType, or None if it is unknown."""
+    path = FUNDAMENTAL_PATHS.get(fs_table_type)
+    return endpoint_url(path) if path else None
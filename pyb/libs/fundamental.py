@@ -1,6 +1,6 @@
 # libs/fundamental.py
-from config.config import TOKEN, FUNDAMENTAL_ENDPOINTS
-from libs.api_client import post_request
+from .api_client import post_request, get_token
+from .endpoints import fundamental_url
 
 
 def download_fundamental(stock_code, fs_table_type, start_date="2015-01-01", end_date="2025-01-01", metrics=None):
@@ -16,11 +16,11 @@ def download_fundamental(stock_code, fs_table_type, start_date="2015-01-01", end
     """
     if metrics is None:
         metrics = ["pe_ttm", "pb", "ps_ttm", "pcf_ttm", "dyr", "ta", "mc"]
-    url = FUNDAMENTAL_ENDPOINTS.get(fs_table_type)
+    url = fundamental_url(fs_table_type)
     if not url:
         raise ValueError(f"Unknown fsTableType: {fs_table_type}")
     payload = {
-        "token": TOKEN,
+        "token": get_token(),
         "startDate": start_date,
         "endDate": end_date,
         "stockCodes": [stock_code],  # API requires a single stock code when using date range
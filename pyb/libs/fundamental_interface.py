@@ -1,9 +1,10 @@
 import os
 import json
-import glob
 import pandas as pd
+from .columnar_store import slice_records
 
-def get_fundamental_data(symbols=None, ratio='mc', output_format='bt', fundamental_dir=None):
+def get_fundamental_data(symbols=None, ratio='mc', output_format='bt', fundamental_dir=None, compact=False,
+                         start_date=None, end_date=None):
     """
     Retrieve fundamental data for selected stocks.
     
@@ -12,6 +13,10 @@ def get_fundamental_data(symbols=None, ratio='mc', output_format='bt', fundament
       ratio: the fundamental financial ratio to extract (e.g., 'mc').
       output_format: desired output format, 'bt' for pivot table (date index, symbols as columns) or 'double' for multiindex dataframe on [date, symbol].
       fundamental_dir: optional path to the directory containing fundamental JSON files. If not provided, defaults to <project_root>/data/fundamental_data.
+      compact: if True, return float32 values with a categorical symbol level (see pyb.libs.compact_frames), roughly halving memory.
+      start_date: first date to return (YYYY-MM-DD, inclusive). Symbols whose catalogued dates all lie outside the range are not
+        read, and the range is cut out of each file's sorted records by binary search before the ratio is extracted.
+      end_date: last date to return (YYYY-MM-DD, inclusive).
     
     Returns:
       pandas.DataFrame: The resulting dataframe according to the selected format.
@@ -22,12 +27,20 @@ def get_fundamental_data(symbols=None, ratio='mc', output_format='bt', fundament
     if fundamental_dir is None:
         fundamental_dir = os.path.join(BASE_DIR, 'data', 'fundamental_data')
     
-    # If symbols is None, get all available symbols from JSON files
+    # If symbols is None, get all available symbols from the data catalog (or the JSON files)
     if symbols is None:
-        all_files = glob.glob(os.path.join(fundamental_dir, '*.json'))
-        symbols = [os.path.splitext(os.path.basename(f))[0] for f in all_files]
+        from .catalog import list_dataset_symbols
+        symbols = list_dataset_symbols(fundamental_dir, '.json')
     elif isinstance(symbols, str):
         symbols = [symbols]
+    if start_date is not None or end_date is not None:
+        from .catalog import prune_symbols
+        symbols = prune_symbols(fundamental_dir, symbols, start_date, end_date)
+
+    if compact:
+        from .compact_frames import load_compact_frame
+        return load_compact_frame(symbols, fundamental_dir, ratio, output_format, label='Fundamental',
+                                  start_date=start_date, end_date=end_date)
     
     records = []
     for symbol in symbols:
@@ -49,7 +62,7 @@ def get_fundamental_data(symbols=None, ratio='mc', output_format='bt', fundament
             print(f"Unexpected data format in {file_path}. Expected a list of records.")
             continue
         
-        for rec in data:
+        for rec in slice_records(data, start_date, end_date):
             if ratio in rec:
                 record_date = rec.get('date')
                 ratio_val = rec.get(ratio)
@@ -0,0 +1,216 @@
+import os
+import sys
+import json
+import time
+import threading
+import tracemalloc
+from bisect import bisect_left
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+SIZE_BUCKETS_BYTES = [1 << 10, 1 << 12, 1 << 14, 1 << 16, 1 << 18, 1 << 20, 1 << 22, 1 << 24]
+RETRY_BUCKETS = [0, 1, 2, 3, 5]
+
+
+def _peak_rss_mb():
+    """Return the process's peak resident set size in MiB, or None if unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+class Histogram:
+    """Fixed-bucket histogram that also keeps the raw observations for percentiles."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.values = []
+
+    def add(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.values.append(value)
+
+    def to_dict(self):
+        values = sorted(self.values)
+
+        def percentile(q):
+            return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+        labels = [f"<={b}" for b in self.bounds] + [f">{self.bounds[-1]}"]
+        return {
+            'count': len(values),
+            'buckets': dict(zip(labels, self.counts)),
+            'mean': sum(values) / len(values) if values else None,
+            'p50': percentile(0.5),
+            'p95': percentile(0.95),
+            'max': values[-1] if values else None,
+        }
+
+
+class Recorder:
+    """
+    Collects stage spans and API request metrics for one run.
+
+    Args:
+        trace_memory (bool): Track Python allocations with tracemalloc and record the peak and
+            top allocation sites of every top-level span. Adds noticeable overhead.
+        profile_dir (str, optional): If set, each top-level span is profiled with cProfile and
+            dumped to <profile_dir>/<span>.prof.
+    """
+
+    def __init__(self, trace_memory=False, profile_dir=None):
+        self.trace_memory = trace_memory
+        self.profile_dir = profile_dir
+        self.started_at = time.time()
+        self.spans = []
+        self.requests = {}
+        self.retries = {}
+        self._stack = threading.local()
+        self._lock = threading.Lock()
+
+    def _path(self):
+        stack = getattr(self._stack, 'names', None)
+        if stack is None:
+            stack = self._stack.names = []
+        return stack
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Time a block and record wall/CPU time, peak RSS and (optionally) allocations and a profile."""
+        stack = self._path()
+        stack.append(name)
+        full_name = '/'.join(stack)
+        profiler = None
+        if self.profile_dir and len(stack) == 1:
+            import cProfile
+            profiler = cProfile.Profile()
+        trace_memory = self.trace_memory and len(stack) == 1
+        if trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            traced_start = tracemalloc.get_traced_memory()[0]
+        rss_start = _peak_rss_mb()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            record = {
+                'name': full_name,
+                'wall_s': time.perf_counter() - wall_start,
+                'cpu_s': time.process_time() - cpu_start,
+                'peak_rss_mb': _peak_rss_mb(),
+            }
+            if rss_start is not None:
+                record['peak_rss_growth_mb'] = record['peak_rss_mb'] - rss_start
+            if trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                record['traced_peak_mb'] = (peak - traced_start) / 2 ** 20
+                record['traced_retained_mb'] = (current - traced_start) / 2 ** 20
+                top = tracemalloc.take_snapshot().statistics('lineno')[:10]
+                record['top_allocations'] = [{'site': str(stat.traceback[0]), 'size_mb': stat.size / 2 ** 20}
+                                             for stat in top]
+            if profiler is not None:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                # Span names such as 'backtest:PB Strategy' are not safe file names (as in Pipeline._paths)
+                file_name = name.replace(os.sep, '_').replace(':', '_')
+                record['profile'] = os.path.join(self.profile_dir, f"{file_name}.prof")
+                profiler.dump_stats(record['profile'])
+            record.update(attributes)
+            with self._lock:
+                self.spans.append(record)
+            stack.pop()
+
+    def record_request(self, url, latency_s, size_bytes, status_code):
+        """Record one HTTP request against its endpoint path."""
+        endpoint = urlparse(url).path or url
+        with self._lock:
+            stats = self.requests.get(endpoint)
+            if stats is None:
+                stats = self.requests[endpoint] = {
+                    'latency_ms': Histogram(LATENCY_BUCKETS_MS),
+                    'size_bytes': Histogram(SIZE_BUCKETS_BYTES),
+                    'status': {},
+                }
+            stats['latency_ms'].add(latency_s * 1000.0)
+            stats['size_bytes'].add(size_bytes)
+            stats['status'][str(status_code)] = stats['status'].get(str(status_code), 0) + 1
+
+    def record_retries(self, kind, retries):
+        """Record how many retries a logical request (e.g. one symbol's download) needed."""
+        with self._lock:
+            histogram = self.retries.get(kind)
+            if histogram is None:
+                histogram = self.retries[kind] = Histogram(RETRY_BUCKETS)
+            histogram.add(retries)
+
+    def report(self):
+        """Return the run report as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                'started_at': self.started_at,
+                'elapsed_s': time.time() - self.started_at,
+                'spans': list(self.spans),
+                'requests': {endpoint: {'latency_ms': stats['latency_ms'].to_dict(),
+                                        'size_bytes': stats['size_bytes'].to_dict(),
+                                        'status': dict(stats['status'])}
+                             for endpoint, stats in self.requests.items()},
+                'retries': {kind: histogram.to_dict() for kind, histogram in self.retries.items()},
+            }
+
+    def write_report(self, path):
+        """Write the run report to a JSON file."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+        return path
+
+
+_recorder = None
+
+
+def enable(trace_memory=False, profile_dir=None):
+    """Start recording spans and request metrics in this process; return the new Recorder."""
+    global _recorder
+    _recorder = Recorder(trace_memory=trace_memory, profile_dir=profile_dir)
+    return _recorder
+
+
+def disable():
+    """Stop recording and return the Recorder that was active, if any."""
+    global _recorder
+    recorder, _recorder = _recorder, None
+    if recorder is not None and recorder.trace_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    return recorder
+
+
+def get_recorder():
+    """Return the active Recorder, or None when instrumentation is disabled."""
+    return _recorder
+
+
+@contextmanager
+def span(name, **attributes):
+    """Record a span on the active Recorder; a no-op when instrumentation is disabled."""
+    recorder = _recorder
+    if recorder is None:
+        yield
+        return
+    with recorder.span(name, **attributes):
+        yield
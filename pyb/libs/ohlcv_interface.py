@@ -0,0 +1,155 @@
+import os
+import numpy as np
+from .catalog import list_dataset_symbols, prune_symbols
+from .columnar_store import load_symbol, to_datetime_index, from_datetime_index
+from pyb.paths import get_data_dir
+
+OHLCV_FIELDS = ('open', 'high', 'low', 'close', 'volume', 'amount', 'change')
+
+
+class OHLCVPanel:
+    """
+    A field x date x symbol candlestick panel backed by one contiguous 3-D array.
+
+    Each field is a contiguous (dates x symbols) slab of ``values``, so projecting a field
+    returns a view rather than a copy.
+
+    Args:
+        values (numpy.ndarray): Array of shape (fields, dates, symbols).
+        fields (sequence): Field names along the first axis.
+        dates (pandas.DatetimeIndex): Trading dates along the second axis.
+        symbols (sequence): Stock codes along the third axis.
+    """
+
+    def __init__(self, values, fields, dates, symbols):
+        if values.shape != (len(fields), len(dates), len(symbols)):
+            raise ValueError(f"Values of shape {values.shape} do not match {len(fields)} fields, "
+                             f"{len(dates)} dates and {len(symbols)} symbols")
+        self.values = values
+        self.fields = list(fields)
+        self.dates = dates
+        self.symbols = list(symbols)
+
+    def __repr__(self):
+        return (f"OHLCVPanel(fields={self.fields}, dates={len(self.dates)}, symbols={len(self.symbols)}, "
+                f"dtype={self.values.dtype})")
+
+    def __getitem__(self, field):
+        return self.field(field)
+
+    def _field_index(self, field):
+        try:
+            return self.fields.index(field)
+        except ValueError:
+            raise KeyError(f"Field '{field}' not in panel. Available fields: {self.fields}") from None
+
+    def array(self, field):
+        """Return one field as a (dates x symbols) view of the panel's array."""
+        return self.values[self._field_index(field)]
+
+    def field(self, field):
+        """
+        Return one field as a (date x symbol) DataFrame sharing memory with the panel.
+
+        The frame has the same layout as get_candlestick_data(output_format='bt'), so
+        close-only callers can use ``panel.close`` in its place without copying.
+        """
+        import pandas as pd
+        return pd.DataFrame(self.array(field), index=self.dates, columns=pd.Index(self.symbols, name='symbol'),
+                            copy=False)
+
+    @property
+    def close(self):
+        """Close prices as a zero-copy DataFrame."""
+        return self.field('close')
+
+    def project(self, fields):
+        """Return a panel restricted to the given fields (a view when they are consecutive in the panel)."""
+        positions = [self._field_index(field) for field in fields]
+        if positions == list(range(positions[0], positions[-1] + 1)):
+            values = self.values[positions[0]:positions[-1] + 1]
+        else:
+            values = self.values[positions]
+        return OHLCVPanel(values, fields, self.dates, self.symbols)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+
+def get_ohlcv_panel(symbols=None, fields=OHLCV_FIELDS, candlestick_dir=None, store_dir=None, calendar=None,
+                    dtype=np.float64, adjustment=None, start_date=None, end_date=None):
+    """
+    Load several candlestick fields for many stocks in one pass over the files.
+
+    Args:
+        symbols (list or str, optional): Stock codes. If not provided, all stocks in the candlestick data directory are used.
+        fields (sequence): Fields to load; defaults to open, high, low, close, volume, amount and change.
+        candlestick_dir (str, optional): Directory containing candlestick JSON files. Defaults to <project_root>/data/candlestick_data.
+        store_dir (str, optional): Columnar store for the candlestick data, read instead of the JSON file when up to date.
+        calendar (pandas.DatetimeIndex, optional): Dates to place the data on. If given, each file is scattered
+            into the preallocated panel as soon as it is read; otherwise the calendar is the union of the
+            stocks' dates and the per-stock arrays are kept until all files are read.
+        dtype (numpy.dtype): Value dtype; numpy.float32 halves the panel's memory.
+        adjustment (str, optional): Price adjustment of open, high, low and close: 'ex_rights', 'bc_rights' or
+            'fc_rights', computed from the stored adjustment factors (see pyb.libs.adjustment). Symbols that cannot
+            be converted are NaN. If not provided, prices are returned as stored.
+        start_date (str, optional): First date to load (YYYY-MM-DD, inclusive). Symbols whose catalogued dates all lie
+            outside the range are not read, and only the rows within it are converted (see read_json_symbol).
+        end_date (str, optional): Last date to load (YYYY-MM-DD, inclusive).
+
+    Returns:
+        OHLCVPanel: The panel, with NaN where a stock did not trade or a field is missing.
+    """
+    if candlestick_dir is None:
+        candlestick_dir = os.path.join(get_data_dir(), 'candlestick_data')
+    if symbols is None:
+        symbols = list_dataset_symbols(candlestick_dir, '.json')
+    elif isinstance(symbols, str):
+        symbols = [symbols]
+    if start_date is not None or end_date is not None:
+        symbols = prune_symbols(candlestick_dir, symbols, start_date, end_date)
+    fields = list(fields)
+
+    def read(symbol):
+        columns = load_symbol(symbol, candlestick_dir, store_dir, fields, start_date, end_date)
+        if columns is None:
+            print(f"Warning: Candlestick file not found for symbol {symbol} in {candlestick_dir}")
+        return columns
+
+    def scatter(values, days, j, columns):
+        rows = np.searchsorted(days, columns['date'])
+        keep = rows < len(days)
+        keep[keep] = days[rows[keep]] == columns['date'][keep]
+        for i, field in enumerate(fields):
+            values[i, rows[keep], j] = columns[field][keep]
+
+    if calendar is not None:
+        days, _ = from_datetime_index(calendar)
+        values = np.full((len(fields), len(days), len(symbols)), np.nan, dtype=dtype)
+        for j, symbol in enumerate(symbols):
+            columns = read(symbol)
+            if columns is not None:
+                scatter(values, days, j, columns)
+        return _adjust(OHLCVPanel(values, fields, calendar, symbols), candlestick_dir, adjustment)
+
+    loaded = [read(symbol) for symbol in symbols]
+    present = [columns for columns in loaded if columns is not None]
+    days = np.unique(np.concatenate([columns['date'] for columns in present])) if present else \
+        np.array([], dtype='datetime64[D]')
+    tz = next((columns['tz'] for columns in present if columns['tz']), '')
+    del present
+    values = np.full((len(fields), len(days), len(symbols)), np.nan, dtype=dtype)
+    for j in range(len(symbols)):
+        if loaded[j] is not None:
+            scatter(values, days, j, loaded[j])
+            loaded[j] = None
+    return _adjust(OHLCVPanel(values, fields, to_datetime_index(days, tz), symbols), candlestick_dir, adjustment)
+
+
+def _adjust(panel, candlestick_dir, adjustment):
+    """Convert the panel's prices to the requested adjustment type, if any."""
+    if adjustment is None:
+        return panel
+    from .adjustment import adjust_panel
+    return adjust_panel(panel, candlestick_dir, adjustment)
@@ -0,0 +1,306 @@
+"""
+SQL queries over the market data.
+
+Candlestick, fundamental and stock info data are mirrored into one SQLite database,
+<data_dir>/columnar/query.sqlite, as three tables:
+
+    candlestick (symbol, date, open, high, low, close, volume, amount, change)
+    fundamental (symbol, date, pe_ttm, pb, ps_ttm, pcf_ttm, dyr, ta, mc)
+    stock_info  (symbol, name, market, exchange, ipo_date, delisted_date, listing_status,
+                 fs_table_type, sector, mutual_markets, is_ah, ...)
+
+Dates are 'YYYY-MM-DD' strings. The price and fundamental tables are clustered on
+(symbol, date) and have a second index on (date, symbol), so SQLite reads only the rows
+that match a filter on a symbol, a date or a date range instead of whole panels.
+Numeric fields that appear in later files are added as columns.
+
+Before a query, the tables it names are brought up to date: only symbols whose file
+changed size or mtime since the last sync are reloaded. The functions median(x) and
+quarter(date) ('2024Q3') are available in queries.
+"""
+
+import os
+import re
+import sqlite3
+import statistics
+import threading
+from itertools import repeat
+
+from .columnar_store import get_store_dir, load_symbol, list_symbols
+
+QUERY_FILE = 'query.sqlite'
+# Bump when the derived columns of the stock_info table change
+STOCK_INFO_SCHEMA = 2
+
+# Columns created up front; other numeric fields are added when a file has them
+TABLES = {
+    'candlestick': ('candlestick_data', ['open', 'high', 'low', 'close', 'volume', 'amount', 'change']),
+    'fundamental': ('fundamental_data', ['pe_ttm', 'pb', 'ps_ttm', 'pcf_ttm', 'dyr', 'ta', 'mc']),
+}
+
+STOCK_INFO_COLUMNS = {
+    'stockCode': 'symbol',
+    'name': 'name',
+    'areaCode': 'area_code',
+    'market': 'market',
+    'exchange': 'exchange',
+    'ipoDate': 'ipo_date',
+    'delistedDate': 'delisted_date',
+    'listingStatus': 'listing_status',
+    'fsTableType': 'fs_table_type',
+    'sector': 'sector',
+    'mutualMarkets': 'mutual_markets',
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    dataset TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (dataset, symbol)
+) WITHOUT ROWID;
+"""
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+class _Median:
+    """SQLite aggregate for the median of non-NULL values."""
+
+    def __init__(self):
+        self.values = []
+
+    def step(self, value):
+        if value is not None:
+            self.values.append(value)
+
+    def finalize(self):
+        return statistics.median(self.values) if self.values else None
+
+
+def _quarter(date):
+    if date is None:
+        return None
+    return f"{date[:4]}Q{(int(date[5:7]) + 2) // 3}"
+
+
+def _file_state(*paths):
+    """Sizes and mtimes of a symbol's files, as stored in the sources table."""
+    parts = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            parts.append(f"{stat.st_size}:{stat.st_mtime_ns}")
+        except OSError:
+            parts.append('-')
+    return '|'.join(parts)
+
+
+class QueryStore:
+    """
+    SQLite mirror of one data directory.
+
+    Args:
+        data_dir (str, optional): Root data directory. Defaults to <project_root>/data.
+        path (str, optional): Database file. Defaults to <data_dir>/columnar/query.sqlite.
+    """
+
+    def __init__(self, data_dir=None, path=None):
+        from pyb.paths import get_data_dir
+        self.data_dir = os.path.abspath(data_dir or get_data_dir())
+        self.path = path or os.path.join(self.data_dir, 'columnar', QUERY_FILE)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"QueryStore(data_dir={self.data_dir!r}, path={self.path!r})"
+
+    def _connect(self):
+        """Open a connection with the schema and query functions; each call gets its own."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript(_SCHEMA)
+        for table, (_, fields) in TABLES.items():
+            columns = ''.join(f', "{field}" REAL' for field in fields)
+            connection.execute(f"CREATE TABLE IF NOT EXISTS {table} (symbol TEXT NOT NULL, date TEXT NOT NULL"
+                               f"{columns}, PRIMARY KEY (symbol, date)) WITHOUT ROWID")
+            connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_date ON {table} (date, symbol)")
+        connection.create_aggregate('median', 1, _Median)
+        connection.create_function('quarter', 1, _quarter, deterministic=True)
+        return connection
+
+    def _columns(self, connection, table):
+        return [row[1] for row in connection.execute(f"PRAGMA table_info({table})")]
+
+    def _sync_dataset(self, connection, table, symbols=None):
+        """Reload the symbols of one dataset whose files changed; return the number of reloaded symbols."""
+        dataset, _ = TABLES[table]
+        json_dir = os.path.join(self.data_dir, dataset)
+        store_dir = get_store_dir(dataset, self.data_dir)
+        present = set(list_symbols(store_dir)) if os.path.isdir(store_dir) else set()
+        if os.path.isdir(json_dir):
+            present.update(name[:-len('.json')] for name in os.listdir(json_dir)
+                           if name.endswith('.json') and not name.endswith('.tmp.json'))
+        if symbols is not None:
+            present &= set(symbols)
+
+        stored = dict(connection.execute("SELECT symbol, state FROM sources WHERE dataset = ?", (dataset,)))
+        states = {symbol: _file_state(os.path.join(json_dir, f"{symbol}.json"),
+                                      os.path.join(store_dir, f"{symbol}.npz")) for symbol in present}
+        changed = sorted(symbol for symbol in present if stored.get(symbol) != states[symbol])
+        removed = [] if symbols is not None else sorted(set(stored) - present)
+        if not changed and not removed:
+            return 0
+
+        columns = self._columns(connection, table)
+        with connection:
+            for symbol in removed:
+                connection.execute(f"DELETE FROM {table} WHERE symbol = ?", (symbol,))
+                connection.execute("DELETE FROM sources WHERE dataset = ? AND symbol = ?", (dataset, symbol))
+            for symbol in changed:
+                data = load_symbol(symbol, json_dir, store_dir)
+                connection.execute(f"DELETE FROM {table} WHERE symbol = ?", (symbol,))
+                if data is not None and len(data['date']):
+                    fields = [field for field in data if field not in ('date', 'tz') and _IDENTIFIER.match(field)]
+                    for field in fields:
+                        if field not in columns:
+                            connection.execute(f'ALTER TABLE {table} ADD COLUMN "{field}" REAL')
+                            columns.append(field)
+                    # NaN is stored as NULL
+                    rows = zip(repeat(symbol), data['date'].astype(str).tolist(),
+                               *(data[field].tolist() for field in fields))
+                    names = ', '.join(['symbol', 'date'] + [f'"{field}"' for field in fields])
+                    connection.executemany(f"INSERT OR REPLACE INTO {table} ({names}) "
+                                           f"VALUES ({', '.join('?' * (len(fields) + 2))})", rows)
+                connection.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?)", (dataset, symbol, states[symbol]))
+        return len(changed) + len(removed)
+
+    def _sync_stock_info(self, connection):
+        """Reload the stock_info table if stock_info.json changed; return 1 if it was reloaded."""
+        from .stock_info_interface import get_stock_info_registry, is_ah_stock
+        path = os.path.join(self.data_dir, 'stock_info.json')
+        # The schema version is part of the state, so tables built with an older is_ah definition are reloaded
+        state = f"{_file_state(path)}/{STOCK_INFO_SCHEMA}"
+        stored = connection.execute("SELECT state FROM sources WHERE dataset = 'stock_info' AND symbol = ''").fetchone()
+        if stored is not None and stored[0] == state:
+            return 0
+        records = get_stock_info_registry(path).records if os.path.exists(path) else []
+        # Fields beyond the known ones become snake_case columns
+        names = dict(STOCK_INFO_COLUMNS)
+        for record in records:
+            for key in record:
+                column = re.sub(r'(?<!^)(?=[A-Z])', '_', key).lower()
+                if key not in names and column not in names.values() and _IDENTIFIER.match(column):
+                    names[key] = column
+        keys, columns = list(names), list(names.values())
+
+        def value(record, key):
+            item = record.get(key)
+            if isinstance(item, list):
+                return ','.join(str(entry) for entry in item)
+            if key.endswith('Date') and isinstance(item, str):
+                return item[:10]
+            return item if item is None or isinstance(item, (int, float, str)) else str(item)
+
+        rows = [[value(record, key) for key in keys] + [int(is_ah_stock(record.get('mutualMarkets')))]
+                for record in records]
+        with connection:
+            connection.execute("DROP TABLE IF EXISTS stock_info")
+            definitions = ', '.join(f'"{column}"' + (' TEXT PRIMARY KEY' if column == 'symbol' else '')
+                                    for column in columns)
+            connection.execute(f"CREATE TABLE stock_info ({definitions}, is_ah INTEGER)")
+            connection.execute("CREATE INDEX stock_info_sector ON stock_info (sector)")
+            connection.executemany(f"INSERT OR REPLACE INTO stock_info VALUES ({', '.join('?' * (len(keys) + 1))})",
+                                   rows)
+            connection.execute("INSERT OR REPLACE INTO sources VALUES ('stock_info', '', ?)", (state,))
+        return 1
+
+    def sync(self, tables=None, symbols=None):
+        """
+        Bring tables up to date with the data files.
+
+        Args:
+            tables (list, optional): Any of 'candlestick', 'fundamental' and 'stock_info'. Defaults to all.
+            symbols (list, optional): Only check these stock codes (price and fundamental tables).
+
+        Returns:
+            dict: Mapping of table name to the number of symbols (or files) reloaded.
+        """
+        tables = list(tables) if tables is not None else list(TABLES) + ['stock_info']
+        # One writer at a time per process; SQLite's locking covers other processes
+        with self._lock:
+            connection = self._connect()
+            try:
+                reloaded = {}
+                for table in tables:
+                    if table == 'stock_info':
+                        reloaded[table] = self._sync_stock_info(connection)
+                    elif table in TABLES:
+                        reloaded[table] = self._sync_dataset(connection, table, symbols)
+                    else:
+                        raise ValueError(f"Unknown table '{table}'. Expected one of {list(TABLES) + ['stock_info']}.")
+                if any(reloaded.values()):
+                    # Refresh the planner's statistics so filters use the (symbol, date) and (date, symbol) indexes
+                    connection.execute('ANALYZE')
+            finally:
+                connection.close()
+        return reloaded
+
+    def query(self, sql, params=None, refresh=True):
+        """
+        Run a SQL query and return the result as a DataFrame.
+
+        Args:
+            sql (str): SELECT statement over the candlestick, fundamental and stock_info tables.
+            params (sequence or dict, optional): Values for ? or :name placeholders.
+            refresh (bool): Sync the tables named in the query with the data files first.
+
+        Returns:
+            pandas.DataFrame: The result rows.
+        """
+        import pandas as pd
+        if refresh:
+            named = [table for table in list(TABLES) + ['stock_info']
+                     if re.search(rf'\b{table}\b', sql, flags=re.IGNORECASE)]
+            if named:
+                self.sync(named)
+        connection = self._connect()
+        try:
+            return pd.read_sql_query(sql, connection, params=params)
+        finally:
+            connection.close()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_query_store(data_dir=None):
+    """Return the process-wide QueryStore for a data directory."""
+    from pyb.paths import get_data_dir
+    data_dir = os.path.abspath(data_dir or get_data_dir())
+    with _stores_lock:
+        if data_dir not in _stores:
+            _stores[data_dir] = QueryStore(data_dir)
+        return _stores[data_dir]
+
+
+def query(sql, params=None, data_dir=None, refresh=True):
+    """
+    Run a SQL query over the candlestick, fundamental and stock_info tables.
+
+    Example:
+        pyb.query("SELECT f.symbol, f.pb FROM fundamental f JOIN stock_info s USING (symbol) "
+                  "WHERE s.is_ah AND f.date = ? AND f.pb < 0.5", ['2024-06-28'])
+
+    Args:
+        sql (str): SELECT statement.
+        params (sequence or dict, optional): Values for ? or :name placeholders.
+        data_dir (str, optional): Root data directory. Defaults to <project_root>/data.
+        refresh (bool): Sync the tables named in the query with the data files first.
+
+    Returns:
+        pandas.DataFrame: The result rows.
+    """
+    return get_query_store(data_dir).query(sql, params, refresh)
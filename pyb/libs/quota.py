@@ -0,0 +1,230 @@
+"""
+API quota shared by every process that downloads with the same token.
+
+Each downloader spaces out its own requests, but several jobs or notebooks running at
+once add up to more than the token's quota and all run into 429 responses. The
+QuotaCoordinator keeps one token bucket and a daily request ledger in a small JSON
+file, updated under an exclusive file lock, so every process on the machine draws
+from the same budget:
+
+- the bucket refills at ``rate`` requests per second up to ``burst``;
+- a 429 answer blocks the bucket for every process until the server's Retry-After;
+- the ledger counts requests per day and stops at ``daily_limit``;
+- waiting callers announce their priority ('high', 'normal', 'low') and a caller only
+  takes a token while no caller of a higher priority is waiting, so a nightly
+  incremental update goes ahead of a running backfill.
+
+File locking uses fcntl, so coordination across processes needs a POSIX system;
+elsewhere the coordinator only covers the threads of one process.
+"""
+
+import os
+import json
+import time
+import threading
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+QUOTA_FILE = 'api_quota.json'
+PRIORITIES = ('high', 'normal', 'low')
+# A waiter that has not polled for this long is taken to be gone (e.g. a killed process)
+WAITER_TIMEOUT = 2.0
+MAX_POLL_INTERVAL = 0.25
+LEDGER_DAYS = 31
+
+
+class QuotaExceeded(Exception):
+    """Raised when the daily request quota is used up."""
+
+
+class QuotaCoordinator:
+    """
+    Cross-process token bucket and daily ledger for API requests.
+
+    Args:
+        path (str, optional): State file. Defaults to <project_root>/data/api_quota.json; the lock
+            file is the same path with '.lock' appended.
+        rate (float, optional): Requests per second shared by all processes. The rate and burst are
+            stored in the state file, so a coordinator without a rate (e.g. a job started with only a
+            daily limit, or `pyb quota`) follows the rate last set by another process instead of
+            resetting the bucket. None with no stored rate only keeps the ledger.
+        burst (float, optional): Bucket capacity. Defaults to one second's worth of requests.
+        daily_limit (int, optional): Requests allowed per day (local date). None for no limit.
+        priority (str): Default priority of this process's requests.
+    """
+
+    def __init__(self, path=None, rate=None, burst=None, daily_limit=None, priority='normal'):
+        from pyb.paths import get_data_dir
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'. Expected one of {list(PRIORITIES)}.")
+        self.path = os.path.abspath(path or os.path.join(get_data_dir(), QUOTA_FILE))
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate or 1.0)
+        self.daily_limit = daily_limit
+        self.priority = priority
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return (f"QuotaCoordinator(path={self.path!r}, rate={self.rate}, burst={self.burst}, "
+                f"daily_limit={self.daily_limit}, priority={self.priority!r})")
+
+    def _locked(self, update, write=True):
+        """Run update(state, now) with the state file locked; save the state if `write` and return the result."""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + '.lock', 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX if write else fcntl.LOCK_SH)
+                try:
+                    state = self._read()
+                    now = time.time()
+                    if not write:
+                        return update(state, now)
+                    self._refill(state, now)
+                    result = update(state, now)
+                    tmp_file = f"{self.path}.{os.getpid()}.tmp"
+                    with open(tmp_file, 'w', encoding='utf-8') as f:
+                        json.dump(state, f)
+                    os.replace(tmp_file, self.path)
+                    return result
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        state.setdefault('rate', None)
+        state.setdefault('burst', self.burst)
+        state.setdefault('tokens', state['burst'])
+        state.setdefault('updated', time.time())
+        state.setdefault('blocked_until', 0.0)
+        state.setdefault('ledger', {})
+        state.setdefault('waiters', {})
+        return state
+
+    def _tokens(self, state, now):
+        """Return the tokens in the shared bucket at `now`, refilled at the shared rate."""
+        if not state['rate']:
+            return state['tokens']
+        elapsed = max(0.0, now - state['updated'])
+        return min(state['burst'], state['tokens'] + elapsed * state['rate'])
+
+    def _refill(self, state, now):
+        # Bring the bucket up to date at the stored rate before this process's rate, if any, takes over
+        state['tokens'] = self._tokens(state, now)
+        if self.rate:
+            state['rate'], state['burst'] = self.rate, self.burst
+        state['updated'] = now
+        state['waiters'] = {key: waiter for key, waiter in state['waiters'].items() if waiter['expires'] > now}
+        days = sorted(state['ledger'])
+        for day in days[:-LEDGER_DAYS]:
+            del state['ledger'][day]
+
+    def acquire(self, priority=None):
+        """
+        Block until a request may be sent and record it in the ledger.
+
+        Args:
+            priority (str, optional): 'high', 'normal' or 'low'. Defaults to the coordinator's priority.
+
+        Raises:
+            QuotaExceeded: If the daily limit has been reached.
+        """
+        rank = PRIORITIES.index(priority or self.priority)
+        key = f"{os.getpid()}:{threading.get_ident()}"
+
+        def take(state, now):
+            today = time.strftime('%Y-%m-%d', time.localtime(now))
+            used = state['ledger'].get(today, 0)
+            if self.daily_limit is not None and used >= self.daily_limit:
+                state['waiters'].pop(key, None)
+                raise QuotaExceeded(f"Daily API quota of {self.daily_limit} requests is used up for {today}")
+            ahead = any(waiter['rank'] < rank for other, waiter in state['waiters'].items() if other != key)
+            # Without a shared rate only the ledger and 429 back-offs apply
+            limited = bool(state['rate'])
+            if now >= state['blocked_until'] and (state['tokens'] >= 1.0 or not limited) and not ahead:
+                if limited:
+                    state['tokens'] -= 1.0
+                state['ledger'][today] = used + 1
+                state['waiters'].pop(key, None)
+                return 0.0
+            state['waiters'][key] = {'rank': rank, 'expires': now + WAITER_TIMEOUT}
+            if now < state['blocked_until']:
+                return state['blocked_until'] - now
+            if limited and state['tokens'] < 1.0:
+                return (1.0 - state['tokens']) / state['rate']
+            # Yielding to a higher-priority waiter
+            return MAX_POLL_INTERVAL
+
+        while True:
+            delay = self._locked(take)
+            if delay <= 0:
+                return
+            time.sleep(min(delay, MAX_POLL_INTERVAL))
+
+    def backoff(self, seconds):
+        """Hold every process's requests for the given number of seconds, e.g. after a 429 response."""
+        def block(state, now):
+            state['blocked_until'] = max(state['blocked_until'], now + seconds)
+            state['tokens'] = min(state['tokens'], 0.0)
+        self._locked(block)
+
+    def status(self):
+        """
+        Return the shared state without changing it.
+
+        Returns:
+            dict: 'tokens', 'rate', 'blocked_for' (seconds), 'used_today', 'daily_limit', 'waiting' (count
+            per priority) and 'ledger' (requests per day).
+        """
+        def describe(state, now):
+            today = time.strftime('%Y-%m-%d', time.localtime(now))
+            waiting = {name: 0 for name in PRIORITIES}
+            for waiter in state['waiters'].values():
+                if waiter['expires'] > now:
+                    waiting[PRIORITIES[waiter['rank']]] += 1
+            return {'tokens': self._tokens(state, now), 'rate': state['rate'],
+                    'blocked_for': max(0.0, state['blocked_until'] - now),
+                    'used_today': state['ledger'].get(today, 0), 'daily_limit': self.daily_limit,
+                    'waiting': waiting, 'ledger': dict(state['ledger'])}
+        return self._locked(describe, write=False)
+
+
+_coordinator = None
+
+
+def get_coordinator():
+    """Return the process-wide QuotaCoordinator, or None if none is configured."""
+    return _coordinator
+
+
+def configure_quota(rate=None, burst=None, daily_limit=None, priority='normal', path=None):
+    """
+    Make every post_request of this process draw from the shared quota.
+
+    Args:
+        rate (float, optional): Requests per second shared by all processes using the same state file.
+        burst (float, optional): Bucket capacity.
+        daily_limit (int, optional): Requests allowed per day.
+        priority (str): 'high', 'normal' or 'low'.
+        path (str, optional): State file. Defaults to <project_root>/data/api_quota.json.
+
+    Returns:
+        QuotaCoordinator: The coordinator now in use.
+    """
+    global _coordinator
+    _coordinator = QuotaCoordinator(path, rate, burst, daily_limit, priority)
+    return _coordinator
+
+
+def disable_quota():
+    """Stop drawing requests from the shared quota."""
+    global _coordinator
+    _coordinator = None
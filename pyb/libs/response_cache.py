@@ -0,0 +1,213 @@
+"""
+Content-addressed cache of API responses.
+
+Downloading the same symbol and date range again sends an identical request, so the
+answer can be kept locally. Each successful response is stored in one SQLite file,
+<data_dir>/api_cache.sqlite, zlib-compressed and keyed by the SHA-256 of the endpoint
+URL and the canonical JSON of the payload (keys sorted, token removed), so the key does
+not depend on the token or on key order.
+
+Entries expire after ``ttl`` seconds; online reads drop expired entries, offline reads
+serve them regardless of age so an offline run never loses the only copy. When the compressed bodies grow beyond
+``max_bytes``, the least recently used entries are evicted. In offline mode a request
+that is not cached fails instead of reaching the network, so repeat runs and tests make
+no network round trips at all.
+"""
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+
+CACHE_FILE = 'api_cache.sqlite'
+DEFAULT_TTL = 24 * 3600
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Payload fields that identify the caller rather than the data
+EXCLUDED_FIELDS = ('token',)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at);
+"""
+
+
+def request_key(url, payload):
+    """Return the cache key of a request: the SHA-256 of the URL and the canonical payload without the token."""
+    canonical = {key: value for key, value in payload.items() if key not in EXCLUDED_FIELDS}
+    text = json.dumps(canonical, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(f"{url}\n{text}".encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite store of compressed API responses.
+
+    Args:
+        path (str, optional): Database file. Defaults to <project_root>/data/api_cache.sqlite.
+        ttl (float, optional): Seconds a response stays valid. None keeps responses until they are evicted.
+        max_bytes (int, optional): Upper bound on the total compressed size. None for no bound.
+        offline (bool): Serve only from the cache, ignoring the TTL; requests that are not cached raise instead
+            of going out.
+    """
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES, offline=False):
+        from pyb.paths import get_data_dir
+        self.path = os.path.abspath(path or os.path.join(get_data_dir(), CACHE_FILE))
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return (f"ResponseCache(path={self.path!r}, ttl={self.ttl}, max_bytes={self.max_bytes}, "
+                f"offline={self.offline})")
+
+    def _connection(self):
+        """Return this thread's connection, opening it on first use."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(_SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def get(self, url, payload):
+        """
+        Return the cached response of a request, or None if it is missing or (when online) expired.
+
+        Args:
+            url (str): Endpoint URL.
+            payload (dict): Request payload; the token is ignored.
+
+        Returns:
+            dict or None: The decoded API response.
+        """
+        key = request_key(url, payload)
+        connection = self._connection()
+        row = connection.execute("SELECT body, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        # Offline, an expired entry is still the only copy there is, so it is served and kept
+        if row is not None and not self.offline and self.ttl is not None and row[1] + self.ttl < now:
+            with connection:
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            row = None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if row is None:
+            return None
+        with connection:
+            connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, url, payload, result):
+        """
+        Store a response and evict the least recently used entries beyond max_bytes.
+
+        Args:
+            url (str): Endpoint URL.
+            payload (dict): Request payload; the token is ignored.
+            result (dict): The decoded API response.
+        """
+        body = zlib.compress(json.dumps(result, separators=(',', ':')).encode('utf-8'))
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                               (request_key(url, payload), url, body, len(body), now, now))
+            if self.max_bytes is not None:
+                self._evict(connection)
+
+    def _evict(self, connection):
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Walk from the least recently used entry until enough has been freed
+        excess, keys = total - self.max_bytes, []
+        for key, size in connection.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            keys.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        connection.executemany("DELETE FROM responses WHERE key = ?", keys)
+
+    def stats(self):
+        """
+        Return the cache's size and this process's hit counts.
+
+        Returns:
+            dict: 'entries', 'bytes', 'hits' and 'misses'.
+        """
+        entries, size = self._connection().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {'entries': entries, 'bytes': size, 'hits': self.hits, 'misses': self.misses}
+
+    def clear(self, expired_only=False):
+        """
+        Delete cached responses.
+
+        Args:
+            expired_only (bool): Only delete responses older than the TTL.
+
+        Returns:
+            int: Number of deleted responses.
+        """
+        connection = self._connection()
+        with connection:
+            if expired_only:
+                if self.ttl is None:
+                    return 0
+                cursor = connection.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,))
+            else:
+                cursor = connection.execute("DELETE FROM responses")
+        return cursor.rowcount
+
+
+_cache = None
+
+
+def get_response_cache():
+    """Return the process-wide ResponseCache, or None if caching is off."""
+    return _cache
+
+
+def enable_response_cache(path=None, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES, offline=False):
+    """
+    Serve repeated API requests of this process from the local response cache.
+
+    Args:
+        path (str, optional): Database file. Defaults to <project_root>/data/api_cache.sqlite.
+        ttl (float, optional): Seconds a response stays valid. None keeps responses until they are evicted.
+        max_bytes (int, optional): Upper bound on the total compressed size. None for no bound.
+        offline (bool): Never reach the network; cached responses are served regardless of the TTL and requests
+            that are not cached fail.
+
+    Returns:
+        ResponseCache: The cache now in use.
+    """
+    global _cache
+    _cache = ResponseCache(path, ttl, max_bytes, offline)
+    return _cache
+
+
+def disable_response_cache():
+    """Send every API request to the network again."""
+    global _cache
+    _cache = None
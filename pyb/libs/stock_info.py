@@ -1,6 +1,6 @@
 # libs/stock_info.py
-from config.config import TOKEN, STOCK_INFO_URL
-from libs.api_client import post_request
+from .api_client import post_request, get_token
+from .endpoints import endpoint_url, STOCK_INFO_PATH
 
 
 def download_stock_info(include_delisted=True):
@@ -11,8 +11,8 @@ def download_stock_info(include_delisted=True):
     :return: A list of stock information dictionaries.
     """
     payload = {
-        "token": TOKEN,
+        "token": get_token(),
         "includeDelisted": include_delisted
     }
-    result = post_request(STOCK_INFO_URL, payload)
+    result = post_request(endpoint_url(STOCK_INFO_PATH), payload)
     return result.get("data", [])
@@ -1,14 +1,17 @@
 import pandas as pd
 from pyb.libs.stock_info_interface import load_stock_info
 
-def get_stock_info_dataframe():
+def get_stock_info_dataframe(path=None):
     """
     Loads the stock information from stock_info.json and converts it to a pandas DataFrame.
     
+    Args:
+        path (str, optional): Path to stock_info.json. Defaults to <project_root>/data/stock_info.json.
+
     Returns:
         pd.DataFrame: DataFrame containing the stock information.
     """
-    data = load_stock_info()
+    data = load_stock_info(path)
     return pd.DataFrame(data)
 
 if __name__ == '__main__':
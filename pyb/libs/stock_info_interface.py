@@ -1,27 +1,92 @@
 import json
 import os
+import threading
 
 # Compute the base directory of the project (three levels up from this file)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 STOCK_INFO_PATH = os.path.join(BASE_DIR, 'data', 'stock_info.json')
 
-def load_stock_info():
-    """Load the stock information from the JSON file."""
-    with open(STOCK_INFO_PATH, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    return data
 
-def get_ah_stock_codes():
+class StockInfoRegistry:
+    """
+    In-process cache of stock_info.json.
+
+    The file is parsed once and re-read only when its modification time changes, so every
+    caller in the process (downloaders, loaders, the CLI) shares a single copy.
+    """
+
+    def __init__(self, path=STOCK_INFO_PATH):
+        self.path = path
+        self._records = None
+        self._mtime = None
+        self._by_code = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        mtime = os.path.getmtime(self.path)
+        if self._records is None or mtime != self._mtime:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._records = json.load(f)
+            self._mtime = mtime
+            self._by_code = None
+
+    @property
+    def records(self):
+        """The list of stock information dictionaries."""
+        with self._lock:
+            self._refresh()
+            return self._records
+
+    def get(self, stock_code):
+        """Return the stock information dictionary for a stock code, or None."""
+        records = self.records
+        with self._lock:
+            if self._by_code is None:
+                self._by_code = {stock.get('stockCode'): stock for stock in records}
+            return self._by_code.get(stock_code)
+
+    def exists(self):
+        """Return True if the stock information file is present."""
+        return os.path.exists(self.path)
+
+    def invalidate(self):
+        """Drop the cached records so the next access re-reads the file."""
+        with self._lock:
+            self._records = None
+            self._by_code = None
+
+
+_registries = {}
+
+
+def get_stock_info_registry(path=None):
+    """Return the shared StockInfoRegistry for a stock_info.json path (defaults to <project_root>/data)."""
+    path = os.path.abspath(path or STOCK_INFO_PATH)
+    registry = _registries.get(path)
+    if registry is None:
+        registry = _registries.setdefault(path, StockInfoRegistry(path))
+    return registry
+
+
+def is_ah_stock(mutual_markets):
+    """Return True if a stock's mutualMarkets value lists it as an A/H dual listing ('ah' among the markets)."""
+    return isinstance(mutual_markets, (list, tuple)) and 'ah' in mutual_markets
+
+def load_stock_info(path=None):
+    """Load the stock information from the JSON file (defaults to <project_root>/data/stock_info.json)."""
+    return get_stock_info_registry(path).records
+
+def get_ah_stock_codes(path=None):
     """Retrieve a list of stock codes for AH stocks (where 'ah' is in the mutualMarkets list)."""
-    stocks = load_stock_info()
-    ah_stocks = [stock['stockCode'] for stock in stocks if 'mutualMarkets' in stock and stock['mutualMarkets'] == ["ah"]]
+    stocks = load_stock_info(path)
+    ah_stocks = [stock['stockCode'] for stock in stocks if is_ah_stock(stock.get('mutualMarkets'))]
     return ah_stocks
 
 def get_stock_info_summary():
     """Return a summary dict with total stocks, count of AH stocks, and count of normally_listed stocks."""
     stocks = load_stock_info()
     total = len(stocks)
-    count_ah = sum(1 for stock in stocks if 'mutualMarkets' in stock and isinstance(stock['mutualMarkets'], list) and 'ah' in stock['mutualMarkets'])
+    count_ah = sum(1 for stock in stocks if is_ah_stock(stock.get('mutualMarkets')))
     count_normally_listed = sum(1 for stock in stocks if stock.get('listingStatus') == 'normally_listed')
     return {
         'total_stocks': total,
@@ -31,4 +96,4 @@ def get_stock_info_summary():
 
 if __name__ == '__main__':
     print("AH Stocks:", get_ah_stock_codes())
-    print("Stock Info Summary:", get_stock_info_summary()) 
\ No newline at end of file
+    print("Stock Info Summary:", get_stock_info_summary())
@@ -0,0 +1,273 @@
+import os
+import json
+import numpy as np
+from .stock_info_interface import is_ah_stock
+
+# Fundamental report types used by the HK endpoints
+FS_TABLE_TYPES = ['non_financial', 'bank', 'insurance', 'security', 'other_financial']
+SECTORS = ['financials', 'real_estate', 'industrials', 'consumer', 'energy', 'utilities', 'technology', 'materials']
+FUNDAMENTAL_METRICS = ["pe_ttm", "pb", "ps_ttm", "pcf_ttm", "dyr", "ta", "mc"]
+
+
+def make_symbols(n_symbols):
+    """Return n_symbols zero-padded HK-style stock codes ('00001', '00002', ...)."""
+    return [f"{i:05d}" for i in range(1, n_symbols + 1)]
+
+
+def trading_days(start_date, n_days):
+    """
+    Return n_days consecutive business days starting at start_date.
+
+    Args:
+        start_date (str): First candidate date (YYYY-MM-DD).
+        n_days (int): Number of trading days.
+
+    Returns:
+        numpy.ndarray: datetime64[D] array of weekdays.
+    """
+    start = np.datetime64(start_date, 'D')
+    # 7/5 calendar days per trading day plus a margin covers any starting weekday
+    candidates = start + np.arange(int(n_days * 7 / 5) + 7)
+    weekdays = candidates[np.is_busday(candidates)]
+    return weekdays[:n_days]
+
+
+def format_dates(days):
+    """Format datetime64[D] values the way the API does ('2015-01-02T00:00:00+08:00')."""
+    return [f"{d}T00:00:00+08:00" for d in days.astype(str)]
+
+
+def _symbol_rng(seed, index):
+    """Independent, reproducible random stream per symbol, so subsets of a universe are stable."""
+    return np.random.default_rng([seed, index])
+
+
+def generate_stock_info(symbols, days, seed=0, ah_fraction=0.6, delisted_fraction=0.05):
+    """
+    Generate stock information records in the format of stock_info.json.
+
+    Args:
+        symbols (list): Stock codes.
+        days (numpy.ndarray): Trading calendar (datetime64[D]); IPO dates are drawn from it.
+        seed (int): Random seed.
+        ah_fraction (float): Fraction of stocks listed as AH (mutualMarkets == ["ah"]).
+        delisted_fraction (float): Fraction of stocks marked as delisted.
+
+    Returns:
+        list: Stock information dictionaries.
+    """
+    records = []
+    for i, symbol in enumerate(symbols):
+        rng = _symbol_rng(seed, i)
+        # Most stocks are listed before the window starts; the rest IPO inside it
+        if rng.random() < 0.7:
+            ipo_day = days[0] - np.timedelta64(int(rng.integers(30, 3000)), 'D')
+        else:
+            ipo_day = days[int(rng.integers(0, len(days)))]
+        delisted = rng.random() < delisted_fraction
+        record = {
+            'stockCode': symbol,
+            'name': f"Synthetic {symbol}",
+            'areaCode': 'hk',
+            'market': 'h',
+            'exchange': 'hk',
+            'ipoDate': f"{ipo_day}T00:00:00+08:00",
+            'listingStatus': 'delisted' if delisted else 'normally_listed',
+            'fsTableType': FS_TABLE_TYPES[int(rng.integers(0, len(FS_TABLE_TYPES)))],
+            'sector': SECTORS[int(rng.integers(0, len(SECTORS)))],
+            'mutualMarkets': ['ah'] if rng.random() < ah_fraction else [],
+        }
+        if delisted:
+            delist_day = days[int(rng.integers(len(days) // 2, len(days)))]
+            record['delistedDate'] = f"{delist_day}T00:00:00+08:00"
+        records.append(record)
+    return records
+
+
+def _active_range(info, days):
+    """Return the slice of the calendar during which a stock trades."""
+    ipo_day = np.datetime64(info['ipoDate'][:10], 'D')
+    start = int(np.searchsorted(days, ipo_day))
+    end = len(days)
+    if 'delistedDate' in info:
+        end = int(np.searchsorted(days, np.datetime64(info['delistedDate'][:10], 'D')))
+    return start, max(start, end)
+
+
+def generate_symbol_data(info, index, days, seed=0):
+    """
+    Generate candlestick and fundamental records for one stock.
+
+    Prices follow a geometric random walk; fundamentals are derived from the price with
+    slowly drifting per-share book value, earnings, sales, cash flow and dividends.
+
+    Args:
+        info (dict): The stock's information record (from generate_stock_info).
+        index (int): Position of the stock in the universe (selects its random stream).
+        days (numpy.ndarray): Trading calendar (datetime64[D]).
+        seed (int): Random seed.
+
+    Returns:
+        tuple: (candlestick records, fundamental records), newest first like the API.
+    """
+    rng = _symbol_rng(seed + 1, index)
+    start, end = _active_range(info, days)
+    n = end - start
+    if n == 0:
+        return [], []
+    active = days[start:end]
+    dates = format_dates(active)
+
+    log_returns = rng.normal(0.0002, 0.02, n)
+    close = float(rng.uniform(1.0, 80.0)) * np.exp(np.cumsum(log_returns))
+    prev_close = np.concatenate([[close[0]], close[:-1]])
+    open_ = prev_close * np.exp(rng.normal(0.0, 0.005, n))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0.0, 0.01, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0.0, 0.01, n)))
+    volume = np.round(rng.lognormal(13.0, 1.0, n))
+    amount = volume * (high + low) / 2
+    change = close / prev_close - 1
+
+    shares = float(rng.uniform(1e8, 2e10))
+    drift = np.exp(np.cumsum(rng.normal(0.0, 0.002, n)))
+    book_ps = close[0] / rng.uniform(0.3, 3.0) * drift
+    eps = close[0] / rng.uniform(4.0, 40.0) * drift * np.sign(rng.random() - 0.1)
+    sales_ps = close[0] / rng.uniform(0.5, 5.0) * drift
+    cash_ps = close[0] / rng.uniform(3.0, 30.0) * drift
+    dps = np.maximum(eps, 0) * rng.uniform(0.0, 0.6)
+    total_assets = book_ps * shares * rng.uniform(1.2, 8.0)
+
+    candles = []
+    fundamentals = []
+    for j in range(n - 1, -1, -1):
+        candles.append({
+            'date': dates[j],
+            'open': round(float(open_[j]), 3),
+            'close': round(float(close[j]), 3),
+            'high': round(float(high[j]), 3),
+            'low': round(float(low[j]), 3),
+            'volume': float(volume[j]),
+            'amount': round(float(amount[j]), 2),
+            'change': round(float(change[j]), 6),
+        })
+        fundamentals.append({
+            'date': dates[j],
+            'stockCode': info['stockCode'],
+            'pe_ttm': float(close[j] / eps[j]),
+            'pb': float(close[j] / book_ps[j]),
+            'ps_ttm': float(close[j] / sales_ps[j]),
+            'pcf_ttm': float(close[j] / cash_ps[j]),
+            'dyr': float(dps[j] / close[j]),
+            'ta': float(total_assets[j]),
+            'mc': float(close[j] * shares),
+        })
+    return candles, fundamentals
+
+
+def generate_corporate_actions(info, index, days, seed=0, rate=0.004):
+    """
+    Generate the corporate actions (cash dividends and splits) of one stock.
+
+    Args:
+        info (dict): The stock's information record (from generate_stock_info).
+        index (int): Position of the stock in the universe (selects its random stream).
+        days (numpy.ndarray): Trading calendar (datetime64[D]).
+        seed (int): Random seed.
+        rate (float): Probability of an action on each trading day.
+
+    Returns:
+        tuple: (ex-dates as datetime64[D], ratios) where each ratio is the step of the backward
+            adjustment factor on its ex-date.
+    """
+    rng = _symbol_rng(seed + 2, index)
+    start, end = _active_range(info, days)
+    hits = np.nonzero(rng.random(end - start) < rate)[0]
+    hits = hits[hits > 0]
+    splits = rng.random(len(hits)) < 0.2
+    ratios = np.where(splits, rng.choice([1.5, 2.0, 10.0 / 7.0], len(hits)),
+                      1.0 / (1.0 - rng.uniform(0.01, 0.05, len(hits))))
+    return days[start:end][hits], ratios
+
+
+def adjust_candles(candles, event_days, ratios, candlestick_type):
+    """
+    Turn backward-adjusted ('bc_rights') candles into another adjustment type.
+
+    Args:
+        candles (list): Records from generate_symbol_data.
+        event_days (numpy.ndarray): Ex-dates from generate_corporate_actions.
+        ratios (numpy.ndarray): Factor steps from generate_corporate_actions.
+        candlestick_type (str): 'ex_rights' (unadjusted) or 'fc_rights' (forward-adjusted);
+            other types return the candles unchanged.
+
+    Returns:
+        list: New records with open, close, high and low rescaled and rounded like the API.
+    """
+    if candlestick_type not in ('ex_rights', 'fc_rights') or not candles:
+        return candles
+    days = np.array([rec['date'][:10] for rec in candles], dtype='datetime64[D]')
+    cumulative = np.concatenate([[1.0], np.cumprod(ratios)])
+    factor = cumulative[np.searchsorted(event_days, days, side='right')]
+    divisor = factor if candlestick_type == 'ex_rights' else np.full(len(days), cumulative[-1])
+    adjusted = []
+    for rec, scale in zip(candles, divisor):
+        rec = dict(rec)
+        for field in ('open', 'close', 'high', 'low'):
+            rec[field] = round(rec[field] / float(scale), 3)
+        adjusted.append(rec)
+    return adjusted
+
+
+def write_synthetic_dataset(data_dir, n_symbols=100, n_days=500, seed=0, start_date='2015-01-02',
+                            ah_fraction=0.6, delisted_fraction=0.05, indent=4):
+    """
+    Write a deterministic synthetic data tree that mirrors <project_root>/data.
+
+    Creates <data_dir>/stock_info.json, <data_dir>/candlestick_data/<code>.json and
+    <data_dir>/fundamental_data/<code>.json. The same arguments always produce identical files.
+
+    Args:
+        data_dir (str): Target directory.
+        n_symbols (int): Number of stocks.
+        n_days (int): Number of trading days.
+        seed (int): Random seed.
+        start_date (str): First trading day (YYYY-MM-DD).
+        ah_fraction (float): Fraction of stocks listed as AH.
+        delisted_fraction (float): Fraction of stocks marked as delisted.
+        indent (int or None): JSON indentation; 4 matches the downloaders.
+
+    Returns:
+        dict: Summary with the symbols, calendar bounds and AH stock codes.
+    """
+    symbols = make_symbols(n_symbols)
+    days = trading_days(start_date, n_days)
+    stock_info = generate_stock_info(symbols, days, seed, ah_fraction, delisted_fraction)
+
+    candlestick_dir = os.path.join(data_dir, 'candlestick_data')
+    fundamental_dir = os.path.join(data_dir, 'fundamental_data')
+    os.makedirs(candlestick_dir, exist_ok=True)
+    os.makedirs(fundamental_dir, exist_ok=True)
+
+    with open(os.path.join(data_dir, 'stock_info.json'), 'w', encoding='utf-8') as f:
+        json.dump(stock_info, f, indent=indent, ensure_ascii=False)
+
+    written = []
+    for i, info in enumerate(stock_info):
+        candles, fundamentals = generate_symbol_data(info, i, days, seed)
+        if not candles:
+            continue
+        with open(os.path.join(candlestick_dir, f"{info['stockCode']}.json"), 'w', encoding='utf-8') as f:
+            json.dump(candles, f, indent=indent, ensure_ascii=False)
+        with open(os.path.join(fundamental_dir, f"{info['stockCode']}.json"), 'w', encoding='utf-8') as f:
+            json.dump(fundamentals, f, indent=indent, ensure_ascii=False)
+        written.append(info['stockCode'])
+
+    written_set = set(written)
+    return {
+        'symbols': written,
+        'ah_symbols': [s['stockCode'] for s in stock_info
+                       if is_ah_stock(s['mutualMarkets']) and s['stockCode'] in written_set],
+        'start_date': str(days[0]),
+        'end_date': str(days[-1]),
+        'n_days': len(days),
+    }
@@ -1,31 +1,79 @@
 # scripts/download_fundamental.py
 import os
-import json
 import time
-from libs.fundamental import download_fundamental
+from concurrent.futures import ThreadPoolExecutor
+from pyb.libs.api_client import call_with_retries
+from pyb.libs.catalog import get_catalog
+from pyb.libs.columnar_store import write_json_symbol
+from pyb.libs.fundamental import download_fundamental
+from pyb.libs.stock_info_interface import get_stock_info_registry
 from pyb.paths import get_data_dir
 
 REQUEST_INTERVAL = 0.07  # seconds between requests to avoid exceeding limit
-MAX_RETRIES = 3
 
-def main():
-    # Load stock information from data/stock_info.json
-    data_dir = get_data_dir()
-    stock_info_file = os.path.join(data_dir, "stock_info.json")
 
-    if not os.path.exists(stock_info_file):
-        print("Stock information file not found. Please run download_stock_info.py first.")
-        return
+def _download_one(stock_code, fs_table_type, fundamental_dir, ranges, merge, start_date, end_date, request_interval):
+    """Download the missing date ranges of one stock and save them; return True if it was saved."""
+    print(f"Downloading fundamental data for {stock_code} (fsTableType: {fs_table_type})...")
+    fundamental_data = []
+    for i, (range_start, range_end) in enumerate(ranges):
+        if i:
+            time.sleep(request_interval)
+        part = call_with_retries(download_fundamental, stock_code, fs_table_type,
+                                 start_date=range_start, end_date=range_end, label=stock_code)
+        if part is None:
+            print(f"Skipping saving fundamental data for {stock_code} due to errors.")
+            return False
+        fundamental_data.extend(part)
+
+    if merge and not fundamental_data:
+        # Nothing published in the missing ranges; remember they were asked for
+        get_catalog(fundamental_dir).extend_coverage(stock_code, start_date, end_date)
+    else:
+        # Save fundamental data to a JSON file named {stock_code}.json.
+        write_json_symbol(fundamental_dir, stock_code, fundamental_data, covered=(start_date, end_date), merge=merge)
+        print(f"Fundamental data for {stock_code} saved to {os.path.join(fundamental_dir, f'{stock_code}.json')}")
+    time.sleep(request_interval)
+    return True
+
+
+def main(registry=None, data_dir=None, start_date="2015-01-01", end_date="2025-01-01", workers=1,
+         request_interval=REQUEST_INTERVAL, force=False):
+    """
+    Download fundamental data for every stock with mutual-market access.
+
+    Args:
+        registry (StockInfoRegistry, optional): Stock information to iterate. Defaults to the shared registry for data_dir.
+        data_dir (str, optional): Data directory. Defaults to <project_root>/data.
+        start_date (str): Start date in YYYY-MM-DD format.
+        end_date (str): End date in YYYY-MM-DD format.
+        workers (int): Number of concurrent download threads.
+        request_interval (float): Seconds each worker waits between API requests.
+        force (bool): Re-download the whole range of stocks whose file already exists. Otherwise only the
+            date ranges the data catalog (pyb.libs.catalog) has no record of are downloaded and merged in.
 
-    with open(stock_info_file, "r", encoding="utf-8") as f:
-        stock_info = json.load(f)
+    Returns:
+        dict: Mapping of stock code to True if saved, False if the download failed.
+    """
+    if data_dir is None:
+        data_dir = get_data_dir()
+    if registry is None:
+        registry = get_stock_info_registry(os.path.join(data_dir, "stock_info.json"))
+
+    if not registry.exists():
+        print("Stock information file not found. Please run the stock-info command first.")
+        return {}
 
     # Create a directory for fundamental data
     fundamental_dir = os.path.join(data_dir, "fundamental_data")
     os.makedirs(fundamental_dir, exist_ok=True)
+    catalog = get_catalog(fundamental_dir)
+    catalog.scan()
 
-    # Download fundamental data for each stock.
-    for stock in stock_info:
+    stock_codes = [stock["stockCode"] for stock in registry.records if stock.get("mutualMarkets") and stock.get("stockCode")]
+    plans = {} if force else catalog.plan_downloads(stock_codes, start_date, end_date)
+    jobs = []
+    for stock in registry.records:
         stock_code = stock.get("stockCode")
         # filter non ah stocks
         if not stock.get("mutualMarkets"):
@@ -34,33 +82,18 @@ def main():
         if not stock_code or not fs_table_type:
             print(f"Skipping stock with missing stockCode or fsTableType: {stock}")
             continue
-        output_file = os.path.join(fundamental_dir, f"{stock_code}.json")
-        if os.path.exists(output_file):
-            print(f"Skipping download for {stock_code}: file already exists.")
-            continue
-        print(f"Downloading fundamental data for {stock_code} (fsTableType: {fs_table_type})...")
-        fundamental_data = None
-        for attempt in range(1, MAX_RETRIES+1):
-            try:
-                print(f"Attempt {attempt} for {stock_code}...")
-                fundamental_data = download_fundamental(stock_code, fs_table_type)
-                break
-            except Exception as e:
-                if '429' in str(e):
-                    print(f"Received 429 Too Many Requests for {stock_code}, attempt {attempt}/{MAX_RETRIES}. Waiting before retrying...")
-                    time.sleep(REQUEST_INTERVAL * attempt * 2)
-                else:
-                    print(f"Error downloading fundamental data for {stock_code}: {e}")
-                    break
-        if fundamental_data is None:
-            print(f"Skipping saving fundamental data for {stock_code} due to errors.")
+        ranges, merge = plans.get(stock_code, ([(start_date, end_date)], False))
+        if not ranges:
+            print(f"Skipping download for {stock_code}: data already covers {start_date} to {end_date}.")
             continue
-        
-        # Save fundamental data to a JSON file named {stock_code}.json.
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(fundamental_data, f, indent=4, ensure_ascii=False)
-        print(f"Fundamental data for {stock_code} saved to {output_file}")
-        time.sleep(REQUEST_INTERVAL)
+        jobs.append((stock_code, fs_table_type, fundamental_dir, ranges, merge, start_date, end_date, request_interval))
+
+    if workers <= 1:
+        return {job[0]: _download_one(*job) for job in jobs}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {job[0]: executor.submit(_download_one, *job) for job in jobs}
+        return {stock_code: future.result() for stock_code, future in futures.items()}
+
 
 if __name__ == "__main__":
     main()
@@ -1,41 +1,44 @@
 # scripts/download_stock_info.py
 import os
 import json
-import time
-from libs.stock_info import download_stock_info
+from pyb.libs.api_client import call_with_retries
+from pyb.libs.stock_info import download_stock_info
+from pyb.libs.stock_info_interface import get_stock_info_registry
+from pyb.paths import get_data_dir
 
-REQUEST_INTERVAL = 0.07  # seconds between requests, though only one expected
-MAX_RETRIES = 3
 
-def main():
-    from pyb.paths import get_data_dir
-    data_dir = get_data_dir()
+def main(data_dir=None, force=False, include_delisted=True):
+    """
+    Download stock information and save it to <data_dir>/stock_info.json.
+
+    Args:
+        data_dir (str, optional): Data directory. Defaults to <project_root>/data.
+        force (bool): Download even if the file already exists.
+        include_delisted (bool): Include delisted stocks.
+
+    Returns:
+        list: The downloaded stock information, or None if nothing was saved.
+    """
+    if data_dir is None:
+        data_dir = get_data_dir()
+    os.makedirs(data_dir, exist_ok=True)
     output_file = os.path.join(data_dir, "stock_info.json")
-    if os.path.exists(output_file):
-         print(f"Stock information already exists at {output_file}. Skipping download.")
-         return
+    if os.path.exists(output_file) and not force:
+        print(f"Stock information already exists at {output_file}. Skipping download.")
+        return None
 
     print("Downloading stock information...")
-    stock_data = None
-    for attempt in range(1, MAX_RETRIES+1):
-         try:
-              print(f"Attempt {attempt} for stock information...")
-              stock_data = download_stock_info(include_delisted=True)
-              break
-         except Exception as e:
-              if '429' in str(e):
-                  print(f"Received 429 Too Many Requests, attempt {attempt}/{MAX_RETRIES}. Waiting before retrying...")
-                  time.sleep(REQUEST_INTERVAL * attempt * 2)
-              else:
-                  print(f"Error downloading stock information: {e}")
-                  break
+    stock_data = call_with_retries(download_stock_info, include_delisted=include_delisted, label="stock information")
     if stock_data is None:
-         print("Skipping saving stock information due to errors.")
-         return
+        print("Skipping saving stock information due to errors.")
+        return None
 
     with open(output_file, "w", encoding="utf-8") as f:
-         json.dump(stock_data, f, indent=4, ensure_ascii=False)
+        json.dump(stock_data, f, indent=4, ensure_ascii=False)
+    get_stock_info_registry(output_file).invalidate()
     print(f"Stock information saved to {output_file}")
+    return stock_data
+
 
 if __name__ == "__main__":
     main()
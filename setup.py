@@ -15,6 +15,11 @@ setup(
         "bt>=0.2.9",
         "pyb",  # Add appropriate version if known
     ],
+    entry_points={
+        "console_scripts": [
+            "pyb=pyb.cli:main",
+        ],
+    },
     author="Your Name",
     author_email="your.email@example.com",
     description="A modular package for financial ratio analysis",